@@ -1,4 +1,3 @@
-import random
 from abc import ABC, abstractmethod
 
 # Abstract Action Class
@@ -13,31 +12,33 @@ class Action(ABC):
 class AttackAction(Action):
     def execute(self, attacker, target): #execute class from Action abtract class is called on attacker and target
         if target is None: # if these is no target selected by player return message
-            print("No target selected!")
+            attacker.log("No target selected!")
             return
         # Chance of target doding attack
         # targets speed divided by 100 to get percentage chnage of attack
         # chooses random number, if less than dodge chance returns player dodged
-        dodge_chance = target.speed / 100
-        if random.random() < dodge_chance:
-            print(f"{target.name} dodges the attack!")
+        matrix = attacker.damage_matrix # per-match cache of damage/dodge per pair, if the battle attached one
+        dodge_chance = matrix.dodge_chance(target) if matrix is not None else target.speed / 100
+        if attacker.rng.random() < dodge_chance:
+            attacker.log(f"{target.name} dodges the attack!")
             return
         # if target does not dodge damage is done
         # target health is decremented by the attacker power subtractde by target defense
         else:
-            damage = max(0, attacker.attack_power - target.defense)
+            damage = matrix.attack_damage(attacker, target) if matrix is not None else max(0, attacker.attack_power - target.defense)
             target.hp -= damage
-            print(f"{attacker.name} attacks {target.name} for {damage} damage!")
+            attacker.log(f"{attacker.name} attacks {target.name} for {damage} damage!")
             # determines if target is eliminated
             if target.hp <= 0:
-                print(f"{target.name} has been eliminated!")
+                attacker.log(f"{target.name} has been eliminated!")
 
 # Purpose: Increases player defense
 class DefendAction(Action):
     def execute(self, player): #execute from abstract Action class is called on current player
         original_defense = player.defense
         player.defense *= 2 # multipy players base defense by 2
-        print(f"{player.name} defends, increasing defense from {original_defense} to {player.defense}!")
+        player.stats_changed() # cached damage against this player is stale now
+        player.log(f"{player.name} defends, increasing defense from {original_defense} to {player.defense}!")
 
 # Purpose: Perform player special move
 class SpecialMoveAction(Action):
@@ -45,4 +46,4 @@ class SpecialMoveAction(Action):
         if player.special_move_cooldown == 0: # checks if players cooldown is 0
             player.special_move(target) # perform special move on target (defender) if cooldown is 0
         else: # means special move was recenlty used and still in cooldown
-            print(f"{player.name}'s special move is on cooldown for {player.special_move_cooldown} more turns.")
+            player.log(f"{player.name}'s special move is on cooldown for {player.special_move_cooldown} more turns.")
@@ -0,0 +1,137 @@
+# admission.py
+#
+# Admission control for GameServer's accept path.
+#
+#   - a global cap on open connections: over it, a connection gets one
+#     "server full" frame (non-blocking send) and is closed right away;
+#   - per IP: a cap on open connections and a token bucket on new ones
+#     (conn_rate per second, bursts up to conn_burst);
+#   - per connection: a token bucket on decoded messages (msg_rate/msg_burst)
+#     and a maximum frame length; a client over either is disconnected;
+#   - handshake deadlines: a new connection that has not answered welcome
+#     with join within join_timeout seconds is closed before it reaches the
+#     lobby; a match whose players have not all sent pick_character within
+#     handshake_timeout seconds drops the silent ones and puts the rest back
+#     in the lobby. A client that joins and then goes quiet can still hold
+#     opponents for handshake_timeout, which per_ip keeps to a few at a time
+#     per address.
+#
+# GameServer runs without limits unless it is given an Admission; server.py
+# and supervisor.py build one from the command line (--no-admission to turn
+# it off).
+
+import argparse
+import threading
+import time
+from typing import Dict, Optional
+
+FULL = "full"  # reject reasons, see frames.rejected()
+BUSY_ADDRESS = "address"
+
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "stamp")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.stamp = time.monotonic()
+
+    def take(self, n: float = 1.0) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        if self.tokens >= n:
+            self.tokens -= n
+            return True
+        return False
+
+
+class Admission:
+    def __init__(self, max_connections: int = 1024, per_ip: int = 16, conn_rate: float = 10.0,
+                 conn_burst: float = 40.0, msg_rate: float = 20.0, msg_burst: float = 60.0,
+                 max_frame: int = 4096, join_timeout: float = 5.0, handshake_timeout: float = 30.0,
+                 max_tracked_ips: int = 4096):
+        self.max_connections = max_connections
+        self.per_ip = per_ip
+        self.conn_rate = conn_rate
+        self.conn_burst = conn_burst
+        self.msg_rate = msg_rate
+        self.msg_burst = msg_burst
+        self.max_frame = max_frame
+        self.join_timeout = join_timeout
+        self.handshake_timeout = handshake_timeout
+        self.max_tracked_ips = max_tracked_ips
+        self.lock = threading.Lock()
+        self.active = 0
+        self.active_by_ip: Dict[str, int] = {}
+        self.buckets: Dict[str, TokenBucket] = {}  # ip -> new-connection bucket
+
+    # Purpose: Counts the connection in, or returns why it is refused (FULL or BUSY_ADDRESS).
+    # new=False for a connection passed on by another process (the caps apply, the connection rate does not)
+    def admit(self, ip: str, new: bool = True) -> Optional[str]:
+        with self.lock:
+            if self.active >= self.max_connections:
+                return FULL
+            if self.active_by_ip.get(ip, 0) >= self.per_ip:
+                return BUSY_ADDRESS
+            if new:
+                bucket = self.buckets.get(ip)
+                if bucket is None:
+                    if len(self.buckets) >= self.max_tracked_ips:
+                        self._prune()
+                    bucket = self.buckets[ip] = TokenBucket(self.conn_rate, self.conn_burst)
+                if not bucket.take():
+                    return BUSY_ADDRESS
+            self.active += 1
+            self.active_by_ip[ip] = self.active_by_ip.get(ip, 0) + 1
+            return None
+
+    def release(self, ip: str):
+        with self.lock:
+            self.active -= 1
+            left = self.active_by_ip.get(ip, 0) - 1
+            if left > 0:
+                self.active_by_ip[ip] = left
+            else:
+                self.active_by_ip.pop(ip, None)
+
+    # Forgets addresses with nothing open whose bucket has refilled (they would start from a full one anyway)
+    def _prune(self):
+        now = time.monotonic()
+        for ip, bucket in list(self.buckets.items()):
+            if ip not in self.active_by_ip and bucket.tokens + (now - bucket.stamp) * bucket.rate >= bucket.burst:
+                del self.buckets[ip]
+
+    def message_bucket(self) -> TokenBucket:
+        return TokenBucket(self.msg_rate, self.msg_burst)
+
+
+def add_admission_args(parser: argparse.ArgumentParser):
+    defaults = Admission()
+    group = parser.add_argument_group("admission control")
+    group.add_argument("--no-admission", action="store_true", help="accept every connection, no limits")
+    group.add_argument("--max-connections", type=int, default=defaults.max_connections,
+                       help="open connections before new ones get 'server full'")
+    group.add_argument("--per-ip", type=int, default=defaults.per_ip, help="open connections per address")
+    group.add_argument("--conn-rate", type=float, default=defaults.conn_rate,
+                       help="new connections per second per address (bursts up to --conn-burst)")
+    group.add_argument("--conn-burst", type=float, default=defaults.conn_burst)
+    group.add_argument("--msg-rate", type=float, default=defaults.msg_rate,
+                       help="messages per second per connection (bursts up to --msg-burst)")
+    group.add_argument("--msg-burst", type=float, default=defaults.msg_burst)
+    group.add_argument("--max-frame", type=int, default=defaults.max_frame, help="longest client message, bytes")
+    group.add_argument("--join-timeout", type=float, default=defaults.join_timeout,
+                       help="seconds a new connection has to answer welcome with join")
+    group.add_argument("--handshake-timeout", type=float, default=defaults.handshake_timeout,
+                       help="seconds a matched player has to send pick_character")
+
+
+def admission_from_args(args: argparse.Namespace) -> Optional[Admission]:
+    if args.no_admission:
+        return None
+    return Admission(max_connections=args.max_connections, per_ip=args.per_ip, conn_rate=args.conn_rate,
+                     conn_burst=args.conn_burst, msg_rate=args.msg_rate, msg_burst=args.msg_burst,
+                     max_frame=args.max_frame, join_timeout=args.join_timeout,
+                     handshake_timeout=args.handshake_timeout)
@@ -0,0 +1,325 @@
+# balance.py
+#
+# Tunes the per-class stats in class_data.json (hp, attack_power, defense,
+# speed, special cooldown) to minimise win-rate imbalance across every 1v1
+# matchup, using the headless simulator.
+#
+# Imbalance of a stat table = mean over class pairs of |win rate - 0.5|
+# (draws count half) plus draw_weight * draw rate, so stalemates do not pass
+# for balance. Search is a hill climb: each step perturbs one stat of
+# one class in several ways and keeps the best neighbour if it improves.
+#
+# Keeping a run to about an hour:
+#   * matchups are simulated in batches on a process pool;
+#   * each matchup stops as soon as a two-sided SPRT says it is balanced
+#     (within --delta of 50%) or clearly not;
+#   * a whole candidate is dropped once even its optimistic imbalance is
+#     worse than the current best;
+#   * every evaluated stat vector is cached (optionally on disk, --cache), so
+#     the climb never simulates the same table twice. The cache file records a
+#     fingerprint of the settings and of the untuned part of the table, and is
+#     ignored when they differ; an early rejection is stored as the lower bound
+#     it proved, so a later run only reuses it against a cutoff it still beats.
+#
+#   python balance.py --budget 3600 --out class_data.tuned.json
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+from typing import Dict, List, Optional, Tuple
+
+from character import CharacterPool
+from class_table import load_class_table, compile_class_table
+from simulator import Simulation, random_policy, greedy_policy
+
+POLICIES = {"random": random_policy, "greedy": greedy_policy}
+
+# tunable stat -> (lowest, highest, step)
+BOUNDS = {
+    "hp": (40, 200, 10),
+    "attack_power": (5, 50, 2),
+    "defense": (0, 15, 1),
+    "speed": (0, 60, 5),
+    "cooldown": (1, 5, 1),
+}
+STATS = tuple(BOUNDS)
+
+Vector = Tuple[int, ...]  # STATS values for every class, in table order
+
+
+# ----------------------------
+# Stat tables <-> vectors
+# ----------------------------
+def table_to_vector(table: dict) -> Vector:
+    values = []
+    for entry in table.values():
+        for stat in STATS:
+            values.append(entry["special"]["cooldown"] if stat == "cooldown" else entry.get(stat, 15))
+    return tuple(values)
+
+
+def vector_to_table(base: dict, vector: Vector) -> dict:
+    table = json.loads(json.dumps(base))  # deep copy of the raw table
+    values = iter(vector)
+    for entry in table.values():
+        for stat in STATS:
+            if stat == "cooldown":
+                entry["special"]["cooldown"] = next(values)
+            else:
+                entry[stat] = next(values)
+    return table
+
+
+def neighbours(vector: Vector, rng: random.Random, count: int) -> List[Vector]:
+    out, seen = [], {vector}
+    for _ in range(count * 10):
+        if len(out) >= count:
+            break
+        i = rng.randrange(len(vector))
+        lo, hi, step = BOUNDS[STATS[i % len(STATS)]]
+        moved = min(hi, max(lo, vector[i] + rng.choice((-step, step)) * rng.choice((1, 1, 2))))
+        candidate = vector[:i] + (moved,) + vector[i + 1:]
+        if candidate not in seen:
+            seen.add(candidate)
+            out.append(candidate)
+    return out
+
+
+# ----------------------------
+# Simulation tasks (run in pool workers)
+# ----------------------------
+_compiled: Dict[str, dict] = {}  # per worker process: table json -> compiled specs
+_pool = CharacterPool()  # per worker process, free lists per compiled class
+
+
+def play_batch(table_json: str, class_a: str, class_b: str, games: int, seed: int, policy: str,
+               max_rounds: int) -> Tuple[int, int, int]:
+    # -> (wins of class_a, wins of class_b, draws); sides alternate so first-move bias cancels
+    specs = _compiled.get(table_json)
+    if specs is None:
+        if len(_compiled) > 64:
+            _compiled.clear()
+            _pool.clear()
+        specs = _compiled[table_json] = compile_class_table(json.loads(table_json))
+    pick = POLICIES[policy]
+    rng = random.Random(seed)
+    wins_a = wins_b = draws = 0
+    for g in range(games):
+        a_first = g % 2 == 0
+        team1, team2 = ([class_a], [class_b]) if a_first else ([class_b], [class_a])
+        sim = Simulation(team1, team2, seed=rng.randrange(2 ** 32), policies={"Team 1": pick, "Team 2": pick},
+                         max_rounds=max_rounds, specs=specs, pool=_pool)
+        winner = sim.run()["winner"]
+        sim.release()
+        if winner == "Draw":
+            draws += 1
+        elif (winner == "Team 1") == a_first:
+            wins_a += 1
+        else:
+            wins_b += 1
+    return wins_a, wins_b, draws
+
+
+# ----------------------------
+# Sequential test per matchup
+# ----------------------------
+class MatchupTest:
+    # Two-sided SPRT of p = 0.5 against p = 0.5 +/- delta, on class_a's score (draw = half a win)
+    def __init__(self, delta: float, alpha: float, beta: float, max_games: int):
+        self.up = math.log((0.5 + delta) / 0.5)
+        self.down = math.log((0.5 - delta) / 0.5)
+        self.accept_h1 = math.log((1 - beta) / alpha)
+        self.accept_h0 = math.log(beta / (1 - alpha))
+        self.max_games = max_games
+        self.score = 0.0
+        self.games = 0
+        self.draws = 0
+        self.verdict: Optional[str] = None  # "balanced", "imbalanced" or "undecided" (hit max_games)
+
+    def add(self, wins: int, losses: int, draws: int):
+        self.score += wins + 0.5 * draws
+        self.games += wins + losses + draws
+        self.draws += draws
+        s, f = self.score, self.games - self.score
+        llr_high = s * self.up + f * self.down    # evidence for p = 0.5 + delta
+        llr_low = s * self.down + f * self.up     # evidence for p = 0.5 - delta
+        if llr_high >= self.accept_h1 or llr_low >= self.accept_h1:
+            self.verdict = "imbalanced"
+        elif llr_high <= self.accept_h0 and llr_low <= self.accept_h0:
+            self.verdict = "balanced"
+        elif self.games >= self.max_games:
+            self.verdict = "undecided"
+
+    @property
+    def rate(self) -> float:
+        return self.score / self.games if self.games else 0.5
+
+    def imbalance_bounds(self, draw_weight: float, z: float = 2.0) -> Tuple[float, float]:
+        # (optimistic, point) estimate of |rate - 0.5| + draw_weight * draw rate
+        if not self.games:
+            return 0.0, 0.0
+        dev = abs(self.rate - 0.5)
+        draw_rate = self.draws / self.games
+        se = math.sqrt(0.25 / self.games)  # widest binomial standard error, used for both terms
+        return max(0.0, dev - z * se) + draw_weight * max(0.0, draw_rate - z * se), dev + draw_weight * draw_rate
+
+
+# ----------------------------
+# Optimizer
+# ----------------------------
+class BalanceOptimizer:
+    def __init__(self, base_table: Optional[dict] = None, workers: Optional[int] = None, batch: int = 40,
+                 delta: float = 0.05, alpha: float = 0.05, beta: float = 0.05, max_games: int = 2000,
+                 draw_weight: float = 0.5, policy: str = "greedy", max_rounds: int = 60, seed: int = 0,
+                 cache_path: Optional[str] = None):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown policy: {policy}")
+        self.base = base_table or load_class_table()
+        self.classes = list(self.base)
+        self.pairs = list(combinations(self.classes, 2))
+        self.batch = batch
+        self.test_args = (delta, alpha, beta, max_games)
+        self.draw_weight = draw_weight
+        self.policy = policy
+        self.max_rounds = max_rounds
+        self.rng = random.Random(seed)
+        self.pool = ProcessPoolExecutor(max_workers=workers or os.cpu_count())
+        self.cache_path = cache_path
+        # stat vector -> (imbalance, exact); exact=False: rejected early, imbalance is a lower bound
+        self.cache: Dict[Vector, Tuple[float, bool]] = {}
+        self.fingerprint = self._fingerprint(batch)
+        if cache_path and os.path.exists(cache_path):
+            with open(cache_path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            if isinstance(saved, dict) and saved.get("fingerprint") == self.fingerprint:
+                self.cache = {tuple(v): (score, exact) for v, score, exact in saved["entries"]}
+            else:
+                print(f"Ignoring {cache_path}: computed with other settings or class data")
+        self.games_played = 0
+        self.cache_hits = 0
+        self.rejected_early = 0
+
+    def close(self):
+        self.pool.shutdown()
+        self.save_cache()
+
+    # Purpose: Hash of everything besides the stat vector that a cached score depends on
+    def _fingerprint(self, batch: int) -> str:
+        untuned = vector_to_table(self.base, (0,) * len(table_to_vector(self.base)))
+        settings = {"table": untuned, "test": self.test_args, "draw_weight": self.draw_weight,
+                    "policy": self.policy, "max_rounds": self.max_rounds, "batch": batch}
+        return hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def save_cache(self):
+        if self.cache_path:
+            with open(self.cache_path, "w", encoding="utf-8") as f:
+                json.dump({"fingerprint": self.fingerprint,
+                           "entries": [[list(v), score, exact] for v, (score, exact) in self.cache.items()]}, f)
+
+    # Purpose: Imbalance of one stat vector; stops early once it cannot beat cutoff
+    def evaluate(self, vector: Vector, cutoff: float = math.inf) -> float:
+        cached = self.cache.get(vector)
+        if cached is not None:
+            score, exact = cached
+            if exact:
+                self.cache_hits += 1
+                return score
+            if score > cutoff:  # the bound proved then still rules it out
+                self.cache_hits += 1
+                return math.inf
+        table_json = json.dumps(vector_to_table(self.base, vector))
+        tests = {pair: MatchupTest(*self.test_args) for pair in self.pairs}
+        round_no = 0
+        while True:
+            open_pairs = [pair for pair, t in tests.items() if t.verdict is None]
+            if not open_pairs:
+                break
+            futures = {pair: self.pool.submit(play_batch, table_json, pair[0], pair[1], self.batch,
+                                              zlib.crc32(repr((vector, pair, round_no)).encode()), self.policy,
+                                              self.max_rounds)
+                       for pair in open_pairs}
+            for pair, future in futures.items():
+                result = future.result()
+                tests[pair].add(*result)
+                self.games_played += sum(result)
+            round_no += 1
+            optimistic = sum(t.imbalance_bounds(self.draw_weight)[0] for t in tests.values()) / len(tests)
+            if optimistic > cutoff:
+                self.rejected_early += 1
+                self.cache[vector] = (optimistic, False)
+                return math.inf
+        score = sum(t.imbalance_bounds(self.draw_weight)[1] for t in tests.values()) / len(tests)
+        self.cache[vector] = (score, True)
+        return score
+
+    # Purpose: Hill climb from the base table for at most budget seconds
+    def optimize(self, budget: float, neighbours_per_step: int = 6, log=print) -> Tuple[dict, float]:
+        deadline = time.monotonic() + budget
+        best = table_to_vector(self.base)
+        best_score = self.evaluate(best)
+        log(f"start: imbalance {best_score:.4f}")
+        step = 0
+        while time.monotonic() < deadline:
+            step += 1
+            improved = False
+            for candidate in neighbours(best, self.rng, neighbours_per_step):
+                if time.monotonic() >= deadline:
+                    break
+                score = self.evaluate(candidate, cutoff=best_score)
+                if score < best_score:
+                    best, best_score, improved = candidate, score, True
+            log(f"step {step}: imbalance {best_score:.4f}{' (improved)' if improved else ''} | "
+                f"{self.games_played} games, {len(self.cache)} cached, {self.cache_hits} cache hits, "
+                f"{self.rejected_early} rejected early")
+            self.save_cache()
+        return vector_to_table(self.base, best), best_score
+
+    # Purpose: Per-matchup win rates of a table, for reporting
+    def matchup_report(self, table: dict, games: int = 400) -> List[Tuple[str, str, float, float]]:
+        # [(class_a, class_b, class_a score, draw rate)]
+        table_json = json.dumps(table)
+        futures = [(pair, self.pool.submit(play_batch, table_json, pair[0], pair[1], games, i, self.policy,
+                                           self.max_rounds))
+                   for i, pair in enumerate(self.pairs)]
+        report = []
+        for (a, b), future in futures:
+            wins_a, wins_b, draws = future.result()
+            report.append((a, b, (wins_a + 0.5 * draws) / games, draws / games))
+        return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tune class stats for balanced 1v1 matchups")
+    parser.add_argument("--budget", type=float, default=3600, help="seconds to search")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--policy", choices=list(POLICIES), default="greedy")
+    parser.add_argument("--delta", type=float, default=0.05, help="win-rate deviation that counts as imbalanced")
+    parser.add_argument("--draw-weight", type=float, default=0.5, help="imbalance added per unit of draw rate")
+    parser.add_argument("--max-games", type=int, default=2000, help="most games per matchup per candidate")
+    parser.add_argument("--max-rounds", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cache", default=None, help="JSON file of evaluated stat vectors, reused across runs")
+    parser.add_argument("--out", default=None, help="write the tuned table here (class_data.json format)")
+    args = parser.parse_args()
+
+    opt = BalanceOptimizer(workers=args.workers, delta=args.delta, max_games=args.max_games,
+                           draw_weight=args.draw_weight, policy=args.policy,
+                           max_rounds=args.max_rounds, seed=args.seed, cache_path=args.cache)
+    try:
+        table, score = opt.optimize(args.budget)
+        print(f"best imbalance {score:.4f}")
+        for a, b, rate, draw_rate in opt.matchup_report(table):
+            print(f"  {a:>12} vs {b:<12} {rate:6.1%}  ({draw_rate:.0%} draws)")
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as f:
+                json.dump(table, f, indent=2)
+            print(f"wrote {args.out}")
+    finally:
+        opt.close()
@@ -0,0 +1,274 @@
+# battle_env.py
+#
+# Gym-style reinforcement-learning environment over the headless simulator.
+# The agent controls every Team 1 character; Team 2 is played by an opponent
+# policy (simulator.random_policy by default). One step = one decision of one
+# Team 1 actor; opponent turns, stunned turns and poison ticks in between are
+# played out inside step().
+#
+# Observations are fixed-shape float32 vectors with the fields serialize_state
+# sends (hp, defense, cooldown, effect durations) plus alive/acting flags and
+# a class one-hot, laid out in fixed team slots. Actions are discrete:
+# action = kind * MAX_TEAM + slot, kind in ACTION_KINDS, slot a team position.
+# A boolean mask marks the legal ones (cooldowns, living targets).
+#
+# VecBattleEnv steps many environments in one call and writes straight into
+# preallocated NumPy arrays (no per-step dicts), auto-resetting finished ones.
+# An observation row is written in full once per episode; after that a step
+# only rewrites the slots of characters whose hp, defense, cooldown, effects
+# or acting flag changed (usually the actor and its target).
+#
+# Needs NumPy (pip install numpy); elsewhere only turn_trace.py's analysis
+# helpers use it.
+#
+#   python battle_env.py --envs 64 --steps 100000
+
+import argparse
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from character import CharacterPool
+from simulator import Simulation, random_policy, random_lineups
+from class_table import AVAILABLE_CLASSES, CLASS_SPECS
+from status_effects import StunEffect, PoisonEffect, DefenseBoostEffect
+
+MAX_TEAM = 3
+ACTION_KINDS = ("attack", "defend", "special")
+N_ACTIONS = len(ACTION_KINDS) * MAX_TEAM
+ATTACK, DEFEND, SPECIAL = range(len(ACTION_KINDS))
+
+CLASS_INDEX = {name: i for i, name in enumerate(AVAILABLE_CLASSES)}
+MAX_HP = {name: float(spec.hp) for name, spec in CLASS_SPECS.items()}
+DEFENSE_SCALE = 50.0
+COOLDOWN_SCALE = float(max(spec.cooldown for spec in CLASS_SPECS.values()) or 1)
+DURATION_SCALE = 5.0
+EFFECT_COLUMN = {StunEffect: 5, PoisonEffect: 6, DefenseBoostEffect: 7}
+
+# per slot: present, alive, hp, defense, cooldown, stun, poison, boost, acting, class one-hot
+SLOT_SIZE = 9 + len(AVAILABLE_CLASSES)
+OBS_SIZE = 2 * MAX_TEAM * SLOT_SIZE + 1  # own slots, enemy slots, round progress
+DYNAMIC = 8  # columns 1..8 of a slot change during an episode; present and the one-hot do not
+
+
+class BattleEnv:
+    def __init__(self, team_size: int = 1, seed: Optional[int] = None, opponent=random_policy,
+                 max_rounds: int = 100, lineups: Optional[Tuple[List[str], List[str]]] = None):
+        if not 1 <= team_size <= MAX_TEAM:
+            raise ValueError(f"team_size must be between 1 and {MAX_TEAM}")
+        if not isinstance(max_rounds, int) or max_rounds < 1:
+            raise ValueError("max_rounds must be a positive integer: the last observation feature is rounds / max_rounds")
+        self.team_size = team_size
+        self.rng = random.Random(seed)
+        self.opponent = opponent
+        self.max_rounds = max_rounds
+        self.lineups = lineups  # fixed (team1, team2) classes; random distinct picks when None
+        self.sim: Optional[Simulation] = None
+        self.pool = CharacterPool()  # each episode reuses the previous one's characters
+        self.actor = None  # Team 1 character whose decision the next step() applies
+        self.slot_of: Dict[int, int] = {}  # id(character) -> position in its team
+        self.slots: List[tuple] = []  # (offset of the slot in obs, character), filled slots only
+        self.written: List[Optional[tuple]] = []  # per filled slot: the values its row holds now
+        self._obs = np.zeros(OBS_SIZE, dtype=np.float32)  # reset()/step() encode here, then copy out
+        self.episodes = 0
+
+    # ---------- Gym API ----------
+    def reset(self, seed: Optional[int] = None):
+        # -> (observation, info); info["action_mask"] holds the legal actions
+        mask = np.zeros(N_ACTIONS, dtype=bool)
+        self._reset_into(self._obs, mask, seed)
+        return self._obs.copy(), {"action_mask": mask}
+
+    def step(self, action: int):
+        # -> (observation, reward, terminated, truncated, info)
+        mask = np.zeros(N_ACTIONS, dtype=bool)
+        reward, terminated, truncated = self._step_into(int(action), self._obs, mask)
+        return self._obs.copy(), reward, terminated, truncated, {"action_mask": mask, "winner": self.sim.winner}
+
+    def action_mask(self) -> np.ndarray:
+        mask = np.zeros(N_ACTIONS, dtype=bool)
+        self._write_mask(mask)
+        return mask
+
+    # ---------- in-place versions used by VecBattleEnv ----------
+    # obs must be the same row on every call until the next _reset_into(): steps only write what changed
+    def _reset_into(self, obs: np.ndarray, mask: np.ndarray, seed: Optional[int] = None):
+        if seed is not None:
+            self.rng.seed(seed)
+        self.actor = None
+        while self.actor is None:  # in the rare match Team 1 never gets to act, deal again
+            if self.sim is not None:
+                self.sim.release()
+            team1, team2 = self.lineups or random_lineups(self.rng, self.team_size)
+            self.sim = Simulation(team1, team2, seed=self.rng.randrange(2 ** 32),
+                                  policies={"Team 2": self.opponent}, max_rounds=self.max_rounds, pool=self.pool)
+            self.slot_of = {id(c): slot for team in self.sim.teams.values() for slot, c in enumerate(team)}
+            self._advance()
+        self._write_static(obs)
+        self._write_obs(obs)
+        self._write_mask(mask)
+
+    def _step_into(self, action: int, obs: np.ndarray, mask: np.ndarray) -> Tuple[float, bool, bool]:
+        if self.actor is None:
+            raise ValueError("episode is over, call reset()")
+        if not 0 <= action < N_ACTIONS:
+            raise ValueError(f"action must be in [0, {N_ACTIONS})")
+        sim, c = self.sim, self.actor
+        kind, slot = divmod(action, MAX_TEAM)
+        name, index = self._resolve(c, kind, slot)
+        sim.apply_action(c, name, index)
+        if sim.end_turn():
+            self._advance()
+        else:
+            self.actor = None
+        self._write_obs(obs)
+        self._write_mask(mask)
+        if self.actor is not None:
+            return 0.0, False, False
+        self.episodes += 1
+        winner = sim.winner
+        if winner == "Draw":
+            return 0.0, False, True  # round limit reached: truncated
+        return (1.0 if winner == "Team 1" else -1.0), True, False
+
+    # Purpose: Plays opponent and skipped turns until a Team 1 actor has to decide (or the match ends)
+    def _advance(self):
+        sim = self.sim
+        self.actor = None
+        while sim.winner is None:
+            c = sim.begin_turn()
+            if c is None:
+                continue
+            if sim.team_of[id(c)] == "Team 1":
+                self.actor = c
+                return
+            action, target_index = self.opponent(sim, c)
+            sim.apply_action(c, action, target_index)
+            sim.end_turn()
+
+    # Purpose: Turns (kind, slot) into the simulator's (action, target index); illegal picks defend
+    def _resolve(self, c, kind: int, slot: int) -> Tuple[str, Optional[int]]:
+        table = self.sim.legal_actions(c)
+        action = ACTION_KINDS[kind]
+        if action not in table.actions:
+            return "defend", None
+        if not table.needs_target(action):
+            return action, None
+        for i, t in enumerate(table.targets(action)):
+            if self.slot_of[id(t)] == slot:
+                return action, i
+        return "defend", None
+
+    # ---------- encoding ----------
+    # Purpose: Clears obs and writes what stays fixed for the episode (present flags, class one-hots)
+    def _write_static(self, obs: np.ndarray):
+        obs[:] = 0.0
+        self.slots = []
+        for t, team_name in enumerate(("Team 1", "Team 2")):
+            for slot, c in enumerate(self.sim.teams[team_name]):
+                offset = (t * MAX_TEAM + slot) * SLOT_SIZE
+                obs[offset] = 1.0
+                obs[offset + 9 + CLASS_INDEX[c.name]] = 1.0
+                self.slots.append((offset, c))
+        self.written = [None] * len(self.slots)
+
+    # Purpose: Rewrites the dynamic columns of every slot whose character changed since the last write
+    def _write_obs(self, obs: np.ndarray):
+        acting = self.actor
+        written = self.written
+        for i, (offset, c) in enumerate(self.slots):
+            effects = c.status_effects
+            key = (c.hp, c.defense, c.special_move_cooldown, c is acting,
+                   tuple([(type(e), e.duration) for e in effects]) if effects else ())
+            if key == written[i]:
+                continue
+            written[i] = key
+            hp = c.hp
+            row = [float(hp > 0), max(hp, 0) / MAX_HP[c.name], c.defense / DEFENSE_SCALE,
+                   c.special_move_cooldown / COOLDOWN_SCALE, 0.0, 0.0, 0.0, float(c is acting)]
+            for effect in effects:
+                col = EFFECT_COLUMN.get(type(effect))
+                if col is not None:
+                    row[col - 1] = max(row[col - 1], effect.duration / DURATION_SCALE)
+            obs[offset + 1:offset + 1 + DYNAMIC] = row
+        obs[-1] = self.sim.rounds / self.sim.max_rounds
+
+    def _write_mask(self, mask: np.ndarray):
+        mask[:] = False
+        if self.actor is None:
+            return
+        table = self.sim.legal_actions(self.actor)
+        for action in table.actions:
+            base = ACTION_KINDS.index(action) * MAX_TEAM
+            if table.needs_target(action):
+                for t in table.targets(action):
+                    mask[base + self.slot_of[id(t)]] = True
+            else:
+                mask[base] = True
+
+
+class VecBattleEnv:
+    # Steps num_envs environments per call. Returned arrays are reused between
+    # calls (copy them to keep a history); finished environments reset in place,
+    # so their row already holds the next episode's first observation.
+    def __init__(self, num_envs: int, team_size: int = 1, seed: int = 0, opponent=random_policy,
+                 max_rounds: int = 100):
+        self.num_envs = num_envs
+        seeds = random.Random(seed)
+        self.envs = [BattleEnv(team_size, seeds.randrange(2 ** 32), opponent, max_rounds) for _ in range(num_envs)]
+        self.obs = np.zeros((num_envs, OBS_SIZE), dtype=np.float32)
+        self.action_mask = np.zeros((num_envs, N_ACTIONS), dtype=bool)
+        self.rewards = np.zeros(num_envs, dtype=np.float32)
+        self.terminated = np.zeros(num_envs, dtype=bool)
+        self.truncated = np.zeros(num_envs, dtype=bool)
+
+    def reset(self) -> Tuple[np.ndarray, np.ndarray]:
+        # -> (obs[num_envs, OBS_SIZE], action_mask[num_envs, N_ACTIONS])
+        for i, env in enumerate(self.envs):
+            env._reset_into(self.obs[i], self.action_mask[i])
+        return self.obs, self.action_mask
+
+    def step(self, actions):
+        # -> (obs, rewards, terminated, truncated, action_mask), all batched
+        obs, mask = self.obs, self.action_mask
+        rewards, terminated, truncated = self.rewards, self.terminated, self.truncated
+        for i, (env, action) in enumerate(zip(self.envs, actions.tolist() if hasattr(actions, "tolist") else actions)):
+            r, term, trunc = env._step_into(action, obs[i], mask[i])
+            rewards[i], terminated[i], truncated[i] = r, term, trunc
+            if term or trunc:
+                env._reset_into(obs[i], mask[i])
+        return obs, rewards, terminated, truncated, mask
+
+    @property
+    def episodes(self) -> int:
+        return sum(env.episodes for env in self.envs)
+
+
+# Purpose: Uniform choice among the legal actions of every row
+def sample_masked(rng: np.random.Generator, mask: np.ndarray) -> np.ndarray:
+    scores = rng.random(mask.shape) * mask
+    return scores.argmax(axis=1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Random-agent throughput of the vectorized battle environment")
+    parser.add_argument("--envs", type=int, default=64)
+    parser.add_argument("--steps", type=int, default=100000)
+    parser.add_argument("--mode", choices=["1v1", "2v2", "3v3"], default="1v1")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    vec = VecBattleEnv(args.envs, team_size=int(args.mode[0]), seed=args.seed)
+    rng = np.random.default_rng(args.seed)
+    obs, mask = vec.reset()
+    wins = 0.0
+    start = time.perf_counter()
+    for _ in range(args.steps // args.envs):
+        obs, rewards, terminated, truncated, mask = vec.step(sample_masked(rng, mask))
+        wins += float((rewards > 0).sum())
+    elapsed = time.perf_counter() - start
+    steps = args.steps // args.envs * args.envs
+    print(f"{steps} steps in {elapsed:.2f}s ({steps / elapsed:,.0f} steps/s, {steps / elapsed * 3600 / 1e6:.1f}M/hour), "
+          f"{vec.episodes} episodes, random agent won {wins:.0f}")
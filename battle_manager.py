@@ -1,145 +1,290 @@
+import argparse
 import random
+import sys
+import time
 from character import CharacterFactory
+from class_table import AVAILABLE_CLASSES
 from actions import AttackAction, DefendAction, SpecialMoveAction
+from initiative import InitiativeScheduler
+from legal_actions import LivingIndex, ActionTable
+from damage_matrix import DamageMatrix
+
+def _quiet(*args, **kwargs):
+    pass
 
 # Purpose: Creates and handles the game logic and performance
+# read/say default to input/print; batch mode passes a ScriptedInput and a no-op,
+# and interactive=False skips the per-turn status screen and the "Press Enter" wait.
 class BattleManager:
-    def __init__(self):
+    def __init__(self, read=input, say=print, interactive=True, seed=None, max_rounds=None):
+        self.read = read # answers every prompt
+        self.say = say # menus, prompts and combat messages
+        self.interactive = interactive
+        self.rng = random.Random(seed) if seed is not None else random # dodge, effect and initiative rolls
+        self.max_rounds = max_rounds # None = play until a team is eliminated, else a draw after this many rounds
+        self.turns = 0
         self.players = [] # list of players
         self.teams = {"Team 1": [], "Team 2": []} # List of characters on each team
-        self.turn_order = [] # list of turn order
+        self.turn_order = None # initiative scheduler, built once characters are picked
+        self.living = None # living characters per team, updated on every elimination
+        self.damage = None # damage matrix, reused until defend/boosts change a stat
         self.actions = {"1": AttackAction(), "2": DefendAction(), "3": SpecialMoveAction()} # Actions characters can perform
 
      # Purpose: Menu with player choices
     def setup_game(self):
         while True: # while number is 1,2 or 3
-            print("\nChoose battle mode: ") # choose amount of players vs players
-            print("1. 1v1")
-            print("2. 2v2")
-            print("3. 3v3")
-            mode_choice = input("Enter your choice (1-3): ")
+            self.say("\nChoose battle mode: ") # choose amount of players vs players
+            self.say("1. 1v1")
+            self.say("2. 2v2")
+            self.say("3. 3v3")
+            mode_choice = self.read("Enter your choice (1-3): ")
 
             if mode_choice in ["1", "2", "3"]:
                 team_size = int(mode_choice) # creates team size based on number chosen
                 break # breaks if number is no 1 2 or 3
-            print("Invalid choice. Please enter 1, 2, or 3.")
+            self.say("Invalid choice. Please enter 1, 2, or 3.")
         # number of teams is muliplied by 2 to get amount of players
         total_players = team_size * 2
-        available_classes = ["Gladiator", "Voidcaster", "Stormstriker", "Nightstalker", "Stoneguard", "Soulmender"] # lists availibale characters
+        available_classes = AVAILABLE_CLASSES.copy() # lists availibale characters (from the class table)
 
 
         for i in range(total_players):
             team_name = "Team 1" if i % 2 == 0 else "Team 2" # if even set to team 1 if odd set to team 2
-            print(f"\n{team_name}, Player {len(self.teams[team_name]) + 1}, choose a character:") # determines the player's number in their team
+            self.say(f"\n{team_name}, Player {len(self.teams[team_name]) + 1}, choose a character:") # determines the player's number in their team
             for idx, char_name in enumerate(available_classes): # generates an index (idx) and character name
-                print(f"{idx+1}. {char_name}") # ensures list starts from 1 and not 0
+                self.say(f"{idx+1}. {char_name}") # ensures list starts from 1 and not 0
 
             while True:
-                choice = input("Enter the number of your character: ")
+                choice = self.read("Enter the number of your character: ")
                 if choice.isdigit() and 1 <= int(choice) <= len(available_classes): # ensures input is number and charcater has not been chosen
                     selected_character = available_classes.pop(int(choice)-1) # pops haracter chosen and mkaes list of characters -1
                     character = CharacterFactory.create_character(selected_character) # uses factory pattern to instantiate the selected character.
+                    character.rng = self.rng
+                    character.log = self.say
                     self.teams[team_name].append(character) # assis=gns character to the team
                     self.players.append(character) # ads character to gobal list of players
                     break
-                print("Invalid choice. Try again.")
+                self.say("Invalid choice. Try again.")
 
-        self.turn_order = self.players[:] #Creates a copy of self.players for the turn order
-        random.shuffle(self.turn_order) #Randomizes the order of player turns
+        self.turn_order = InitiativeScheduler(self.players, rng=self.rng) # faster characters act first, ties broken randomly
+        self.living = LivingIndex(self.teams) # target lists come from here instead of rescanning the teams
+        self.damage = DamageMatrix(self.players).attach() # damage and dodge per attacker/defender pair
 
     # Purpose: Main game loop
     def play_game(self):
         while self.check_team_alive("Team 1") and self.check_team_alive("Team 2"): # ensures there is atleast a character alive in both teams
-            for player in self.turn_order:
-                if player.hp <= 0: # if players hp is below zero, skip them
-                    continue
-
-                player.process_status_effects() # applies the ongoing status effect
-                self.decrement_cooldowns() #decrement the cooldown for special move
-
-                if player.is_stunned():
-                    print(f"{player.name} is stunned and skips their turn!")
-                    continue   # if player is stunned skip them
-
-                print(f"\n{player.name}'s turn!")
-                print("1. Attack  2. Defend  3. Special Move")
-                choice = input("Choose an action: ") # prompts player to choose to attack, defend, or use special move
-
-                # determines which team player should attack
-                enemy_team = "Team 1" if player in self.teams["Team 2"] else "Team 2"
-                target_team = self.teams[enemy_team]
-
-                if choice == "2": # player chose defend
-                    self.actions[choice].execute(player) # double defense for that turn
-                elif choice == "3": # special move has been chosen
-                    if player.target_type == "enemy": # if target is the enemy
-                        if player.is_aoe: # checks if player is in area of effect
-                            player.special_move(target_team) # special move is executed on the entire enemy team
-                        else:
-                            target = self.choose_target(player) # target is set to the player the attacker chose
-                            player.special_move(target) # speical mvoe is executed on target
-                    elif player.target_type == "ally": # if target is ally
-                        target = self.choose_ally(player) # choose which character you want to perform speical move
-                        player.special_move(target) # speical move is done on target
-                    elif player.target_type == "self": # target is the current player
-                        player.special_move(player) # perform special on themselves
-                else: # player selects target
-                    target = self.choose_target(player)
-                    self.actions[choice].execute(player, target) # choose what action
+            player = self.turn_order.next_actor() # fastest character that has not acted this round
+            if self.max_rounds is not None and self.turn_order.round >= self.max_rounds:
+                self.say("\nRound limit reached, the battle is a draw!")
+                return "Draw"
+
+            stunned = player.is_stunned() # checked before effects tick so a 1 turn stun still costs a turn
+            player.process_status_effects() # applies the ongoing status effect
+            self.decrement_cooldowns() #decrement the cooldown for special move
+
+            if player.hp <= 0: # poison finished the player off
+                self.eliminate(player)
+                continue
+            if stunned:
+                self.say(f"{player.name} is stunned and skips their turn!")
+                continue   # if player is stunned skip them
+
+            table = ActionTable(player, self.living) # legal actions and targets for this turn
+            self.say(f"\n{player.name}'s turn!")
+            self.say("1. Attack  2. Defend  3. Special Move")
+            while True:
+                choice = self.read("Choose an action: ") # prompts player to choose to attack, defend, or use special move
+                if choice in self.actions:
+                    break
+                self.say("Invalid choice. Try again.")
+
+            affected = [] # characters that may have been eliminated by this action
+
+            if choice == "2": # player chose defend
+                self.actions[choice].execute(player) # double defense for that turn
+            elif choice == "3": # special move has been chosen
+                if table.special is None: # still on cooldown, the special move prints how long
+                    player.special_move(player)
+                elif table.special == "all": # area of effect
+                    affected = list(table.enemies)
+                    player.special_move(affected) # special move is executed on the entire enemy team
+                elif table.special == "enemy": # if target is the enemy
+                    target = self.choose_target(player, table) # target is set to the player the attacker chose
+                    player.special_move(target) # speical mvoe is executed on target
+                    affected = [target]
+                elif table.special == "ally": # if target is ally
+                    target = self.choose_ally(player, table) # choose which character you want to perform speical move
+                    player.special_move(target) # speical move is done on target
+                else: # target is the current player
+                    player.special_move(player) # perform special on themselves
+            else: # player selects target
+                target = self.choose_target(player, table)
+                self.actions[choice].execute(player, target) # choose what action
+                affected = [target]
 
+            for character in affected: # drop eliminated characters from the turn order
+                if character.hp <= 0:
+                    self.eliminate(character)
+
+            self.turns += 1
+            if self.interactive:
                 self.display_status()
-                input("Press Enter to continue...")
+                self.read("Press Enter to continue...")
         # checks if Team 1 has players alive, if not team 2 is chosen
         winning_team = "Team 1" if self.check_team_alive("Team 1") else "Team 2"
-        print(f"\n{winning_team} wins the battle!")
+        self.say(f"\n{winning_team} wins the battle!")
+        return winning_team
     #Purpose: checks if players on team are alive
     def check_team_alive(self, team_name):
-        return any(player.hp > 0 for player in self.teams[team_name]) # checks if any player in team has hp over 0
+        return self.living.alive(team_name) # checks if any player in team has hp over 0
+
+    #Purpose: Removes an eliminated character from the turn order and the target lists
+    def eliminate(self, character):
+        self.turn_order.remove(character)
+        self.living.remove(character)
 
     #Purpose: Choose the target
-    def choose_target(self, player):
-        enemy_team = "Team 1" if player in self.teams["Team 2"] else "Team 2"
-        available_targets = [p for p in self.teams[enemy_team] if p.hp > 0] # first determines whether the player belongs to Team 1 or Team 2, then selects the available allies from the appropriate team
+    def choose_target(self, player, table=None):
+        available_targets = (table or ActionTable(player, self.living)).enemies # living enemies, from the turn's action table
 
-        print("Choose a target:")
+        self.say("Choose a target:")
         for idx, target in enumerate(available_targets):
-            print(f"{idx+1}. {target.name} (HP: {target.hp})")
+            self.say(f"{idx+1}. {target.name} (HP: {target.hp})")
 
         while True:
-            choice = input("Enter target number: ")
+            choice = self.read("Enter target number: ")
             if choice.isdigit() and 1 <= int(choice) <= len(available_targets):
                 return available_targets[int(choice)-1]
-            print("Invalid choice. Try again.")
+            self.say("Invalid choice. Try again.")
 
-    def choose_ally(self, player):
-        available_allies = [p for p in self.teams["Team 1"] if p.hp > 0] if player in self.teams["Team 1"] else [p for p in self.teams["Team 2"] if p.hp > 0]
+    def choose_ally(self, player, table=None):
+        available_allies = (table or ActionTable(player, self.living)).allies # living allies, from the turn's action table
 
-        print("Choose an ally:")
+        self.say("Choose an ally:")
         for idx, ally in enumerate(available_allies): # displays the characters names and hp of availble allies
-            print(f"{idx+1}. {ally.name} (HP: {ally.hp})")
+            self.say(f"{idx+1}. {ally.name} (HP: {ally.hp})")
 
         while True:
-            choice = input("Enter ally number: ") # choose an ally charcater
+            choice = self.read("Enter ally number: ") # choose an ally charcater
             if choice.isdigit() and 1 <= int(choice) <= len(available_allies): # if input is a number and the charcater is availble and an ally
                 return available_allies[int(choice) - 1] # return the list decremented by 1
-            print("Invalid choice. Try again.")
+            self.say("Invalid choice. Try again.")
 
     # Purpose: Display the status of Battle
     def display_status(self):
-        print("\nCurrent Battle Status:")
+        self.say("\nCurrent Battle Status:")
         for team_name, players in self.teams.items(): # Loops over each teams players and siplayes hp
-            print(f"\n{team_name}:")
+            self.say(f"\n{team_name}:")
             for player in players:
-                print(f"{player.name}: {player.hp} HP")
+                self.say(f"{player.name}: {player.hp} HP")
         # Prints the cooldown status of each player and how many turn left for it to be availble
         for player in self.players:
-            print(f"{player.special_move_cooldown} turns until {player.name}'s special move is off cooldown.")
+            self.say(f"{player.special_move_cooldown} turns until {player.name}'s special move is off cooldown.")
+        # Shows who acts next
+        upcoming = self.turn_order.preview(len(self.turn_order))
+        self.say("Next up: " + ", ".join(p.name for p in upcoming))
     # Purpose: Decrements players specila move cooldowns
     def decrement_cooldowns(self):
         for player in self.players:
             player.special_move_cooldown = max(0, player.special_move_cooldown - 1) # loops through players reducing cooldown by 1 ensuring it doesnt go below 0
 
+# Purpose: Answers prompts from a script, one whitespace-separated token per prompt
+# Tokens come from any iterable of lines (a file, sys.stdin); "#" starts a comment.
+class ScriptedInput:
+    def __init__(self, lines):
+        self._tokens = (token for line in lines for token in line.split("#", 1)[0].split())
+        self._next = None
+        self.used = 0 # tokens consumed so far
+
+    def __call__(self, prompt=""):
+        if not self.has_more():
+            raise EOFError("script ran out of input")
+        token, self._next = self._next, None
+        self.used += 1
+        return token
+
+    def has_more(self):
+        if self._next is None:
+            self._next = next(self._tokens, None)
+        return self._next is not None
+
+# Purpose: Wraps a reader and writes every answer to a file, one prompt per line
+# (recorded interactive games can be replayed with --batch)
+class RecordingInput:
+    def __init__(self, read, out):
+        self.read = read
+        self.out = out
+
+    def __call__(self, prompt=""):
+        answer = self.read(prompt)
+        if prompt != "Press Enter to continue...":
+            self.out.write(answer.strip() + "\n")
+        return answer
+
+# Purpose: Plays every match in a script back to back without printing, adds them to summary
+# Match i is seeded with seed + i, so a script replays identically.
+def run_batch(lines, seed=0, max_rounds=None, say=_quiet, summary=None):
+    script = ScriptedInput(lines)
+    summary = summary or new_summary()
+    start = time.perf_counter()
+    played = 0
+    while script.has_more():
+        game = BattleManager(read=script, say=say, interactive=False, seed=seed + played, max_rounds=max_rounds)
+        try:
+            game.setup_game()
+            winner = game.play_game()
+        except EOFError:
+            summary["incomplete"] += 1 # the script stopped in the middle of this match
+            break
+        played += 1
+        summary["matches"] += 1
+        summary["turns"] += game.turns
+        summary["winners"][winner] += 1
+    summary["tokens"] += script.used
+    summary["seconds"] += time.perf_counter() - start
+    return summary
+
+def new_summary():
+    return {"matches": 0, "incomplete": 0, "turns": 0, "tokens": 0, "seconds": 0.0,
+            "winners": {"Team 1": 0, "Team 2": 0, "Draw": 0}}
+
+def format_summary(summary):
+    seconds = max(summary["seconds"], 1e-9)
+    winners = ", ".join(f"{team}: {n}" for team, n in summary["winners"].items())
+    avg_turns = summary["turns"] / summary["matches"] if summary["matches"] else 0.0
+    return (f"{summary['matches']} matches ({summary['incomplete']} incomplete) in {summary['seconds']:.2f}s, "
+            f"{summary['tokens'] / seconds:,.0f} decisions/s\n"
+            f"{winners}\naverage turns per match: {avg_turns:.1f}")
+
 if __name__ == "__main__":
-    game = BattleManager()
-    game.setup_game()
-    game.play_game()
+    parser = argparse.ArgumentParser(description="Turn-based battle on the command line")
+    parser.add_argument("--batch", metavar="FILE", help="read every answer from FILE ('-' for stdin) and print a summary")
+    parser.add_argument("--repeat", type=int, default=1, help="play the batch script this many times (same seeds)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first batch match (match i uses seed + i)")
+    parser.add_argument("--max-rounds", type=int, default=None, help="declare a draw after this many rounds")
+    parser.add_argument("--verbose", action="store_true", help="print prompts and combat messages in batch mode")
+    parser.add_argument("--record", metavar="FILE",
+                        help="save the answers of an interactive game (seeded with --seed) for --batch")
+    args = parser.parse_args()
+
+    if args.batch:
+        source = sys.stdin if args.batch == "-" else open(args.batch, "r", encoding="utf-8")
+        with source:
+            lines = source.readlines()
+        summary = new_summary()
+        for _ in range(args.repeat):
+            run_batch(lines, seed=args.seed, max_rounds=args.max_rounds, say=print if args.verbose else _quiet,
+                      summary=summary)
+        print(format_summary(summary))
+    else:
+        record = open(args.record, "w", encoding="utf-8") if args.record else None
+        if record:
+            record.write(f"# replay with: python battle_manager.py --batch {args.record} --seed {args.seed}\n")
+        game = BattleManager(read=RecordingInput(input, record) if record else input,
+                             seed=args.seed if record else None, max_rounds=args.max_rounds)
+        try:
+            game.setup_game()
+            game.play_game()
+        finally:
+            if record:
+                record.close()
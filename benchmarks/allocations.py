@@ -0,0 +1,119 @@
+# benchmarks/allocations.py
+#
+# Per-match allocation churn with and without object reuse.
+#
+# Simulated 3v3 matches, "fresh" (new characters and effects every match, the
+# match's objects left to the cycle collector) against "pooled" (CharacterPool,
+# effect free lists, Simulation.release()). Reports characters and effects
+# built per match, objects the cycle collector had to free per match, and the
+# collections and total GC pause time over the whole run.
+#
+# Then the game_state frame: serialize_state() + encode_frame() against the
+# server's precompiled StateFrame (_encode_state()), as GC-tracked containers
+# left allocated per call and time per call.
+#
+#   python -m benchmarks.allocations [matches]
+
+import gc
+import random
+import sys
+import time
+
+import status_effects
+from character import CharacterPool
+from lockstep import ReplicaPlayer
+from protocol import encode_frame
+from server import NetworkBattle
+from simulator import Simulation, random_lineups
+from status_effects import effect_stats
+
+
+class GCTimer:
+    def __init__(self):
+        self.pauses = 0.0
+        self.collections = [0, 0, 0]
+        self._started = 0.0
+
+    def __call__(self, phase, info):
+        if phase == "start":
+            self._started = time.perf_counter()
+        else:
+            self.pauses += time.perf_counter() - self._started
+            self.collections[info["generation"]] += 1
+
+
+def play(matches: int, pooled: bool, collect_each: bool):
+    # collect_each: GC off, and the cycle collector run after every match to count what it frees
+    status_effects.MAX_FREE_EFFECTS = 1024 if pooled else 0
+    pool = CharacterPool() if pooled else None
+    rng = random.Random(3)
+    effects_before = effect_stats()["created"]
+    garbage = 0
+    for i in range(matches):
+        team1, team2 = random_lineups(rng, 3)
+        sim = Simulation(team1, team2, seed=i, max_rounds=100, pool=pool)
+        sim.run()
+        sim.release()
+        del sim
+        if collect_each:
+            garbage += gc.collect()
+    characters = pool.created if pool else matches * 6
+    return characters / matches, (effect_stats()["created"] - effects_before) / matches, garbage / matches
+
+
+def simulations(matches: int):
+    print(f"{matches} simulated 3v3 matches per row")
+    print(f"{'mode':>7} {'chars/match':>12} {'effects/match':>14} {'cyclic garbage':>15} "
+          f"{'gen0/1/2':>12} {'GC pause ms':>12} {'seconds':>8}")
+    for pooled in (False, True):
+        gc.collect()
+        gc.disable()
+        chars, effects, garbage = play(matches, pooled, collect_each=True)
+        gc.enable()
+        gc.collect()
+        timer = GCTimer()
+        gc.callbacks.append(timer)
+        start = time.perf_counter()
+        play(matches, pooled, collect_each=False)
+        elapsed = time.perf_counter() - start
+        gc.callbacks.remove(timer)
+        label = "pooled" if pooled else "fresh"
+        print(f"{label:>7} {chars:>12.2f} {effects:>14.2f} {garbage:>15.1f} "
+              f"{'/'.join(map(str, timer.collections)):>12} {timer.pauses * 1000:>12.1f} {elapsed:>8.2f}")
+
+
+def states(calls: int = 20000):
+    players = [ReplicaPlayer(pid, f"Player {pid}") for pid in range(1, 7)]
+    battle = NetworkBattle(players, seed=1, quiet=True)
+    battle._setup_match(["Gladiator", "Voidcaster", "Stormstriker", "Nightstalker", "Stoneguard", "Soulmender"])
+    battle.players[1].character.apply_status_effect(status_effects.PoisonEffect(damage_per_turn=3, duration=2))
+    def generic():
+        return encode_frame({"type": "game_state", "state": battle.serialize_state()})
+
+    if battle._encode_state() != generic():
+        raise AssertionError("_encode_state() and serialize_state() disagree")
+    print(f"\ngame_state frame (3v3), {calls} calls")
+    print(f"{'method':>16} {'containers/call':>16} {'us/call':>8}")
+    for label, build in (("serialize_state", generic), ("_encode_state", battle._encode_state)):
+        gc.collect()
+        gc.disable()
+        before = gc.get_count()[0]
+        kept = [build() for _ in range(100)]  # keep results alive so their containers are counted
+        containers = (gc.get_count()[0] - before - 1) / len(kept)
+        del kept
+        gc.enable()
+        start = time.perf_counter()
+        for _ in range(calls):
+            build()
+        per_call = (time.perf_counter() - start) / calls
+        print(f"{label:>16} {containers:>16.1f} {per_call * 1e6:>8.2f}")
+
+
+def main():
+    matches = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    simulations(matches)
+    states()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+# benchmarks/bots.py
+#
+# Scripted socket clients used by the server benchmarks. They speak the same
+# protocol as client_gui.NetClient but decide instantly (or after a fixed
+# think time that stands in for a human). In lockstep matches the bot runs a
+# LockstepReplica and answers the prompts it produces.
+
+import random
+import socket
+import threading
+import time
+from typing import Optional, Tuple
+
+from lockstep import LockstepReplica
+from protocol import FrameDecoder, encode_frame, RECV_SIZE
+
+
+class ScriptedBot:
+    def __init__(self, host: str, port: int, think_time: Tuple[float, float] = (0.0, 0.0),
+                 seed: Optional[int] = None, source: Optional[str] = None):
+        self.host = host
+        self.port = port
+        self.source = source  # local address to connect from (e.g. 127.0.0.2, a different client IP)
+        self.think_time = think_time
+        self.rng = random.Random(seed)
+        self.result: Optional[dict] = None
+        self.turns = 0
+        self.bytes_received = 0
+        self.latencies = []  # seconds from each (non-lockstep) action to the server's next frame
+        self.received_at = []  # time.time() of every recv, for pauses seen across processes
+        self.connected_at: Optional[float] = None  # perf_counter() once connected
+        self.matched_after: Optional[float] = None  # seconds from connecting to the match start (game_state)
+        self.player_id: Optional[int] = None
+        self.replica: Optional[LockstepReplica] = None  # set for lockstep matches
+        self.send_lock = threading.Lock()
+
+    def _think(self):
+        lo, hi = self.think_time
+        if hi > 0:
+            time.sleep(self.rng.uniform(lo, hi))
+
+    def run(self):
+        sock = socket.create_connection((self.host, self.port),
+                                        source_address=(self.source, 0) if self.source else None)
+        self.connected_at = time.perf_counter()
+        decoder = FrameDecoder()
+        available, tried = [], set()
+        acted = None  # when the last action was sent, until the reply arrives
+
+        def send(obj):
+            with self.send_lock:
+                sock.sendall(encode_frame(obj))
+
+        def on_replica(msg):
+            # runs on the replica thread: only prompts need an answer
+            if msg.get("type") == "your_turn":
+                self._think()
+                self.turns += 1
+                send(self._decide(msg))
+
+        try:
+            while self.result is None:
+                data = sock.recv(RECV_SIZE)
+                if not data:
+                    break
+                self.received_at.append(time.time())
+                if acted is not None:
+                    self.latencies.append(time.perf_counter() - acted)
+                    acted = None
+                self.bytes_received += len(data)
+                for msg in decoder.feed(data):
+                    mtype = msg.get("type")
+                    if self.matched_after is None and mtype in ("game_state", "lockstep_start"):
+                        self.matched_after = time.perf_counter() - self.connected_at
+                    if self.replica is not None:
+                        self.replica.feed(msg)
+                        if mtype == "game_over":
+                            self.replica.join()
+                            self.result = msg
+                    elif mtype == "welcome":
+                        self.player_id = msg.get("player_id")
+                        send({"type": "join"})
+                    elif mtype == "lockstep_start":
+                        self.replica = LockstepReplica(msg, own_pid=self.player_id, emit=on_replica, send=send)
+                        self.replica.start()
+                    elif mtype == "choose_character":
+                        available = msg.get("available", [])
+                        tried.clear()
+                        sock.sendall(self._pick(available, tried))
+                    elif mtype == "error" and available:
+                        # character already taken: try another one
+                        sock.sendall(self._pick(available, tried))
+                    elif mtype == "your_turn":
+                        self._think()
+                        self.turns += 1
+                        sock.sendall(encode_frame(self._decide(msg)))
+                        acted = time.perf_counter()
+                    elif mtype == "game_over":
+                        self.result = msg
+        finally:
+            if self.replica is not None:
+                self.replica.close()
+            sock.close()
+        return self.result
+
+    def _pick(self, available, tried) -> bytes:
+        options = [c for c in available if c not in tried] or available
+        choice = self.rng.choice(options)
+        tried.add(choice)
+        return encode_frame({"type": "pick_character", "choice": choice})
+
+    def _decide(self, msg: dict) -> dict:
+        targets = msg.get("targets", {})
+        actions = ["attack", "special"] if msg.get("cooldown", 0) == 0 else ["attack"]
+        action = self.rng.choice(actions)
+        pool = targets.get("enemy") or targets.get("ally") or []
+        index = self.rng.randrange(len(pool)) if pool else None
+        if action == "special" and targets.get("ally") and self.rng.random() < 0.5:
+            index = self.rng.randrange(len(targets["ally"]))
+        return {"type": "action", "action": action, "target_index": index}
+
+
+def free_port(host: str = "127.0.0.1") -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind((host, 0))
+        return s.getsockname()[1]
@@ -0,0 +1,65 @@
+# benchmarks/damage_matrix.py
+#
+# Simulated 3v3 matches with and without the per-match damage matrix, for the
+# random policy (defends a third of the time, so stats change often) and the
+# greedy policy (scores every attacker/defender pair on every decision).
+# "direct" greedy recomputes damage and dodge from raw attributes instead.
+#
+#   python -m benchmarks.damage_matrix [matches]
+
+import random
+import sys
+import time
+
+from simulator import Simulation, random_lineups, random_policy, greedy_policy
+
+
+def greedy_direct(sim, actor):
+    # greedy_policy with every number recomputed from raw attributes
+    table = sim.legal_actions(actor)
+    best, best_score = None, 0.0
+    for action, index in table.choices():
+        if action == "attack":
+            t = table.enemies[index]
+            score = min(max(0, actor.attack_power - t.defense) * (1 - t.speed / 100), t.hp)
+        elif action == "special" and table.special in ("enemy", "all"):
+            hit = table.enemies if table.special == "all" else [table.enemies[index]]
+            score = sum(min(max(0, actor.spec.damage(actor, t) - t.defense), t.hp) for t in hit)
+        else:
+            continue
+        if score > best_score:
+            best, best_score = (action, index), score
+    return best or random_policy(sim, actor)
+
+
+def run(matches: int, policy, use_matrix: bool):
+    rng = random.Random(1)
+    hits = misses = invalidations = 0
+    start = time.perf_counter()
+    for i in range(matches):
+        team1, team2 = random_lineups(rng, 3)
+        sim = Simulation(team1, team2, seed=i, policies={"Team 1": policy, "Team 2": policy})
+        if not use_matrix:
+            for c in sim.damage.characters:
+                c.damage_matrix = None
+        sim.run()
+        stats = sim.damage.stats()
+        hits, misses, invalidations = hits + stats["hits"], misses + stats["misses"], invalidations + stats["invalidations"]
+    elapsed = time.perf_counter() - start
+    lookups = hits + misses
+    return elapsed, (hits / lookups if lookups else 0.0), invalidations / matches
+
+
+def main():
+    matches = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    print(f"{matches} 3v3 matches per row")
+    print(f"{'policy':>8} {'damage':>8} {'seconds':>8} {'hit rate':>9} {'inval/match':>12}")
+    for name, with_matrix, without_matrix in (("random", random_policy, random_policy),
+                                              ("greedy", greedy_policy, greedy_direct)):
+        for label, policy, use_matrix in (("direct", without_matrix, False), ("matrix", with_matrix, True)):
+            elapsed, hit_rate, inval = run(matches, policy, use_matrix)
+            print(f"{name:>8} {label:>8} {elapsed:>8.2f} {hit_rate:>9.1%} {inval:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
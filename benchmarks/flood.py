@@ -0,0 +1,183 @@
+# benchmarks/flood.py
+#
+# Legitimate play while the port is flooded. Bots connecting from 127.0.0.2
+# play sequential 1v1s back to back against server.py; flood processes on
+# 127.0.0.1 hit the same port with a connect/close storm, connections that
+# never say anything, connections that send join and then nothing (so they
+# are matched and hold their opponent until the handshake timeout), message
+# spam and unterminated multi-megabyte lines. Three runs, all at server.py's
+# default settings: no flood, flood with admission control and flood with
+# --no-admission. Reported per run: matches the bots finished, time to match
+# (connect -> match start; bots still waiting when the run ends count with
+# their wait so far), turn latency (action sent -> next frame) and the
+# server's peak RSS. Without admission the server buffers the unterminated
+# lines whole and grows by gigabytes, so that run is capped at
+# NO_ADMISSION_SECONDS.
+#
+#   python -m benchmarks.flood [seconds_per_run]
+
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from benchmarks.bots import ScriptedBot, free_port
+from protocol import encode_frame
+
+HOST = "127.0.0.1"
+LEGIT_SOURCE = "127.0.0.2"
+LEGIT_BOTS = 8
+MAX_ROUNDS = 20
+NO_ADMISSION_SECONDS = 15.0
+IDLE_CONNECTIONS = 200  # of each kind: silent, and joined then silent
+SPAMMERS = 4
+HUGE_SENDERS = 4
+SPAM = encode_frame({"type": "action", "action": "attack", "target_index": 0}) * 256
+HUGE_CHUNK = b"x" * 65536
+
+
+def _legit_proc(port: int, until: float, out):
+    finished, latencies, waits = [0], [], []
+    current = {}  # loop index -> the bot it is running
+
+    def loop(i: int):
+        n = 0
+        while time.time() < until:
+            bot = current[i] = ScriptedBot(HOST, port, seed=i * 1000 + n, source=LEGIT_SOURCE)
+            try:
+                if bot.run() is not None:
+                    finished[0] += 1
+            except OSError:
+                time.sleep(0.01)
+            latencies.extend(bot.latencies)
+            if bot.matched_after is not None:
+                waits.append(bot.matched_after)
+            n += 1
+        current.pop(i, None)
+
+    threads = [threading.Thread(target=loop, args=(i,), daemon=True) for i in range(LEGIT_BOTS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=max(0.0, until - time.time()) + 5)
+    # still waiting for a match when the run ended
+    waits += [time.perf_counter() - b.connected_at for b in list(current.values())
+              if b.matched_after is None and b.connected_at is not None]
+    out.put((finished[0], latencies, waits))
+
+
+def _connect(port: int) -> socket.socket:
+    sock = socket.create_connection((HOST, port), timeout=2)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, b"\x01\x00\x00\x00\x00\x00\x00\x00")  # RST on close
+    return sock
+
+
+def _flood_proc(port: int, until: float):
+    def storm():
+        while time.time() < until:
+            try:
+                _connect(port).close()
+            except OSError:
+                time.sleep(0.001)
+
+    def idle(join: bool):
+        held = []
+        while time.time() < until:
+            if len(held) < IDLE_CONNECTIONS:
+                try:
+                    s = _connect(port)
+                    if join:
+                        s.sendall(encode_frame({"type": "join"}))  # then never picks a character
+                    held.append(s)
+                except OSError:
+                    pass
+            time.sleep(0.005)
+        for s in held:
+            s.close()
+
+    def send_forever(payload: bytes):
+        while time.time() < until:
+            try:
+                with _connect(port) as s:
+                    while time.time() < until:
+                        s.sendall(payload)
+            except OSError:
+                time.sleep(0.01)
+
+    threads = [threading.Thread(target=storm, daemon=True)]
+    threads += [threading.Thread(target=idle, args=(join,), daemon=True) for join in (False, True)]
+    threads += [threading.Thread(target=send_forever, args=(SPAM,), daemon=True) for _ in range(SPAMMERS)]
+    threads += [threading.Thread(target=send_forever, args=(HUGE_CHUNK,), daemon=True) for _ in range(HUGE_SENDERS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=max(0.0, until - time.time()) + 5)
+
+
+def _peak_rss_mb(pid: int) -> float:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return float("nan")
+
+
+def percentile(values, q: float) -> float:
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def run(seconds: float, flood: bool, admission: bool) -> dict:
+    port = free_port(HOST)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    args = [sys.executable, "server.py", "--port", str(port), "--sequential", "--max-rounds", str(MAX_ROUNDS),
+            "--db", "", "--quiet", "--win-prob-workers", "0"]
+    if not admission:
+        args.append("--no-admission")
+    server = subprocess.Popen(args, cwd=root, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    time.sleep(0.5)
+    try:
+        out = multiprocessing.Queue()
+        until = time.time() + seconds
+        procs = [multiprocessing.Process(target=_legit_proc, args=(port, until, out))]
+        if flood:
+            procs.append(multiprocessing.Process(target=_flood_proc, args=(port, until), daemon=True))
+        for p in procs:
+            p.start()
+        finished, latencies, waits = out.get(timeout=seconds + 30)
+        rss = _peak_rss_mb(server.pid)
+        for p in procs:
+            p.join(timeout=10)
+            if p.is_alive():
+                p.terminate()
+    finally:
+        server.terminate()
+        server.wait()
+    return {"finished": finished, "p50": percentile(latencies, 0.5), "p99": percentile(latencies, 0.99),
+            "wait50": percentile(waits, 0.5), "wait99": percentile(waits, 0.99), "wait_max": max(waits, default=0.0),
+            "rss": rss}
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 60.0
+    print(f"{LEGIT_BOTS} bots playing 1v1s from {LEGIT_SOURCE}, server.py defaults")
+    print(f"{'':>22} {'':>5} {'':>8} {'to match, s':>23} {'turn, ms':>17}")
+    print(f"{'run':>22} {'s':>5} {'matches':>8} {'p50':>7} {'p99':>7} {'max':>7} {'p50':>8} {'p99':>8} {'server MB':>10}")
+    for label, flood, admission in (("no flood", False, True), ("flood, admission", True, True),
+                                    ("flood, no admission", True, False)):
+        length = seconds if admission else min(seconds, NO_ADMISSION_SECONDS)
+        r = run(length, flood, admission)
+        print(f"{label:>22} {length:>5.0f} {r['finished'] // 2:>8} {r['wait50']:>7.2f} {r['wait99']:>7.2f} {r['wait_max']:>7.2f} "
+              f"{r['p50'] * 1e3:>8.2f} {r['p99'] * 1e3:>8.2f} {r['rss']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
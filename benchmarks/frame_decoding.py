@@ -0,0 +1,72 @@
+# benchmarks/frame_decoding.py
+#
+# Compares the old `buf += chunk; buf.split(b"\n", 1)` reader with
+# protocol.FrameDecoder on bursts of small frames (full-state resync,
+# spectator catch-up). Run from the repo root:
+#
+#   python -m benchmarks.frame_decoding
+
+import json
+import time
+
+from protocol import FrameDecoder, encode_frame
+
+MB = 1024 * 1024
+
+
+def make_burst(size_bytes: int) -> bytes:
+    frame = encode_frame({"type": "action_result", "log": "Gladiator attacks Voidcaster for 18 damage (HP 80 → 62)."})
+    return frame * (size_bytes // len(frame))
+
+
+def chunks_of(data: bytes, chunk_size: int):
+    return [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+
+
+# The reader NetClient used before FrameDecoder existed.
+def legacy_reader(chunks) -> int:
+    buf = b""
+    count = 0
+    for chunk in chunks:
+        buf += chunk
+        while b"\n" in buf:
+            line, buf = buf.split(b"\n", 1)
+            try:
+                json.loads(line.decode("utf-8"))
+                count += 1
+            except Exception:
+                pass
+    return count
+
+
+def decoder_reader(chunks) -> int:
+    decoder = FrameDecoder()
+    count = 0
+    for chunk in chunks:
+        count += len(decoder.feed(chunk))
+    return count
+
+
+def timed(fn, chunks):
+    start = time.perf_counter()
+    count = fn(chunks)
+    return time.perf_counter() - start, count
+
+
+def main():
+    print(f"{'burst':>6} {'chunk':>9} {'frames':>8} {'legacy s':>10} {'decoder s':>10} {'speedup':>8}")
+    for burst_mb in (1, 2, 4):
+        data = make_burst(burst_mb * MB)
+        # 4 KiB is what the old client read; a whole burst arrives at once when
+        # the socket buffer fills while the reader is busy.
+        for chunk_size in (4096, 65536, len(data)):
+            chunks = chunks_of(data, chunk_size)
+            legacy_s, n1 = timed(legacy_reader, chunks)
+            decoder_s, n2 = timed(decoder_reader, chunks)
+            assert n1 == n2
+            label = "burst" if chunk_size == len(data) else str(chunk_size)
+            print(f"{burst_mb:>4}MB {label:>9} {n2:>8} {legacy_s:>10.3f} {decoder_s:>10.3f} {legacy_s / decoder_s:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
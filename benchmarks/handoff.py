@@ -0,0 +1,119 @@
+# benchmarks/handoff.py
+#
+# Zero-downtime restart (handoff.py) under load. A server.py started with
+# --handoff runs `matches` sequential 1v1s at once: bots in client processes
+# defend every turn after a fixed think time, so every match is still live
+# (until max rounds) when a second server.py takes over. Reported: the
+# successor's own timings (listening socket, last match resumed, pause per
+# match), when the old process exited, whether every match still reached
+# game_over, and the pause clients saw: each bot's longest gap between two
+# frames after the takeover started, against the longest before it (think
+# time plus the opponent's).
+#
+#   python -m benchmarks.handoff [matches]
+
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.bots import ScriptedBot, free_port
+
+HOST = "127.0.0.1"
+CLIENT_PROCS = 4
+THINK = 1.0       # seconds per decision, the same for every bot
+MAX_ROUNDS = 30   # a round is two decisions: matches last about a minute
+
+
+class DefendingBot(ScriptedBot):
+    def __init__(self, *args, playing=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.playing = playing  # shared counter, bumped on the bot's first turn
+
+    def _decide(self, msg: dict) -> dict:
+        if self.turns == 1 and self.playing is not None:
+            with self.playing.get_lock():
+                self.playing.value += 1
+        return {"type": "action", "action": "defend", "target_index": None}
+
+
+def _client_proc(port: int, bots: int, playing, takeover_at, out):
+    clients = [DefendingBot(HOST, port, think_time=(THINK, THINK), seed=i, playing=playing) for i in range(bots)]
+    threads = [threading.Thread(target=c.run, daemon=True) for c in clients]
+    for t in threads:
+        t.start()
+        time.sleep(0.002)  # keep the accept backlog short
+    for t in threads:
+        t.join(timeout=MAX_ROUNDS * 2 * THINK + 120)
+    start = takeover_at.value
+    finished, before, after = 0, [], []
+    for c in clients:
+        finished += c.result is not None
+        times = c.received_at
+        gaps = [(b, b - a) for a, b in zip(times, times[1:])]
+        before.append(max([g for t, g in gaps if t < start] or [0.0]))
+        after.append(max([g for t, g in gaps if t >= start] or [0.0]))
+    out.put((finished, before, after))
+
+
+def percentile(values, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else float("nan")
+
+
+def main():
+    matches = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    port = free_port(HOST)
+    path = os.path.join(tempfile.mkdtemp(), "handoff.sock")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    args = [sys.executable, "server.py", "--port", str(port), "--sequential", "--max-rounds", str(MAX_ROUNDS),
+            "--db", "", "--quiet", "--win-prob-workers", "0", "--no-admission", "--handoff", path]
+    old = subprocess.Popen(args, cwd=root, stdout=subprocess.DEVNULL)
+    time.sleep(0.5)
+    playing = multiprocessing.Value("i", 0)
+    takeover_at = multiprocessing.Value("d", float("inf"))
+    out = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=_client_proc,
+                                     args=(port, 2 * matches // CLIENT_PROCS, playing, takeover_at, out))
+             for _ in range(CLIENT_PROCS)]
+    for p in procs:
+        p.start()
+    start = time.time()
+    while playing.value < 2 * matches:
+        if time.time() - start > 120:
+            raise RuntimeError(f"only {playing.value} of {2 * matches} bots got a turn")
+        time.sleep(0.05)
+    print(f"{matches} live 1v1 matches after {time.time() - start:.1f}s, taking over")
+
+    takeover_at.value = time.time()
+    new = subprocess.Popen(args, cwd=root, stdout=subprocess.PIPE, text=True)
+    summary = ""
+    for line in new.stdout:
+        if line.startswith("Takeover done"):
+            summary = line.strip()
+            break
+    old.wait()
+    old_exit = time.time() - takeover_at.value
+    print(summary)
+    print(f"old process exited {old_exit:.2f}s after the takeover started")
+
+    finished, before, after = 0, [], []
+    for _ in procs:
+        f, b, a = out.get()
+        finished, before, after = finished + f, before + b, after + a
+    for p in procs:
+        p.join()
+    new.terminate()
+    new.wait()
+    print(f"bots that reached game_over: {finished} of {2 * matches}")
+    print(f"longest gap between frames per bot, s (think time {THINK:.1f}s per player):")
+    print(f"{'':>16} {'p50':>7} {'p99':>7} {'max':>7}")
+    for label, gaps in (("before takeover", before), ("after takeover", after)):
+        print(f"{label:>16} {percentile(gaps, 0.5):>7.3f} {percentile(gaps, 0.99):>7.3f} {max(gaps):>7.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# benchmarks/initiative.py
+#
+# Cost of turn scheduling in large simulated battles: the old
+# "loop over a shuffled turn_order, skip the dead" scan (not speed based),
+# re-sorting the living roster by speed every round, and
+# initiative.InitiativeScheduler.
+# Each turn has a KILL_CHANCE of eliminating one random living opponent, so
+# rosters thin out slowly the way real attrition does and the old loop keeps
+# stepping over more and more dead entries.
+#
+#   python -m benchmarks.initiative
+
+import random
+import time
+
+from initiative import InitiativeScheduler
+
+KILL_CHANCE = 0.05
+
+
+class Dummy:
+    __slots__ = ("speed", "hp")
+
+    def __init__(self, speed):
+        self.speed = speed
+        self.hp = 1
+
+
+def roster(n, seed):
+    rng = random.Random(seed)
+    return [Dummy(rng.randint(5, 50)) for _ in range(n)], rng
+
+
+def legacy(n, seed=0):
+    actors, rng = roster(n, seed)
+    turn_order = actors[:]
+    rng.shuffle(turn_order)
+    living = actors[:]
+    turns = 0
+    while len(living) > 1:
+        for a in turn_order:
+            if a.hp <= 0:
+                continue
+            turns += 1
+            if rng.random() < KILL_CHANCE:
+                victim = living.pop(rng.randrange(len(living)))
+                victim.hp = 0
+                if len(living) <= 1:
+                    break
+    return turns
+
+
+# Speed order the list way: re-sort the living roster every round.
+def sorted_rounds(n, seed=0):
+    actors, rng = roster(n, seed)
+    living = actors[:]
+    turns = 0
+    while len(living) > 1:
+        for a in sorted(living, key=lambda a: -a.speed):
+            if a.hp <= 0:
+                continue
+            turns += 1
+            if rng.random() < KILL_CHANCE:
+                victim = living.pop(rng.randrange(len(living)))
+                victim.hp = 0
+                if len(living) <= 1:
+                    break
+    return turns
+
+
+def scheduler(n, seed=0):
+    actors, rng = roster(n, seed)
+    order = InitiativeScheduler(actors, rng=rng)
+    living = actors[:]
+    turns = 0
+    while len(living) > 1:
+        order.next_actor()
+        turns += 1
+        if rng.random() < KILL_CHANCE:
+            victim = living.pop(rng.randrange(len(living)))
+            victim.hp = 0
+            order.remove(victim)
+    return turns
+
+
+def timed(fn, n):
+    start = time.perf_counter()
+    turns = fn(n)
+    return turns, time.perf_counter() - start
+
+
+def main():
+    print(f"{'actors':>8} {'turns':>8} {'scan s':>8} {'sort s':>8} {'heap s':>8} {'us/turn heap':>13}")
+    for n in (100, 1_000, 10_000):
+        turns, scan_s = timed(legacy, n)
+        _, sort_s = timed(sorted_rounds, n)
+        heap_turns, heap_s = timed(scheduler, n)
+        print(f"{n:>8} {turns:>8} {scan_s:>8.3f} {sort_s:>8.3f} {heap_s:>8.3f} {heap_s / heap_turns * 1e6:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# benchmarks/lockstep_bandwidth.py
+#
+# Bytes each client receives per turn with full-state broadcasts versus
+# lockstep (actions + periodic hashes), for 1v1 and 3v3 in both turn modes.
+# Matches run against an in-process GameServer with instant bots; the byte
+# counts include the handshake, so short matches slightly overstate them.
+#
+#   python -m benchmarks.lockstep_bandwidth [matches]
+
+import contextlib
+import io
+import sys
+import threading
+import time
+
+from benchmarks.bots import ScriptedBot, free_port
+from server import GameServer
+
+HOST = "127.0.0.1"
+MAX_ROUNDS = 30
+
+
+def run(matches: int, team_size: int, parallel: bool, lockstep: bool):
+    port = free_port(HOST)
+    server = GameServer(HOST, port, team_size=team_size, parallel=parallel, max_rounds=MAX_ROUNDS,
+                        quiet=True, lockstep=lockstep)
+    received = turns = desyncs = 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        threading.Thread(target=server.start, kwargs={"max_matches": None}, daemon=True).start()
+        time.sleep(0.1)
+        start = time.perf_counter()
+        for m in range(matches):
+            bots = [ScriptedBot(HOST, port, seed=m * 10 + i) for i in range(team_size * 2)]
+            threads = [threading.Thread(target=b.run) for b in bots]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            turns += server.battle.turns
+            received += sum(b.bytes_received for b in bots)
+            desyncs += sum(b.replica.desyncs for b in bots if b.replica is not None)
+        elapsed = time.perf_counter() - start
+        server.sock.close()
+    per_turn = received / (turns * team_size * 2) if turns else 0.0
+    return per_turn, elapsed, desyncs
+
+
+def main():
+    matches = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    print(f"{matches} matches per row, bytes received per client per turn")
+    print(f"{'mode':>5} {'turns':>10} {'full state':>11} {'lockstep':>9} {'ratio':>6} {'desyncs':>8}")
+    for team_size in (1, 3):
+        for parallel in (True, False):
+            full, _, _ = run(matches, team_size, parallel, lockstep=False)
+            lock, _, desyncs = run(matches, team_size, parallel, lockstep=True)
+            mode = f"{team_size}v{team_size}"
+            turn_mode = "parallel" if parallel else "sequential"
+            print(f"{mode:>5} {turn_mode:>10} {full:>11.0f} {lock:>9.0f} {full / lock:>5.1f}x {desyncs:>8}")
+
+
+if __name__ == "__main__":
+    main()
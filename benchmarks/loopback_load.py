@@ -0,0 +1,84 @@
+# benchmarks/loopback_load.py
+#
+# Matches per second over loopback against supervisor.py with 1, 2 and 4
+# workers. Client processes keep CLIENTS bots connected at all times; each bot
+# plays a 1v1 with no think time and reconnects as soon as its match ends.
+# Scaling with workers needs as many free cores as workers + client processes.
+#
+#   python -m benchmarks.loopback_load [seconds_per_run]
+
+import multiprocessing
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from benchmarks.bots import ScriptedBot, free_port
+
+HOST = "127.0.0.1"
+CLIENT_PROCS = 2
+CLIENTS = 32      # concurrent bots across all client processes
+MAX_ROUNDS = 20
+WORKER_COUNTS = (1, 2, 4)
+
+
+def _client_proc(port: int, bots: int, until: float, seed: int, out):
+    finished = [0] * bots
+
+    def loop(i: int):
+        n = 0
+        while time.time() < until:
+            try:
+                if ScriptedBot(HOST, port, seed=seed * 100000 + i * 1000 + n).run() is not None:
+                    finished[i] += 1
+            except OSError:
+                time.sleep(0.01)
+            n += 1
+
+    threads = [threading.Thread(target=loop, args=(i,), daemon=True) for i in range(bots)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=max(0.0, until - time.time()) + 10)
+    out.put(sum(finished))
+
+
+def run(workers: int, seconds: float) -> float:
+    port = free_port(HOST)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sup = subprocess.Popen(
+        [sys.executable, "supervisor.py", "--workers", str(workers), "--port", str(port),
+         "--max-rounds", str(MAX_ROUNDS), "--db", "", "--report", "0", "--no-admission"],
+        cwd=root, stdout=subprocess.DEVNULL)
+    time.sleep(0.5)
+    try:
+        out = multiprocessing.Queue()
+        until = time.time() + seconds
+        procs = [multiprocessing.Process(target=_client_proc,
+                                         args=(port, CLIENTS // CLIENT_PROCS, until, i, out))
+                 for i in range(CLIENT_PROCS)]
+        for p in procs:
+            p.start()
+        games = sum(out.get() for _ in procs)  # one game_over per bot, two bots per match
+        for p in procs:
+            p.join()
+    finally:
+        sup.terminate()  # the supervisor stops its workers on SIGTERM
+        sup.wait()
+    return games / 2 / seconds
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+    print(f"{os.cpu_count()} CPU(s), {CLIENTS} bots in {CLIENT_PROCS} client processes, {seconds:.0f}s per run")
+    print(f"{'workers':>8} {'matches/s':>10} {'scaling':>8}")
+    base = None
+    for workers in WORKER_COUNTS:
+        rate = run(workers, seconds)
+        base = base or rate
+        print(f"{workers:>8} {rate:>10.1f} {rate / base:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# benchmarks/match_duration.py
+#
+# Average wall-clock match duration with scripted bots, sequential prompting
+# vs. the parallel planning phase, for 1v1 / 2v2 / 3v3. Bots "think" for a
+# random 20-80 ms per decision to stand in for humans. Some lineups can stall
+# forever (heals outpacing chip damage), so matches are capped at MAX_ROUNDS.
+#
+#   python -m benchmarks.match_duration [matches_per_mode]
+
+import contextlib
+import io
+import sys
+import threading
+import time
+
+from server import GameServer
+from benchmarks.bots import ScriptedBot, free_port
+
+HOST = "127.0.0.1"
+THINK = (0.02, 0.08)
+MAX_ROUNDS = 30
+
+
+def play_match(team_size: int, parallel: bool, seed: int):
+    port = free_port(HOST)
+    srv = GameServer(HOST, port, team_size=team_size, parallel=parallel, max_rounds=MAX_ROUNDS)
+    server_thread = threading.Thread(target=srv.start, daemon=True)
+    server_thread.start()
+    time.sleep(0.05)
+
+    bots = [ScriptedBot(HOST, port, THINK, seed=seed * 10 + i) for i in range(team_size * 2)]
+    threads = [threading.Thread(target=b.run, daemon=True) for b in bots]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+        time.sleep(0.005)  # keep connection order (and so teams) stable
+    for t in threads:
+        t.join()
+    server_thread.join()
+    return time.perf_counter() - start, max(1, srv.battle.rounds)
+
+
+def main():
+    matches = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    # Lineups and dice differ between runs, so seconds per round is the fairer comparison.
+    print(f"{'':>5} {'-- sequential --':>17} {'--- parallel ---':>17}")
+    print(f"{'mode':>5} {'match s':>8} {'s/round':>8} {'match s':>8} {'s/round':>8} {'speedup':>8}")
+    for team_size in (1, 2, 3):
+        match_s, round_s = {}, {}
+        for parallel in (False, True):
+            with contextlib.redirect_stdout(io.StringIO()):
+                runs = [play_match(team_size, parallel, seed) for seed in range(matches)]
+            match_s[parallel] = sum(d for d, _ in runs) / len(runs)
+            round_s[parallel] = sum(d / r for d, r in runs) / len(runs)
+        mode = f"{team_size}v{team_size}"
+        print(f"{mode:>5} {match_s[False]:>8.2f} {round_s[False]:>8.3f} "
+              f"{match_s[True]:>8.2f} {round_s[True]:>8.3f} {round_s[False] / round_s[True]:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
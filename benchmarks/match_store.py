@@ -0,0 +1,51 @@
+# benchmarks/match_store.py
+#
+# How fast MatchStore absorbs finished matches, and what record() costs the
+# caller. Results come from the simulator, written to a throwaway database.
+#
+#   python -m benchmarks.match_store [matches]
+
+import os
+import sys
+import tempfile
+import time
+
+from match_store import MatchStore
+from simulator import simulate_many
+
+
+def main():
+    matches = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    start = time.perf_counter()
+    results = list(simulate_many(matches, team_size=2, seed=1))
+    sim_s = time.perf_counter() - start
+    print(f"simulated {matches} 2v2 matches in {sim_s:.2f}s ({matches / sim_s * 60:,.0f}/min)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = MatchStore(os.path.join(tmp, "bench.db"))
+        latencies = []
+        start = time.perf_counter()
+        for r in results:
+            t0 = time.perf_counter()
+            store.record(r)
+            latencies.append(time.perf_counter() - t0)
+        enqueue_s = time.perf_counter() - start
+        store.flush()
+        total_s = time.perf_counter() - start
+        latencies.sort()
+        print(f"record(): p50 {latencies[len(latencies) // 2] * 1e6:.1f} us, "
+              f"p99 {latencies[int(len(latencies) * 0.99)] * 1e6:.1f} us, enqueue total {enqueue_s:.3f}s")
+        print(f"written {store.written} matches in {store.batches} transactions, "
+              f"{total_s:.2f}s ({store.written / total_s * 60:,.0f}/min)")
+
+        start = time.perf_counter()
+        rates = store.class_win_rates()
+        recent = store.recent_matches(100)
+        print(f"class win rates + 100 recent matches queried in {(time.perf_counter() - start) * 1000:.1f} ms")
+        for cls, games, wins, rate in rates:
+            print(f"  {cls:12s} {games:>7} games {rate:6.1%}")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
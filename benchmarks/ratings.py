@@ -0,0 +1,64 @@
+# benchmarks/ratings.py
+#
+# RatingEngine at leaderboard scale: bulk re-rating of synthetic 1v1
+# history over a million players, then incremental updates and
+# rank / top-100 queries against the order-statistics index.
+#
+#   python -m benchmarks.ratings [players] [matches]
+
+import random
+import sys
+import time
+
+from ratings import RatingEngine
+
+
+def synthetic_results(players: int, matches: int, seed: int = 0):
+    rng = random.Random(seed)
+    for _ in range(matches):
+        a, b = rng.randrange(players), rng.randrange(players)
+        if a == b:
+            continue
+        yield {
+            "winner": "Team 1" if rng.random() < 0.5 else "Team 2",
+            "roster": [{"player": f"p{a}", "class": "Gladiator", "team": "Team 1"},
+                       {"player": f"p{b}", "class": "Voidcaster", "team": "Team 2"}],
+        }
+
+
+def main():
+    players = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    matches = int(sys.argv[2]) if len(sys.argv) > 2 else 2_000_000
+
+    engine = RatingEngine()
+    start = time.perf_counter()
+    replayed = engine.rerate(synthetic_results(players, matches))
+    bulk_s = time.perf_counter() - start
+    print(f"bulk re-rate: {replayed:,} matches, {len(engine):,} players in {bulk_s:.1f}s "
+          f"({replayed / bulk_s:,.0f} matches/s)")
+
+    updates = list(synthetic_results(players, 100_000, seed=1))
+    start = time.perf_counter()
+    for result in updates:
+        engine.update(result)
+    upd_s = time.perf_counter() - start
+    print(f"incremental: {len(updates):,} updates in {upd_s:.2f}s ({upd_s / len(updates) * 1e6:.1f} us each)")
+
+    rng = random.Random(2)
+    names = [f"p{rng.randrange(players)}" for _ in range(100_000)]
+    names = [n for n in names if engine.rating_of(n) is not None]
+    start = time.perf_counter()
+    for n in names:
+        engine.rank_of(n)
+    rank_s = time.perf_counter() - start
+    print(f"rank_of: {len(names):,} queries, {rank_s / len(names) * 1e6:.1f} us each")
+
+    start = time.perf_counter()
+    for i in range(1000):
+        engine.top(100, start=i * 100)
+    top_s = time.perf_counter() - start
+    print(f"top 100 (pages across the ladder): {top_s / 1000 * 1e6:.1f} us each")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# benchmarks/serializers.py
+#
+# Encoding cost per message type: building the dict and running it through
+# protocol.encode_frame (the generic path every send used to take) against
+# frames.py (constant frames, compiled templates). Every pair is checked to
+# produce identical bytes first. game_state is a 3v3 match with a status
+# effect and win_prob; the broadcast rows also count that the old path
+# encoded once per recipient (6) and the new one once per broadcast.
+#
+#   python -m benchmarks.serializers [calls]
+
+import sys
+import time
+
+import frames
+from class_table import AVAILABLE_CLASSES
+from legal_actions import ActionTable
+from lockstep import ReplicaPlayer
+from protocol import encode_frame
+from server import NetworkBattle
+from status_effects import PoisonEffect
+
+RECIPIENTS = 6
+
+
+def per_call(fn, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls
+
+
+def cases():
+    players = [ReplicaPlayer(pid, f"Player {pid}") for pid in range(1, 7)]
+    battle = NetworkBattle(players, seed=1, quiet=True)
+    battle._setup_match(["Gladiator", "Voidcaster", "Stormstriker", "Nightstalker", "Stoneguard", "Soulmender"])
+    battle.players[1].character.apply_status_effect(PoisonEffect(damage_per_turn=3, duration=2))
+    odds = {"Team 1": 0.412, "Team 2": 0.37}
+    p = battle.players[0]
+    table = ActionTable(p, battle.living)
+    log = "Gladiator attacks Voidcaster for 18 damage (HP 80 → 62)."
+
+    def state_dict():
+        return encode_frame({"type": "game_state", "state": dict(battle.serialize_state(), win_prob=odds)})
+
+    return [
+        ("choose_character", lambda: encode_frame({"type": "choose_character", "available": AVAILABLE_CLASSES.copy()}),
+         lambda: frames.CHOOSE_CHARACTER),
+        ("waiting", lambda: encode_frame({"type": "waiting", "message": "Waiting for 3 more player(s) to join..."}),
+         lambda: frames.waiting_for(3)),
+        ("welcome", lambda: encode_frame({"type": "welcome", "player_id": 4}), lambda: frames.welcome(4)),
+        ("your_turn", lambda: encode_frame(battle._turn_prompt(p, table)), lambda: battle._turn_frame(p, table)),
+        ("action_result", lambda: encode_frame({"type": "action_result", "log": log}), lambda: frames.action_result(log)),
+        ("game_state", state_dict, lambda: battle._encode_state(odds)),
+        ("act", lambda: encode_frame({"type": "act", "p": 3, "a": 0, "t": None}), lambda: frames.act(3, 0, None)),
+        ("acts", lambda: encode_frame({"type": "acts", "l": [[1, 0, 1], [2, 2, None], [3, 1, None]]}),
+         lambda: frames.acts([(1, 0, 1), (2, 2, None), (3, 1, None)])),
+        ("hash", lambda: encode_frame({"type": "hash", "turn": 40, "h": 3735928559}), lambda: frames.state_hash(40, 3735928559)),
+        ("game_over", lambda: encode_frame({"type": "game_over", "winner": "Team 1"}), lambda: frames.game_over("Team 1")),
+    ]
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    rows = cases()
+    for name, old, new in rows:
+        if old() != new():
+            raise AssertionError(f"{name}: frames.py and encode_frame disagree\n{old()!r}\n{new()!r}")
+    print(f"{calls} calls per row, us per encoded frame (identical bytes checked)")
+    print(f"{'message':>17} {'bytes':>6} {'encode_frame':>13} {'frames':>8} {'speedup':>8}")
+    for name, old, new in rows:
+        t_old, t_new = per_call(old, calls), per_call(new, calls)
+        print(f"{name:>17} {len(new()):>6} {t_old * 1e6:>13.2f} {t_new * 1e6:>8.2f} {t_old / t_new:>7.1f}x")
+    print(f"\nper broadcast to {RECIPIENTS} players (old path encoded for every recipient)")
+    for name, old, new in rows:
+        if name in ("game_state", "action_result"):
+            t_old, t_new = per_call(old, calls) * RECIPIENTS, per_call(new, calls)
+            print(f"{name:>17} {t_old * 1e6:>13.2f} {t_new * 1e6:>8.2f} {t_old / t_new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# benchmarks/trace_scan.py
+#
+# Per-turn trace export (turn_trace.py): recording cost, then scan time at
+# scale. A real 3v3 trace is recorded (timed against the same matches played
+# without a trace), then tiled on disk, with match ids and turn offsets
+# shifted, until it holds `turns` rows. action_counts() (a full pass over two
+# turn columns) and decisive_blows() (the match table plus one turn row per
+# match) run twice over the memory-mapped result: once right after writing
+# and once more with the pages cached. Needs numpy, and about 50 bytes of
+# disk per turn in `dir`.
+#
+#   python -m benchmarks.trace_scan [turns] [dir]
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from simulator import simulate_many
+from turn_trace import TraceReader, TraceWriter, action_counts, decisive_blows
+
+BASE_MATCHES = 2000
+
+
+def record(path: str) -> None:
+    start = time.perf_counter()
+    for _ in simulate_many(BASE_MATCHES, 3, seed=0):
+        pass
+    plain = time.perf_counter() - start
+    writer = TraceWriter(path)
+    start = time.perf_counter()
+    for _ in simulate_many(BASE_MATCHES, 3, seed=0, trace=writer):
+        pass
+    writer.close()
+    traced = time.perf_counter() - start
+    turns = TraceReader(path).rows["turns"]
+    print(f"recording: {BASE_MATCHES} 3v3 matches, {turns:,} turns, {plain:.2f}s plain, {traced:.2f}s traced "
+          f"({(traced - plain) / turns * 1e6:.1f} us/turn)")
+
+
+# Appends copies of the trace to itself until it holds at least `turns` rows
+def tile(path: str, turns: int) -> None:
+    base = TraceReader(path)
+    rows = dict(base.rows)
+    copies = max(1, -(-turns // rows["turns"]))
+    columns = {table: {name: np.array(base.array(table, name)) for name in cols}
+               for table, cols in base.meta["columns"].items()}
+    base.close()
+    for table, cols in columns.items():
+        for name, values in cols.items():
+            with open(os.path.join(path, f"{table}.{name}.bin"), "ab") as f:
+                for k in range(1, copies):
+                    shifted = values
+                    if name == "match":
+                        shifted = values + np.asarray(k * rows["matches"], dtype=values.dtype)
+                    elif name == "first_turn":
+                        shifted = values + np.asarray(k * rows["turns"], dtype=values.dtype)
+                    shifted.tofile(f)
+    with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    meta["rows"] = {table: n * copies for table, n in rows.items()}
+    with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=1)
+
+
+def main():
+    turns = int(float(sys.argv[1])) if len(sys.argv) > 1 else 100_000_000
+    root = tempfile.mkdtemp(dir=sys.argv[2] if len(sys.argv) > 2 else None)
+    path = os.path.join(root, "trace")
+    try:
+        record(path)
+        start = time.perf_counter()
+        tile(path, turns)
+        reader = TraceReader(path)
+        size = sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+        print(f"tiled to {reader.rows['turns']:,} turns / {reader.rows['matches']:,} matches, "
+              f"{size / 2 ** 30:.2f} GiB, in {time.perf_counter() - start:.1f}s")
+        print(f"{'pass':>6} {'action_counts s':>16} {'Mturns/s':>9} {'decisive_blows s':>17}")
+        for label in ("first", "cached"):
+            start = time.perf_counter()
+            action_counts(reader)
+            counted = time.perf_counter() - start
+            start = time.perf_counter()
+            decisive_blows(reader)
+            decided = time.perf_counter() - start
+            print(f"{label:>6} {counted:>16.2f} {reader.rows['turns'] / counted / 1e6:>9.0f} {decided:>17.2f}")
+        reader.close()
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
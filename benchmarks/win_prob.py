@@ -0,0 +1,59 @@
+# benchmarks/win_prob.py
+#
+# Cost of WinProbability.estimate() on the match thread and how often it has
+# an answer. Simulated matches call estimate() after every action, like the
+# server does on every game_state broadcast, with `pace` seconds between
+# actions standing in for the time players take. "fresh" counts answers for
+# the current position; "shown" also counts the match's last estimate, which
+# is what the server attaches while a rollout is still running. The second
+# pass replays the same matches, so every position it sees was queued before.
+#
+#   python -m benchmarks.win_prob [matches] [workers] [pace]
+
+import random
+import sys
+import time
+
+from simulator import Simulation, random_lineups
+from winprob import WinProbability
+
+
+def run(estimator: WinProbability, matches: int, team_size: int, pace: float):
+    rng = random.Random(7)
+    timings, fresh, shown = [], 0, 0
+    for i in range(matches):
+        team1, team2 = random_lineups(rng, team_size)
+        sim = Simulation(team1, team2, seed=i, max_rounds=50)
+        last = None
+        while sim.step():
+            start = time.perf_counter()
+            estimate = estimator.estimate(sim.teams)
+            timings.append(time.perf_counter() - start)
+            last = estimate or last
+            fresh += estimate is not None
+            shown += last is not None
+            time.sleep(pace)
+    timings.sort()
+    return timings, fresh, shown
+
+
+def main():
+    matches = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    pace = float(sys.argv[3]) if len(sys.argv) > 3 else 0.05
+    print(f"{matches} matches per row, {workers} rollout worker(s), {pace * 1000:.0f} ms between actions")
+    print(f"{'mode':>5} {'pass':>5} {'calls':>7} {'fresh':>7} {'shown':>7} {'p50 us':>7} {'p99 us':>7} {'max us':>7}")
+    for team_size in (1, 3):
+        estimator = WinProbability(workers=workers)
+        for label in ("cold", "warm"):
+            timings, fresh, shown = run(estimator, matches, team_size, pace)
+            estimator.drain()
+            n = len(timings)
+            print(f"{team_size}v{team_size:<3} {label:>5} {n:>7} {fresh / n:>7.1%} {shown / n:>7.1%} {timings[n // 2] * 1e6:>7.1f} "
+                  f"{timings[int(n * 0.99)] * 1e6:>7.1f} {timings[-1] * 1e6:>7.1f}")
+        print(f"      {estimator.stats}")
+        estimator.close()
+
+
+if __name__ == "__main__":
+    main()
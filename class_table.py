@@ -0,0 +1,143 @@
+import json
+import os
+from status_effects import StunEffect, PoisonEffect, DefenseBoostEffect
+
+# Purpose: Loads the declarative class table (class_data.json) and compiles it
+# into a flat dispatch table shared by every engine (BattleManager, NetworkBattle, ...)
+# Balance changes are a data edit; nothing in here needs to change for them.
+
+CLASS_DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "class_data.json")
+
+TARGET_TYPES = ("enemy", "all_enemies", "ally", "self")
+
+# Purpose: Compiled form of one class entry
+# special is a closure with every constant already bound, so executing a
+# special move is a single call with no lookups on the table or the character class
+class ClassSpec:
+    __slots__ = ("name", "hp", "attack_power", "defense", "speed",
+                 "target_type", "is_aoe", "cooldown", "special_name", "special", "damage")
+
+    def __init__(self, name, hp, attack_power, defense, speed, target_type, is_aoe, cooldown, special_name, special,
+                 damage=None):
+        self.name = name
+        self.hp = hp
+        self.attack_power = attack_power
+        self.defense = defense
+        self.speed = speed
+        self.target_type = target_type  # "enemy", "ally" or "self" (AoE specials are "enemy" with is_aoe set)
+        self.is_aoe = is_aoe
+        self.cooldown = cooldown
+        self.special_name = special_name
+        self.special = special  # special(user, target) -> None, target is a list for AoE
+        self.damage = damage  # damage(user, target) -> raw special damage, None if the special deals none
+
+# Purpose: Reads the raw table from disk
+def load_class_table(path=CLASS_DATA_PATH):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+# Purpose: Returns the raw damage passed to take_damage() (which still subtracts defense)
+def _compile_damage(move):
+    formula = move["formula"]
+    if formula == "scaled": # attack power times a multiplier
+        mult = move["multiplier"]
+        return lambda user, target: user.attack_power * mult
+    if formula == "reduced": # attack power minus the target's defense
+        return lambda user, target: max(0, user.attack_power - target.defense)
+    if formula == "pierce": # adds the target's defense back so it is ignored
+        return lambda user, target: user.attack_power + target.defense
+    if formula == "ambush": # multiplied only if the target has no defense
+        mult = move["multiplier"]
+        return lambda user, target: user.attack_power * mult if target.defense == 0 else user.attack_power
+    if formula in ("heal", "none"):
+        return None
+    raise ValueError(f"Unknown damage formula: {formula}")
+
+# Purpose: Turns effect entries into (chance, constructor) pairs
+def _compile_effects(move):
+    compiled = []
+    for entry in move.get("effects", []):
+        kind = entry["type"]
+        if kind == "stun":
+            duration = entry["duration"]
+            make = lambda duration=duration: StunEffect.acquire(duration=duration)
+        elif kind == "poison":
+            dmg, duration = entry["damage_per_turn"], entry["duration"]
+            make = lambda dmg=dmg, duration=duration: PoisonEffect.acquire(damage_per_turn=dmg, duration=duration)
+        elif kind == "defense_boost":
+            inc, duration = entry["defense_increase"], entry["duration"]
+            make = lambda inc=inc, duration=duration: DefenseBoostEffect.acquire(defense_increase=inc, duration=duration)
+        else:
+            raise ValueError(f"Unknown status effect: {kind}")
+        compiled.append((entry.get("chance", 1.0), make))
+    return tuple(compiled)
+
+def _apply_effects(effects, user, target):
+    for chance, make in effects:
+        if chance >= 1.0 or user.rng.random() < chance: # rolls come from the user's (match) rng
+            target.apply_status_effect(make())
+
+# Purpose: Raw special damage, from the match's damage matrix when the user has one
+def _raw_damage(damage, user, target):
+    if user.damage_matrix is not None:
+        return user.damage_matrix.special_damage(user, target)
+    return damage(user, target)
+
+# Purpose: Builds the special move closure for one class
+def _compile_special(move):
+    name = move["name"]
+    target_type = move["target"]
+    if target_type not in TARGET_TYPES:
+        raise ValueError(f"Unknown target type: {target_type}")
+    damage = _compile_damage(move)
+    heal = move["amount"] if move["formula"] == "heal" else 0
+    effects = _compile_effects(move)
+
+    if target_type == "all_enemies":
+        def special(user, target_team):
+            user.log(f"{user.name} casts **{name}**, hitting ALL opponents!")
+            for enemy in target_team:
+                if enemy.hp > 0:
+                    if damage:
+                        enemy.take_damage(_raw_damage(damage, user, enemy))
+                    if effects:
+                        _apply_effects(effects, user, enemy)
+        return special
+
+    def special(user, target):
+        if target_type == "self":
+            target = user
+        user.log(f"{user.name} uses **{name}** on {target.name}!")
+        if damage:
+            target.take_damage(_raw_damage(damage, user, target))
+        if heal:
+            target.hp += heal
+            user.log(f"{target.name} recovers {heal} HP! Remaining HP: {target.hp}")
+        if effects:
+            _apply_effects(effects, user, target)
+    return special
+
+# Purpose: Compiles the whole table into {class name: ClassSpec}
+def compile_class_table(table):
+    specs = {}
+    for class_name, entry in table.items():
+        move = entry["special"]
+        target = move["target"]
+        specs[class_name] = ClassSpec(
+            name=class_name,
+            hp=entry["hp"],
+            attack_power=entry["attack_power"],
+            defense=entry["defense"],
+            speed=entry.get("speed", 15),
+            target_type="enemy" if target == "all_enemies" else target,
+            is_aoe=target == "all_enemies",
+            cooldown=move["cooldown"],
+            special_name=move["name"],
+            special=_compile_special(move),
+            damage=_compile_damage(move),
+        )
+    return specs
+
+# Compiled once at import; every engine looks classes up here
+CLASS_SPECS = compile_class_table(load_class_table())
+AVAILABLE_CLASSES = list(CLASS_SPECS)
@@ -3,11 +3,13 @@
 
 import socket
 import threading
-import json
 import queue
 import tkinter as tk
 from tkinter import ttk, messagebox
 
+from protocol import FrameDecoder, encode_frame, RECV_SIZE
+from lockstep import LockstepReplica
+
 SERVER_HOST = "127.0.0.1"
 SERVER_PORT = 50007
 
@@ -19,6 +21,8 @@ class NetClient:
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.lock = threading.Lock()
         self.alive = False
+        self.player_id = None
+        self.replica = None  # LockstepReplica while a lockstep match is running
 
     def connect(self):
         self.sock.connect((self.host, self.port))
@@ -26,30 +30,46 @@ class NetClient:
         threading.Thread(target=self._reader, daemon=True).start()
 
     def send(self, obj: dict):
-        data = (json.dumps(obj) + "\n").encode("utf-8")
+        data = encode_frame(obj)
         with self.lock:
             self.sock.sendall(data)
 
     def _reader(self):
-        buf = b""
+        decoder = FrameDecoder()
         while self.alive:
             try:
-                chunk = self.sock.recv(4096)
+                chunk = self.sock.recv(RECV_SIZE)
                 if not chunk:
                     break
-                buf += chunk
-                while b"\n" in buf:
-                    line, buf = buf.split(b"\n", 1)
-                    try:
-                        msg = json.loads(line.decode("utf-8"))
-                        self.incoming_q.put(msg)
-                    except Exception:
-                        pass
+                for msg in decoder.feed(chunk):
+                    self._dispatch(msg)
             except Exception:
                 break
+        if self.replica is not None:
+            self.replica.close()
+            self.replica.join()
         self.incoming_q.put({"type": "error", "message": "Disconnected from server."})
         self.alive = False
 
+    # Lockstep matches are re-simulated locally; the replica puts the usual
+    # game_state / action_result / your_turn messages on incoming_q
+    def _dispatch(self, msg):
+        mtype = msg.get("type")
+        if mtype == "welcome":
+            self.player_id = msg.get("player_id")
+            self.send({"type": "join"})  # the server keeps us out of the lobby until we answer
+        elif mtype == "lockstep_start":
+            self.replica = LockstepReplica(msg, own_pid=self.player_id, emit=self.incoming_q.put, send=self.send)
+            self.replica.start()
+            return
+        if self.replica is not None:
+            self.replica.feed(msg)
+            if mtype == "game_over":
+                self.replica.join()  # its last messages go out before game_over
+                self.replica = None
+            return
+        self.incoming_q.put(msg)
+
     def close(self):
         self.alive = False
         try:
@@ -105,6 +125,11 @@ class BattleApp(tk.Tk):
         self.status_lbl = ttk.Label(top, text="Connecting...")
         self.status_lbl.grid(row=0, column=2, sticky="e")
 
+        # Sent with the character pick; matches are only recorded and rated under a name
+        ttk.Label(top, text="Name:").grid(row=0, column=3, padx=(12, 4))
+        self.name_var = tk.StringVar()
+        ttk.Entry(top, textvariable=self.name_var, width=18).grid(row=0, column=4)
+
         # Main panels
         main = ttk.Frame(self)
         main.grid(row=1, column=0, sticky="nsew")
@@ -212,6 +237,8 @@ class BattleApp(tk.Tk):
 
         elif mtype == "action_result":
             self._append_log(msg.get("log", ""))
+        elif mtype == "rating":
+            self._append_log(f"Rating: {msg.get('rating')} ({msg.get('change'):+}), rank #{msg.get('rank')}")
         elif mtype == "game_over":
             winner = msg.get("winner")
             self._append_log(f"Game Over! Winner: {winner}")
@@ -239,8 +266,12 @@ class BattleApp(tk.Tk):
             self.char_buttons.append(b)
 
     def _pick_character(self, name):
+        pick = {"type": "pick_character", "choice": name}
+        player_name = self.name_var.get().strip()
+        if player_name:
+            pick["name"] = player_name
         try:
-            self.client.send({"type": "pick_character", "choice": name})
+            self.client.send(pick)
         except Exception as e:
             messagebox.showerror("Network", str(e))
             return
@@ -248,9 +279,11 @@ class BattleApp(tk.Tk):
 
     def _render_state(self, state: dict):
         teams = state.get("teams", {})
+        odds = state.get("win_prob") or {}
         # Left: Team 1, Right: Team 2
-        self._set_text(self.team1_box, self._format_team(teams.get("Team 1", []), title="Team 1"))
-        self._set_text(self.team2_box, self._format_team(teams.get("Team 2", []), title="Team 2"))
+        for box, team in ((self.team1_box, "Team 1"), (self.team2_box, "Team 2")):
+            title = f"{team} ({odds[team]:.0%} to win)" if team in odds else team
+            self._set_text(box, self._format_team(teams.get(team, []), title=title))
 
     def _format_team(self, members, title="Team"):
         lines = [title, "=" * len(title), ""]
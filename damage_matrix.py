@@ -0,0 +1,87 @@
+# Purpose: Per-match cache of damage and dodge chances for every attacker/defender pair
+#
+# Attack damage (max(0, attack - defense)), the raw damage of each class's
+# special and the dodge chance (speed / 100) only depend on attack_power,
+# defense and speed. Those change rarely (defend, DefenseBoostEffect), so each
+# pair is computed once and reused until one of the two characters reports a
+# stat change through Character.stats_changed(), which clears its row and
+# column. AoE specials and AI evaluation, which look at every pair, then read
+# the table instead of recomputing from raw attributes.
+
+class DamageMatrix:
+    def __init__(self, characters):
+        self.characters = list(characters)
+        n = len(self.characters)
+        self._attack = [[None] * n for _ in range(n)] # [attacker][defender] basic attack damage
+        self._special = [[None] * n for _ in range(n)] # [attacker][defender] raw special damage (before take_damage)
+        self._dodge = [None] * n # [defender] chance to dodge a basic attack
+        self.hits = 0 # lookups answered from the table
+        self.misses = 0 # lookups that had to compute (first use or after an invalidation)
+        self.invalidations = 0
+
+    # Purpose: Points every character's damage_matrix at this table and gives it its row/column
+    def attach(self):
+        for i, c in enumerate(self.characters):
+            c.damage_matrix = self
+            c.damage_slot = i
+        return self
+
+    def attack_damage(self, attacker, defender):
+        row = self._attack[attacker.damage_slot]
+        j = defender.damage_slot
+        damage = row[j]
+        if damage is None:
+            self.misses += 1
+            damage = row[j] = max(0, attacker.attack_power - defender.defense)
+        else:
+            self.hits += 1
+        return damage
+
+    # Purpose: Raw damage of the attacker's special on the defender (0 for non-damaging specials)
+    def special_damage(self, attacker, defender):
+        row = self._special[attacker.damage_slot]
+        j = defender.damage_slot
+        damage = row[j]
+        if damage is None:
+            self.misses += 1
+            formula = attacker.spec.damage if attacker.spec is not None else None
+            damage = row[j] = formula(attacker, defender) if formula else 0
+        else:
+            self.hits += 1
+        return damage
+
+    def dodge_chance(self, defender):
+        i = defender.damage_slot
+        chance = self._dodge[i]
+        if chance is None:
+            self.misses += 1
+            chance = self._dodge[i] = defender.speed / 100
+        else:
+            self.hits += 1
+        return chance
+
+    # Purpose: Average damage of a basic attack once dodges are accounted for (used by AI policies)
+    def expected_attack(self, attacker, defender):
+        return self.attack_damage(attacker, defender) * (1 - self.dodge_chance(defender))
+
+    # Purpose: Damage a special actually deals after the defender's defense (specials cannot be dodged)
+    def expected_special(self, attacker, defender):
+        return max(0, self.special_damage(attacker, defender) - defender.defense)
+
+    # Purpose: Forgets every entry involving a character whose attack, defense or speed changed
+    def invalidate(self, character):
+        i = character.damage_slot
+        n = len(self.characters)
+        self._attack[i] = [None] * n
+        self._special[i] = [None] * n
+        for row in self._attack:
+            row[i] = None
+        for row in self._special:
+            row[i] = None
+        self._dodge[i] = None
+        self.invalidations += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "invalidations": self.invalidations,
+                "hit_rate": self.hits / lookups if lookups else 0.0}
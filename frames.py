@@ -0,0 +1,160 @@
+# frames.py
+#
+# Ready-made wire frames for the server's messages, byte for byte what
+# protocol.encode_frame() would produce for the same dicts.
+#
+# Constant messages (choose_character with AVAILABLE_CLASSES, the lobby's
+# waiting/error messages, waiting_for per missing count, game_over per winner)
+# are encoded once and reused; only sets bounded by the game are cached, so
+# nothing keyed by a pid or a name. The variable ones are filled into precompiled templates:
+# JSON strings go through the C string encoder json.dumps itself uses, ints
+# and floats through repr() (what json.dumps emits for them), and everything
+# fixed - keys, punctuation, class names, status labels, action lists - is
+# pre-encoded. StateFrame compiles a match's game_state layout once, when
+# the characters are known; after that a broadcast is one join.
+#
+#   python -m benchmarks.serializers     # against encode_frame on dicts
+
+from json.encoder import encode_basestring_ascii as _json_str  # C accelerated, same escaping as json.dumps
+from typing import Dict, Iterable, List, Optional
+
+from class_table import AVAILABLE_CLASSES
+from protocol import encode_frame
+
+_STATUS_LABELS: Dict[tuple, str] = {}  # (effect class, duration) -> "StunEffect(1)", built once per pair
+_STATUS_JSON: Dict[tuple, str] = {}  # same key -> the label as a JSON string
+_ACTIONS_JSON: Dict[tuple, str] = {}  # legal action tuple -> '["attack", "defend"]'
+
+
+def status_label(effect) -> str:
+    key = (type(effect), effect.duration)
+    label = _STATUS_LABELS.get(key)
+    if label is None:
+        label = _STATUS_LABELS[key] = f"{type(effect).__name__}({effect.duration})"
+    return label
+
+
+def _status_json(effect) -> str:
+    key = (type(effect), effect.duration)
+    encoded = _STATUS_JSON.get(key)
+    if encoded is None:
+        encoded = _STATUS_JSON[key] = _json_str(status_label(effect))
+    return encoded
+
+
+def _json_value(value) -> str:
+    # ints, floats, strings and None: everything the templates put in a value position
+    if value is None:
+        return "null"
+    if isinstance(value, str):
+        return _json_str(value)
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return repr(value)
+
+
+# ----------------------------
+# Constant frames
+# ----------------------------
+CHOOSE_CHARACTER = encode_frame({"type": "choose_character", "available": AVAILABLE_CLASSES})
+PICK_TO_START = encode_frame({"type": "waiting", "message": "Pick a character to start."})
+INVALID_CHARACTER = encode_frame({"type": "error", "message": "Invalid or already-taken character."})
+NAME_TAKEN = encode_frame({"type": "error", "message": "That name is already playing in this match."})
+DISCONNECTED = encode_frame({"type": "action_result", "log": "A player disconnected. Ending match."})
+PICK_TIMEOUT = encode_frame({"type": "error", "message": "No character picked in time."})
+_REJECTED = {
+    "full": encode_frame({"type": "error", "message": "Server full, try again later."}),
+    "address": encode_frame({"type": "error", "message": "Too many connections from your address, try again later."}),
+}
+
+_waiting_for: Dict[int, bytes] = {}
+_game_over: Dict[str, bytes] = {}
+
+
+def waiting_for(missing: int) -> bytes:
+    frame = _waiting_for.get(missing)
+    if frame is None:
+        frame = _waiting_for[missing] = encode_frame(
+            {"type": "waiting", "message": f"Waiting for {missing} more player(s) to join..."})
+    return frame
+
+
+# reason: admission.FULL or admission.BUSY_ADDRESS
+def rejected(reason: str) -> bytes:
+    return _REJECTED[reason]
+
+
+def game_over(winner: str) -> bytes:
+    frame = _game_over.get(winner)
+    if frame is None:
+        frame = _game_over[winner] = encode_frame({"type": "game_over", "winner": winner})
+    return frame
+
+
+# ----------------------------
+# Templated frames
+# ----------------------------
+def welcome(pid: int) -> bytes:
+    return f'{{"type": "welcome", "player_id": {pid!r}}}\n'.encode()
+
+
+def action_result(log: str) -> bytes:
+    return f'{{"type": "action_result", "log": {_json_str(log)}}}\n'.encode()
+
+
+# labels: "Name (HP n)" target labels, as NetworkBattle._target_label builds them
+def your_turn(actor: str, cooldown: int, actions: Iterable[str], enemy: List[str], ally: List[str]) -> bytes:
+    actions = tuple(actions)
+    encoded = _ACTIONS_JSON.get(actions)
+    if encoded is None:
+        encoded = _ACTIONS_JSON[actions] = "[" + ", ".join(map(_json_str, actions)) + "]"
+    return (f'{{"type": "your_turn", "actor": {_json_str(actor)}, "cooldown": {cooldown!r}, "actions": {encoded}, '
+            f'"targets": {{"enemy": [{", ".join(map(_json_str, enemy))}], '
+            f'"ally": [{", ".join(map(_json_str, ally))}]}}}}\n').encode()
+
+
+def act(pid: int, code: int, target: Optional[int]) -> bytes:
+    return f'{{"type": "act", "p": {pid!r}, "a": {code!r}, "t": {_json_value(target)}}}\n'.encode()
+
+
+def acts(entries: List[tuple]) -> bytes:
+    body = ", ".join(f"[{p!r}, {a!r}, {_json_value(t)}]" for p, a, t in entries)
+    return f'{{"type": "acts", "l": [{body}]}}\n'.encode()
+
+
+def state_hash(turn: int, h: int) -> bytes:
+    return f'{{"type": "hash", "turn": {turn!r}, "h": {h!r}}}\n'.encode()
+
+
+# game_state for one match's roster: the teams' layout (names, keys, punctuation) is encoded once,
+# encode() only formats the values that change
+class StateFrame:
+    def __init__(self, teams: Dict[str, list]):
+        # teams: team name -> characters in roster order (None where a player has none)
+        self.members = []  # (character, JSON text before its hp)
+        prefix = '{"type": "game_state", "state": {"teams": {'
+        for t, (team, characters) in enumerate(teams.items()):
+            prefix += ("" if t == 0 else "], ") + _json_str(team) + ": ["
+            for i, c in enumerate(characters):
+                sep = "" if i == 0 else ", "
+                if c is None:
+                    prefix += sep + "null"
+                    continue
+                self.members.append((c, prefix + sep + '{"name": ' + _json_str(c.name) + ', "hp": '))
+                prefix = ""
+        self.tail = prefix + ']}, "turn_order": ['
+
+    def encode(self, turn_order: List[int], win_prob: Optional[Dict[str, float]] = None) -> bytes:
+        parts = []
+        for c, head in self.members:
+            status = ", ".join([_status_json(e) for e in c.status_effects]) if c.status_effects else ""
+            parts.append(f'{head}{c.hp!r}, "defense": {c.defense!r}, "cooldown": {c.special_move_cooldown!r}, '
+                         f'"status": [{status}]}}')
+        parts.append(self.tail)
+        parts.append(", ".join(map(repr, turn_order)))
+        if win_prob is None:
+            parts.append("]}}\n")
+        else:
+            odds = ", ".join(f"{_json_str(team)}: {p!r}" for team, p in win_prob.items())
+            parts.append(f'], "win_prob": {{{odds}}}}}}}\n')
+        return "".join(parts).encode()
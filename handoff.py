@@ -0,0 +1,215 @@
+# handoff.py
+#
+# Zero-downtime restarts for server.py. A running server started with
+# --handoff PATH listens on the Unix socket PATH; a new server started with
+# the same flag connects there and takes over:
+#
+#   1. the old server stops accepting and passes its listening socket (fd over
+#      SCM_RIGHTS), so the port never closes and new players queue in the
+#      kernel until the new server accepts them;
+#   2. players waiting in its lobby follow, each with its connection and any
+#      bytes already read from it, and so do connections that have not sent
+#      join yet (they join the new server's lobby once they do);
+#   3. every live match is passed at its next round boundary: the players'
+#      connections plus NetworkBattle.handoff_state() (settings, roster and
+#      snapshot()), which the new server resume()s on a match thread of its own.
+#
+# Clients keep their TCP connections and see one pause between two rounds.
+# The old process exits once its last match has left (matches that end before
+# reaching a round boundary finish there, and so does a match whose state does
+# not fit in a control packet). The new server's control socket replaces PATH
+# as soon as it connects (bound under a temporary name, then renamed over it),
+# so PATH always leads to a live server: a deploy started during a handoff
+# queues there and takes over once this one is done. Connections taken over
+# this way are not counted by the new server's admission limits.
+#
+#   python server.py --handoff /tmp/battle.sock      # first start, and every deploy
+#   python -m benchmarks.handoff                     # handoff time with 1000 live matches
+
+import base64
+import os
+import socket
+import threading
+import time
+from typing import TYPE_CHECKING, List, Optional
+
+from protocol import PacketTooLarge, recv_packet, send_packet
+
+if TYPE_CHECKING:
+    from server import GameServer, NetworkBattle, PlayerConn
+
+LISTENER_TIMEOUT = 10.0  # seconds a successor waits for the listening socket
+SEND_TIMEOUT = 10.0  # seconds the old server waits on a successor that stopped reading
+
+
+def _player_info(p: "PlayerConn") -> dict:
+    return {"pid": p.pid, "name": p.name, "addr": list(p.addr), "pending": list(p.pending),
+            "partial": base64.b64encode(p.decoder.leftover()).decode("ascii")}
+
+
+def _player(server: "GameServer", info: dict, fd: int) -> "PlayerConn":
+    p = server.make_player(socket.socket(fileno=fd), tuple(info["addr"]), info["pid"])
+    p.name = info["name"]
+    p.pending.extend(info["pending"])
+    p.decoder.feed(base64.b64decode(info["partial"]))
+    return p
+
+
+# ----------------------------
+# Old process: sends its work to the successor
+# ----------------------------
+class Successor:
+    def __init__(self, chan: socket.socket):
+        self.chan = chan
+        self.chan.settimeout(SEND_TIMEOUT)
+        self.lock = threading.Lock()  # match threads hand off concurrently
+        self.gone = False  # a send failed: everything left plays on here
+        self.players = 0
+        self.matches = 0
+
+    def _post(self, obj: dict, fds: List[int]) -> bool:
+        with self.lock:
+            if self.gone:
+                return False
+            try:
+                send_packet(self.chan, obj, fds)
+                return True
+            except PacketTooLarge:
+                return False  # this one stays here, the channel is fine
+            except OSError:
+                self.gone = True
+                return False
+
+    def send_listener(self, sock: socket.socket, next_pid: int) -> bool:
+        return self._post({"type": "listener", "next_pid": next_pid}, [sock.fileno()])
+
+    # joined: False for a connection that has not answered welcome yet
+    def send_player(self, p: "PlayerConn", joined: bool = True) -> bool:
+        sent = self._post({"type": "player", "player": _player_info(p), "joined": joined}, [p.conn.fileno()])
+        self.players += sent
+        return sent
+
+    # False (the match plays on here) if the successor is gone
+    def send_match(self, battle: "NetworkBattle") -> bool:
+        sent = self._post({"type": "match", "players": [_player_info(p) for p in battle.players],
+                           "state": battle.handoff_state(), "sent_at": time.time()},
+                          [p.conn.fileno() for p in battle.players])
+        self.matches += sent
+        return sent
+
+    def close(self):
+        try:
+            self.chan.close()
+        except OSError:
+            pass
+
+
+# Binds the control socket under a temporary name and renames it over path: whoever connects to path
+# reaches either the previous server or this one, never nothing (a stale file is simply replaced)
+def _bind_control(path: str) -> socket.socket:
+    tmp = f"{path}.{os.getpid()}"
+    if os.path.exists(tmp):
+        os.unlink(tmp)
+    control = socket.socket(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+    control.bind(tmp)
+    control.listen(1)
+    os.replace(tmp, path)
+    return control
+
+
+# Listens on path (or the already bound control socket) for one successor and hands the server over
+# to it; returns the listener thread
+def serve_handoffs(server: "GameServer", path: str, control: Optional[socket.socket] = None) -> threading.Thread:
+    if control is None:
+        control = _bind_control(path)
+
+    def accept():
+        while True:
+            try:
+                chan, _ = control.accept()
+            except OSError:
+                return
+            try:
+                msg, _ = recv_packet(chan)
+            except (OSError, ValueError):
+                msg = None
+            if msg is not None and msg.get("type") == "takeover":
+                break
+            chan.close()
+        control.close()  # path already names the successor's control socket
+        print(f"Handing off to a successor on {path}")
+        server.begin_handoff(Successor(chan))
+
+    t = threading.Thread(target=accept, daemon=True)
+    t.start()
+    return t
+
+
+# ----------------------------
+# New process: takes the old one's work
+# ----------------------------
+class Predecessor:
+    def __init__(self, server: "GameServer", chan: socket.socket, path: str, control: socket.socket):
+        self.server = server
+        self.chan = chan
+        self.path = path
+        self.control = control  # bound at path already; served once this takeover is done
+        self.listening = threading.Event()
+        self.started = time.perf_counter()
+        self.listener_after = 0.0  # seconds from the takeover request to the listening socket
+        self.players = 0
+        self.matches = 0
+        self.pauses: List[float] = []  # per match: seconds from the old server's send to the resume here
+
+    def run(self):
+        while True:
+            try:
+                msg, fds = recv_packet(self.chan)
+            except ValueError as e:
+                print(f"Handoff: dropped a bad control packet ({e})")
+                continue
+            except OSError:
+                msg, fds = None, []
+            if msg is None:
+                break
+            mtype = msg.get("type")
+            if mtype == "listener":
+                self.server.sock = socket.socket(fileno=fds[0])
+                self.server.next_pid = max(self.server.next_pid, msg["next_pid"])
+                self.listener_after = time.perf_counter() - self.started
+                self.listening.set()
+            elif mtype == "player":
+                self.server.add_player(_player(self.server, msg["player"], fds[0]), joined=msg["joined"])
+                self.players += 1
+            elif mtype == "match":
+                players = [_player(self.server, info, fd) for info, fd in zip(msg["players"], fds)]
+                self.server.launch_match(players, resume=msg["state"])
+                self.pauses.append(time.time() - msg["sent_at"])
+                self.matches += 1
+        self.chan.close()
+        print(self.summary())
+        serve_handoffs(self.server, self.path, self.control)  # ready for the next restart
+
+    def summary(self) -> str:
+        pauses = sorted(self.pauses) or [0.0]
+        return (f"Takeover done in {time.perf_counter() - self.started:.3f}s: listening socket after "
+                f"{self.listener_after * 1e3:.1f} ms, {self.players} waiting players, {self.matches} matches "
+                f"(pause per match median {pauses[len(pauses) // 2] * 1e3:.1f} ms, max {pauses[-1] * 1e3:.1f} ms)")
+
+
+# Takes over from the server listening on path, if there is one: returns False (and does nothing) if
+# there is none. On True, server.sock is the predecessor's listening socket and its matches are arriving.
+def take_over(server: "GameServer", path: str) -> bool:
+    chan = socket.socket(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+    try:
+        chan.connect(path)
+    except (FileNotFoundError, ConnectionRefusedError):
+        chan.close()
+        return False
+    control = _bind_control(path)  # a deploy started from now on queues behind this one
+    send_packet(chan, {"type": "takeover"})
+    predecessor = Predecessor(server, chan, path, control)
+    threading.Thread(target=predecessor.run, daemon=True).start()
+    if not predecessor.listening.wait(LISTENER_TIMEOUT):
+        raise RuntimeError(f"the server on {path} did not hand over its listening socket")
+    return True
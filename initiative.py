@@ -0,0 +1,164 @@
+import heapq
+import itertools
+import random
+
+# Purpose: Speed-based initiative scheduler shared by BattleManager and NetworkBattle
+#
+# Every living actor has exactly one entry in a heap keyed by
+# (round, -initiative, tiebreak). Popping the next actor and pushing it back
+# for the following round are O(log n), so a turn never scans the whole roster.
+# Eliminated actors are dropped by marking their entry removed (lazy deletion);
+# stale entries are skipped when popped and compacted away once they pile up.
+
+_REMOVED = object() # placeholder for a removed actor
+
+class InitiativeScheduler:
+    def __init__(self, actors, speed_of=lambda actor: actor.speed, rng=None):
+        self._speed_of = speed_of # reads an actor's base initiative (speed)
+        self._rng = rng or random # breaks ties between equal speeds, like the old random.shuffle
+        self._heap = [] # entries: [round, -initiative, tiebreak, seq, actor]
+        self._entries = {} # id(actor) -> live heap entry
+        self._modifiers = {} # id(actor) -> initiative bonus/penalty from effects
+        self._tiebreak = {} # id(actor) -> fixed random tiebreak
+        self._seq = itertools.count() # keeps heap comparisons away from the actor objects
+        self._stale = 0 # removed entries still sitting in the heap
+        self.round = 0 # round of the actor popped last
+        for actor in actors:
+            self.add(actor)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, actor):
+        return id(actor) in self._entries
+
+    # Purpose: Current initiative of an actor (speed plus modifiers)
+    def initiative(self, actor):
+        return self._speed_of(actor) + self._modifiers.get(id(actor), 0)
+
+    # Purpose: Adds an actor, acting in the current round if it has not started yet
+    def add(self, actor, round_no=None):
+        key = id(actor)
+        if key in self._entries:
+            return
+        if key not in self._tiebreak:
+            self._tiebreak[key] = self._rng.random()
+        self._push(actor, self.round if round_no is None else round_no)
+
+    def _push(self, actor, round_no):
+        entry = [round_no, -self.initiative(actor), self._tiebreak[id(actor)], next(self._seq), actor]
+        self._entries[id(actor)] = entry
+        heapq.heappush(self._heap, entry)
+
+    # Purpose: Drops an eliminated actor in O(1) (its heap entry is skipped later)
+    def remove(self, actor):
+        entry = self._entries.pop(id(actor), None)
+        if entry is None:
+            return
+        entry[-1] = _REMOVED
+        self._stale += 1
+        if self._stale > len(self._entries) and self._stale > 64:
+            self._compact()
+
+    def _compact(self):
+        self._heap = [e for e in self._heap if e[-1] is not _REMOVED]
+        heapq.heapify(self._heap)
+        self._stale = 0
+
+    # Purpose: Re-keys an actor after its speed changed, keeping its place in the round
+    def update(self, actor):
+        entry = self._entries.get(id(actor))
+        if entry is None:
+            return
+        round_no = entry[0]
+        self.remove(actor)
+        self._push(actor, round_no)
+
+    # Purpose: Initiative-modifying effects (haste/slow); applies from the actor's next slot
+    def modify(self, actor, delta):
+        self._modifiers[id(actor)] = self._modifiers.get(id(actor), 0) + delta
+        self.update(actor)
+
+    # Purpose: Pushes an actor's next turn back by whole rounds (e.g. a stun)
+    def delay(self, actor, rounds=1):
+        entry = self._entries.get(id(actor))
+        if entry is None:
+            return
+        round_no = entry[0] + rounds
+        self.remove(actor)
+        self._push(actor, round_no)
+
+    def _skip_stale(self):
+        heap = self._heap
+        while heap and heap[0][-1] is _REMOVED:
+            heapq.heappop(heap)
+            self._stale -= 1
+
+    # Purpose: Round of the next actor, without popping it (None when empty)
+    def peek_round(self):
+        self._skip_stale()
+        return self._heap[0][0] if self._heap else None
+
+    # Purpose: Pops the next actor and schedules it again for the following round
+    def next_actor(self):
+        self._skip_stale()
+        if not self._heap:
+            return None
+        # the top entry is reused for the next round and sifted down in one step
+        entry = self._heap[0]
+        self.round = entry[0]
+        entry[0] += 1
+        heapq.heapreplace(self._heap, entry)
+        return entry[-1]
+
+    # Purpose: Pops every actor due in the next round, in initiative order
+    def next_round(self):
+        round_no = self.peek_round()
+        actors = []
+        while round_no is not None and self.peek_round() == round_no:
+            actors.append(self.next_actor())
+        return actors
+
+    # Purpose: The next n actors in order, for the UI (does not change the schedule)
+    # Only the n earliest entries (and their repeats) can appear in the first n
+    # slots, so the replay runs on copies of those and never on the whole roster.
+    def preview(self, n):
+        if n <= 0 or not self._entries:
+            return []
+        timeline = [list(e) for e in heapq.nsmallest(n + self._stale, self._heap) if e[-1] is not _REMOVED][:n]
+        order = []
+        while len(order) < n:
+            entry = timeline[0]
+            order.append(entry[-1])
+            entry[0] += 1
+            heapq.heapreplace(timeline, entry)
+        return order
+
+    # Purpose: JSON-friendly copy of the schedule, actors written as key_of(actor)
+    # Used to resynchronise lockstep clients and to hand matches over between processes.
+    def snapshot(self, key_of):
+        seq = next(self._seq)
+        self._seq = itertools.count(seq) # peeked, not consumed
+        return {
+            "round": self.round,
+            "seq": seq,
+            "entries": [[key_of(e[-1]), e[0], e[1], e[2], e[3]] for e in self._heap if e[-1] is not _REMOVED],
+            "modifiers": [[key_of(e[-1]), self._modifiers[id(e[-1])]] for e in self._entries.values()
+                          if id(e[-1]) in self._modifiers],
+        }
+
+    # Purpose: Replaces the schedule with a snapshot, actor_of turns keys back into actors
+    def restore(self, snap, actor_of):
+        self._heap, self._entries, self._modifiers, self._tiebreak = [], {}, {}, {}
+        for key, round_no, neg_init, tiebreak, seq in snap["entries"]:
+            actor = actor_of(key)
+            entry = [round_no, neg_init, tiebreak, seq, actor]
+            self._entries[id(actor)] = entry
+            self._tiebreak[id(actor)] = tiebreak
+            self._heap.append(entry)
+        heapq.heapify(self._heap)
+        for key, delta in snap["modifiers"]:
+            self._modifiers[id(actor_of(key))] = delta
+        self._seq = itertools.count(snap["seq"])
+        self._stale = 0
+        self.round = snap["round"]
@@ -0,0 +1,119 @@
+# Purpose: Living characters per team and the legal actions of a single turn
+#
+# LivingIndex keeps each team's living members in roster order and is updated
+# when someone is eliminated, so a turn never rescans both teams. ActionTable
+# is built from it once per turn: the actions the actor may take and the valid
+# targets of each. The prompt, input validation, bots and simulators all read
+# the same table instead of re-deriving targets and special-move rules.
+#
+# Members can be characters themselves (BattleManager, Simulation) or wrappers
+# such as the server's PlayerConn, given a character_of accessor.
+
+class LivingIndex:
+    def __init__(self, teams, character_of=lambda member: member):
+        self.character_of = character_of # member -> Character
+        self._team_of = {} # id(member) -> team name
+        self._living = {} # team name -> living members, in roster order
+        names = list(teams)
+        self._enemy = {names[0]: names[-1], names[-1]: names[0]} # the two sides face each other
+        for team_name, members in teams.items():
+            self._living[team_name] = [m for m in members if character_of(m).hp > 0]
+            for m in members:
+                self._team_of[id(m)] = team_name
+
+    def team_of(self, member):
+        return self._team_of[id(member)]
+
+    def enemy_team_of(self, member):
+        return self._enemy[self._team_of[id(member)]]
+
+    # Purpose: Living members of a team (the index's own list, do not modify it)
+    def living(self, team_name):
+        return self._living[team_name]
+
+    def allies_of(self, member):
+        return self._living[self._team_of[id(member)]]
+
+    def enemies_of(self, member):
+        return self._living[self.enemy_team_of(member)]
+
+    def alive(self, team_name):
+        return bool(self._living[team_name])
+
+    # Purpose: Takes an eliminated member out of its team's living list
+    def remove(self, member):
+        living = self._living[self._team_of[id(member)]]
+        if member in living:
+            living.remove(member)
+
+    # Purpose: Removes every member of the given ones that is at 0 HP or below
+    def drop_eliminated(self, members):
+        for m in members:
+            if self.character_of(m).hp <= 0:
+                self.remove(m)
+
+
+# Purpose: The legal actions and targets of one actor's turn
+# Target lists are snapshots taken when the turn starts; a target index in an
+# action always points into them.
+class ActionTable:
+    __slots__ = ("actor", "character", "enemies", "allies", "special", "actions")
+
+    def __init__(self, actor, index):
+        c = index.character_of(actor)
+        self.actor = actor
+        self.character = c
+        self.enemies = tuple(index.enemies_of(actor))
+        self.allies = tuple(index.allies_of(actor))
+        # how the special is aimed this turn: None (on cooldown), "enemy", "ally", "all" (AoE) or "self"
+        if c.special_move_cooldown > 0:
+            self.special = None
+        elif c.target_type == "self":
+            self.special = "self"
+        elif c.target_type == "ally":
+            self.special = "ally"
+        else:
+            self.special = "all" if c.is_aoe else "enemy"
+        actions = []
+        if self.enemies:
+            actions.append("attack")
+        actions.append("defend")
+        if self.special == "self" or (self.special == "all" and self.enemies) or self.targets("special"):
+            actions.append("special")
+        self.actions = tuple(actions)
+
+    # Purpose: The targets an action picks from (empty when it takes no target)
+    def targets(self, action):
+        if action == "attack":
+            return self.enemies
+        if action == "special":
+            if self.special == "enemy":
+                return self.enemies
+            if self.special == "ally":
+                return self.allies
+        return ()
+
+    def needs_target(self, action):
+        return action == "attack" or (action == "special" and self.special in ("enemy", "ally"))
+
+    # Purpose: The chosen target member, or None if the action takes none or the index is invalid
+    def pick(self, action, target_index):
+        targets = self.targets(action)
+        if target_index is None or not 0 <= target_index < len(targets):
+            return None
+        return targets[target_index]
+
+    def is_legal(self, action, target_index=None):
+        if action not in self.actions:
+            return False
+        return not self.needs_target(action) or self.pick(action, target_index) is not None
+
+    # Purpose: Every legal (action, target_index) pair, for bots and search
+    def choices(self):
+        out = []
+        for action in self.actions:
+            if self.needs_target(action):
+                out.extend((action, i) for i in range(len(self.targets(action))))
+            else:
+                out.append((action, None))
+        return out
@@ -0,0 +1,171 @@
+# lockstep.py
+#
+# Client side of lockstep matches (server.py --lockstep). The server sends the
+# seed and roster once, then only the validated actions; LockstepReplica runs
+# the server's own NetworkBattle code on them in a background thread and
+# emits the game_state / action_result / your_turn messages a classic server
+# would have sent, so the UI code handling them does not change.
+#
+# Every hash_every turns the server sends a state hash. A mismatch (or an
+# action from someone the replica did not expect to act) sends resync_request;
+# the replica then ignores actions until the server's snapshot arrives at the
+# start of the next round, restores it and carries on from there.
+#
+#   replica = LockstepReplica(start_msg, own_pid, emit=ui_queue.put, send=client.send)
+#   replica.start(); ... replica.feed(msg) for every message after lockstep_start
+
+import queue
+import threading
+from typing import Callable, Dict, List, Optional
+
+from legal_actions import ActionTable
+from server import NetworkBattle, ACTION_CODES
+
+
+class _Resynced(Exception):
+    pass
+
+
+class _MatchOver(Exception):
+    pass
+
+
+# Stand-in for PlayerConn: the replica never talks to other players
+class ReplicaPlayer:
+    def __init__(self, pid: int, name: str):
+        self.pid = pid
+        self.name = name
+        self.character = None
+        self.team = None
+
+    def send(self, obj: dict):
+        pass
+
+    def send_frame(self, data: bytes):
+        pass
+
+
+def decode_action(code: int, target_index: Optional[int]) -> dict:
+    action = ACTION_CODES[code] if 0 <= code < len(ACTION_CODES) else None
+    return {"action": action, "target_index": target_index}
+
+
+class LockstepReplica(NetworkBattle):
+    def __init__(self, start: dict, own_pid: Optional[int] = None,
+                 emit: Optional[Callable[[dict], None]] = None, send: Optional[Callable[[dict], None]] = None):
+        players = [ReplicaPlayer(pid, name) for pid, _, name in start["players"]]
+        super().__init__(players, parallel=start["parallel"], max_rounds=start["max_rounds"], seed=start["seed"],
+                         quiet=True, lockstep=True, hash_every=start["hash_every"])
+        self.own_pid = own_pid  # prompts are emitted for this player only (None = spectator)
+        self.emit = emit or (lambda msg: None)  # where synthesized server messages go
+        self.send = send  # back channel to the server, for resync_request
+        self.inbox: "queue.Queue[dict]" = queue.Queue()
+        self.hashes: Dict[int, int] = {}  # turn -> local state_hash(), until the server's arrives
+        self.resyncing = False
+        self.checks = 0  # server hashes that matched
+        self.desyncs = 0
+        self.thread: Optional[threading.Thread] = None
+        self._setup_match([cls for _, cls, _ in start["players"]])
+
+    # ---------- driving ----------
+    def feed(self, msg: dict):
+        self.inbox.put(msg)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def join(self, timeout: Optional[float] = None):
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    # Unblocks the replica when the connection drops without a game_over
+    def close(self):
+        self.inbox.put({"type": "closed"})
+
+    def run(self):
+        self._broadcast_state("Match start!")
+        while True:
+            try:
+                self._play()
+                self._drain()
+            except _Resynced:
+                continue
+            except _MatchOver:
+                return
+
+    # After the local match ends only game_over (and late hashes) may follow
+    def _drain(self):
+        while True:
+            self._next()
+            self._desync()
+
+    # Next act/acts message; handles hashes, snapshots and pass-through messages on the way
+    def _next(self) -> dict:
+        while True:
+            msg = self.inbox.get()
+            mtype = msg.get("type")
+            if mtype in ("act", "acts"):
+                if not self.resyncing:
+                    return msg
+            elif mtype == "hash":
+                mine = self.hashes.pop(msg["turn"], None)
+                if not self.resyncing and mine is not None:
+                    if mine != msg["h"]:
+                        self._desync()
+                    else:
+                        self.checks += 1
+            elif mtype == "resync":
+                self.restore(msg["snapshot"])
+                self.hashes.clear()
+                self.resyncing = False
+                self._broadcast_state("Resynchronised with the server.")
+                raise _Resynced()
+            elif mtype == "game_over":
+                self.emit(msg)
+                raise _MatchOver()
+            elif mtype == "closed":
+                raise _MatchOver()
+            else:
+                # errors, and the classic game_state/your_turn the server sends while we resync
+                self.emit(msg)
+
+    def _desync(self):
+        if self.resyncing:
+            return
+        self.resyncing = True
+        self.desyncs += 1
+        if self.send is not None:
+            self.send({"type": "resync_request"})
+
+    # ---------- NetworkBattle hooks ----------
+    def _wait_for_action(self, p: ReplicaPlayer) -> Optional[dict]:
+        while True:
+            msg = self._next()
+            if msg["type"] == "act" and msg["p"] == p.pid:
+                return decode_action(msg["a"], msg["t"])
+            self._desync()
+
+    def _collect_actions(self, planners: List[ReplicaPlayer]) -> Optional[Dict[int, dict]]:
+        expected = [p.pid for p in planners]
+        while True:
+            msg = self._next()
+            if msg["type"] == "acts" and [entry[0] for entry in msg["l"]] == expected:
+                return {pid: decode_action(code, index) for pid, code, index in msg["l"]}
+            self._desync()
+
+    def _prompt_turn(self, p: ReplicaPlayer) -> ActionTable:
+        table = ActionTable(p, self.living)
+        if p.pid == self.own_pid:
+            self.emit(self._turn_prompt(p, table))
+        return table
+
+    def _broadcast_state(self, log: str):
+        self.emit({"type": "game_state", "state": self.serialize_state()})
+        self.emit({"type": "action_result", "log": log})
+
+    def _checkpoint(self):
+        self.hashes[self.turns] = self.state_hash()
+
+    def _read_requests(self):
+        pass  # requests come from clients; the replica is one
@@ -0,0 +1,225 @@
+# match_store.py
+#
+# Persistent match results in a local SQLite database.
+#
+# record() only puts the result on a queue, so the battle loop never waits on
+# disk. A background writer drains the queue and inserts whole batches in one
+# transaction. WAL mode lets the server and simulator processes write to the
+# same file while queries read from it.
+#
+#   python match_store.py --db matches.db      # print summary queries
+
+import argparse
+import itertools
+import queue
+import sqlite3
+import threading
+import time
+from typing import List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS matches (
+    id       INTEGER PRIMARY KEY,
+    source   TEXT    NOT NULL,   -- "server" or "simulator"
+    mode     TEXT    NOT NULL,   -- "1v1", "2v2", "3v3"
+    winner   TEXT    NOT NULL,   -- "Team 1", "Team 2" or "Draw"
+    turns    INTEGER NOT NULL,
+    duration REAL    NOT NULL,   -- seconds
+    seed     INTEGER,
+    ended_at REAL    NOT NULL    -- unix time
+);
+CREATE TABLE IF NOT EXISTS roster (
+    match_id INTEGER NOT NULL REFERENCES matches(id),
+    player   TEXT,               -- NULL for simulated lineups and anonymous players
+    class    TEXT    NOT NULL,
+    team     TEXT    NOT NULL,
+    won      INTEGER NOT NULL    -- 1 win, 0 loss or draw
+);
+CREATE INDEX IF NOT EXISTS idx_matches_ended ON matches(ended_at);
+CREATE INDEX IF NOT EXISTS idx_roster_class  ON roster(class, won);
+CREATE INDEX IF NOT EXISTS idx_roster_player ON roster(player, match_id);
+CREATE INDEX IF NOT EXISTS idx_roster_match  ON roster(match_id);
+"""
+
+_STOP = object()  # queue sentinel that tells the writer to finish
+RESULT_KEYS = ("mode", "winner", "turns", "duration", "roster")
+ROSTER_KEYS = ("class", "team")
+
+
+def connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=30.0, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")  # durable at checkpoints; fine for match history
+    conn.executescript(SCHEMA)
+    return conn
+
+
+class MatchStore:
+    def __init__(self, path: str = "matches.db", batch_size: int = 1000, flush_interval: float = 0.25):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval  # longest a result waits before it is written
+        self._queue: "queue.Queue" = queue.Queue()
+        self._read_conn = connect(path)
+        self._read_lock = threading.Lock()
+        self.written = 0
+        self.batches = 0
+        self.failed = 0  # results the writer could not insert (logged, then dropped)
+        self._writer = threading.Thread(target=self._write_loop, name="match-store-writer", daemon=True)
+        self._writer.start()
+
+    # ---------- writes ----------
+    def record(self, result: dict):
+        # result: {source, mode, winner, turns, duration, seed, roster: [{player, class, team}]}
+        # Raises ValueError here, in the caller, rather than losing the result later in the writer
+        missing = [k for k in RESULT_KEYS if k not in result]
+        if missing:
+            raise ValueError(f"match result without {', '.join(missing)}")
+        if not isinstance(result["roster"], list) or not all(
+                isinstance(m, dict) and all(k in m for k in ROSTER_KEYS) for m in result["roster"]):
+            raise ValueError("match roster entries need class and team")
+        self._queue.put(result)
+
+    def flush(self):
+        # blocks until everything recorded so far is on disk
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait()
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._writer.join()
+        self._read_conn.close()
+
+    def _write_loop(self):
+        conn = connect(self.path)
+        stopping = False
+        while not stopping:
+            batch, waiters = [], []
+            item = self._queue.get()
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is _STOP:
+                    stopping = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+                if stopping or waiters or len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            try:
+                if batch:
+                    self._write(conn, batch)
+            finally:
+                for w in waiters:  # flush() returns even if the batch failed
+                    w.set()
+        conn.close()
+
+    # A failed batch is retried one result at a time, so one bad row (or a locked database) does not
+    # take the rest of the batch, or the writer thread, with it
+    def _write(self, conn: sqlite3.Connection, batch: List[dict]):
+        try:
+            self._insert(conn, batch)
+            return
+        except (sqlite3.Error, LookupError, TypeError, ValueError):
+            pass
+        for r in batch:
+            try:
+                self._insert(conn, [r])
+            except (sqlite3.Error, LookupError, TypeError, ValueError) as e:
+                self.failed += 1
+                print(f"Match store: could not write a result ({type(e).__name__}: {e}); "
+                      f"{self.failed} lost so far")
+
+    def _insert(self, conn: sqlite3.Connection, batch: List[dict]):
+        now = time.time()
+        with conn:  # one transaction per batch
+            cur = conn.cursor()
+            for r in batch:
+                cur.execute(
+                    "INSERT INTO matches (source, mode, winner, turns, duration, seed, ended_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (r.get("source", "server"), r["mode"], r["winner"], r["turns"],
+                     r["duration"], r.get("seed"), r.get("ended_at", now)))
+                match_id = cur.lastrowid
+                winner = r["winner"]
+                cur.executemany(
+                    "INSERT INTO roster (match_id, player, class, team, won) VALUES (?, ?, ?, ?, ?)",
+                    [(match_id, m.get("player"), m["class"], m["team"], int(m["team"] == winner))
+                     for m in r["roster"]])
+        self.written += len(batch)
+        self.batches += 1
+
+    # ---------- queries ----------
+    def _query(self, sql: str, params: tuple = ()) -> list:
+        with self._read_lock:
+            return self._read_conn.execute(sql, params).fetchall()
+
+    def class_win_rates(self, mode: Optional[str] = None) -> list:
+        # [(class, games, wins, win_rate)], best first
+        sql = ("SELECT r.class, COUNT(*), SUM(r.won), AVG(r.won) FROM roster r "
+               + ("JOIN matches m ON m.id = r.match_id WHERE m.mode = ? " if mode else "")
+               + "GROUP BY r.class ORDER BY AVG(r.won) DESC")
+        return self._query(sql, (mode,) if mode else ())
+
+    def player_history(self, player: str, limit: int = 20) -> list:
+        # [(match_id, ended_at, mode, class, team, won)], newest first
+        return self._query(
+            "SELECT m.id, m.ended_at, m.mode, r.class, r.team, r.won FROM roster r "
+            "JOIN matches m ON m.id = r.match_id WHERE r.player = ? "
+            "ORDER BY r.match_id DESC LIMIT ?", (player, limit))
+
+    def recent_matches(self, limit: int = 20) -> list:
+        # [(match_id, ended_at, source, mode, winner, turns, duration, seed)], newest first
+        return self._query(
+            "SELECT id, ended_at, source, mode, winner, turns, duration, seed FROM matches "
+            "ORDER BY ended_at DESC LIMIT ?", (limit,))
+
+    def iter_results(self, source: Optional[str] = None, batch: int = 10000):
+        # Replays stored matches oldest first, in the dict shape record() takes.
+        # Uses its own connection and streams rows, so a full history never sits in memory.
+        conn = sqlite3.connect(self.path, timeout=30.0)
+        try:
+            cur = conn.execute(
+                "SELECT m.id, m.source, m.mode, m.winner, m.turns, m.duration, m.seed, m.ended_at, "
+                "r.player, r.class, r.team FROM matches m JOIN roster r ON r.match_id = m.id "
+                + ("WHERE m.source = ? " if source else "")
+                + "ORDER BY m.id", (source,) if source else ())
+            rows = itertools.chain.from_iterable(iter(lambda: cur.fetchmany(batch), []))
+            for match_id, group in itertools.groupby(rows, key=lambda row: row[0]):
+                group = list(group)
+                _, src, mode, winner, turns, duration, seed, ended_at = group[0][:8]
+                yield {
+                    "id": match_id, "source": src, "mode": mode, "winner": winner, "turns": turns,
+                    "duration": duration, "seed": seed, "ended_at": ended_at,
+                    "roster": [{"player": row[8], "class": row[9], "team": row[10]} for row in group],
+                }
+        finally:
+            conn.close()
+
+    def roster_of(self, match_id: int) -> list:
+        return self._query("SELECT player, class, team, won FROM roster WHERE match_id = ?", (match_id,))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Match history queries")
+    parser.add_argument("--db", default="matches.db")
+    parser.add_argument("--player", default=None, help="show this player's recent matches")
+    args = parser.parse_args()
+
+    store = MatchStore(args.db)
+    print("Class win rates:")
+    for cls, games, wins, rate in store.class_win_rates():
+        print(f"  {cls:12s} {games:>8} games  {rate:6.1%}")
+    if args.player:
+        print(f"\nHistory for {args.player}:")
+        for row in store.player_history(args.player):
+            print("  ", row)
+    print("\nRecent matches:")
+    for row in store.recent_matches(10):
+        print("  ", row)
+    store.close()
@@ -0,0 +1,108 @@
+# protocol.py
+#
+# Newline-delimited JSON framing shared by the server and the clients.
+# Every message is one JSON object followed by b"\n". Server processes talk
+# to each other in control packets (send_packet/recv_packet) instead.
+
+import json
+import os
+import socket
+from typing import List, Optional
+
+DELIMITER = b"\n"
+RECV_SIZE = 65536  # safe to read big chunks now that decoding is linear
+MAX_PACKET = 65536  # largest control packet (send_packet/recv_packet)
+
+
+def encode_frame(obj: dict) -> bytes:
+    return (json.dumps(obj) + "\n").encode("utf-8")
+
+
+class FrameTooLarge(ValueError):
+    pass
+
+
+class PacketTooLarge(ValueError):
+    pass
+
+
+# ----------------------------
+# Incremental frame decoder
+# ----------------------------
+# Bytes are appended to a single bytearray. Delimiters are searched from
+# where the previous scan stopped, so a frame split over many recv() calls
+# is never rescanned, and consumed frames are dropped with one `del` per
+# feed instead of re-slicing the remaining buffer after every message.
+# With max_frame set, a frame longer than that (complete or still arriving)
+# raises FrameTooLarge, so a peer cannot grow the buffer without bound.
+class FrameDecoder:
+    def __init__(self, max_frame: Optional[int] = None):
+        self._buf = bytearray()
+        self._scan = 0         # offset where the next delimiter search starts
+        self.bad_frames = 0    # frames that were not valid JSON (skipped)
+        self.max_frame = max_frame
+
+    def feed(self, data) -> List[dict]:
+        buf = self._buf
+        buf += data
+        frames = []
+        start = 0
+        pos = buf.find(DELIMITER, self._scan)
+        while pos != -1:
+            if self.max_frame is not None and pos - start > self.max_frame:
+                raise FrameTooLarge(f"frame of {pos - start} bytes")
+            if pos > start:
+                try:
+                    # json.loads accepts the bytearray slice directly (no str decode step)
+                    frames.append(json.loads(buf[start:pos]))
+                except ValueError:
+                    self.bad_frames += 1
+            start = pos + 1
+            pos = buf.find(DELIMITER, start)
+        if start:
+            del buf[:start]
+        if self.max_frame is not None and len(buf) > self.max_frame:
+            raise FrameTooLarge(f"unterminated frame of {len(buf)}+ bytes")
+        self._scan = len(buf)
+        return frames
+
+    def pending_bytes(self) -> int:
+        return len(self._buf)
+
+    # The start of a frame still arriving; feeding it to a fresh decoder continues where this one stopped
+    def leftover(self) -> bytes:
+        return bytes(self._buf)
+
+
+# ----------------------------
+# Control packets
+# ----------------------------
+# Between server processes (supervisor <-> workers, a server and its
+# successor): one JSON object per AF_UNIX SOCK_SEQPACKET packet, with any
+# file descriptors travelling alongside it (SCM_RIGHTS). A packet is at most
+# MAX_PACKET bytes: send_packet raises PacketTooLarge instead of sending one
+# the other end would only get the start of.
+def send_packet(chan: socket.socket, obj: dict, fds: Optional[List[int]] = None):
+    data = json.dumps(obj).encode("utf-8")
+    if len(data) > MAX_PACKET:
+        raise PacketTooLarge(f"control packet of {len(data)} bytes")
+    if fds:
+        socket.send_fds(chan, [data], fds)
+    else:
+        chan.send(data)
+
+
+# (message, fds); (None, []) once the other end has closed. Raises ValueError for a truncated
+# or undecodable packet, after closing the fds that came with it.
+def recv_packet(chan: socket.socket):
+    data, fds, flags, _ = socket.recv_fds(chan, MAX_PACKET, 64)
+    if not data:
+        return None, []
+    try:
+        if flags & (socket.MSG_TRUNC | socket.MSG_CTRUNC):
+            raise ValueError("truncated control packet")
+        return json.loads(data), fds
+    except ValueError:
+        for fd in fds:
+            os.close(fd)
+        raise
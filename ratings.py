@@ -0,0 +1,263 @@
+# ratings.py
+#
+# Incremental Elo ratings fed by the match results NetworkBattle produces
+# (the same dict GameServer records in MatchStore when game_over is sent).
+#
+# Every rated player also sits in a RankIndex keyed by (-rating, name), so
+# "rank of player X" and "top 100" stay O(log n) with a million players.
+# rerate() replays stored results in bulk after a formula change.
+#
+#   python ratings.py --db matches.db --top 20
+
+import argparse
+import re
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+# ----------------------------
+# Order-statistics index
+# ----------------------------
+# A sorted list split into sublists of about LOAD keys, plus a Fenwick tree
+# over the sublist lengths. Locating a key is a bisect over the sublist maxes
+# and one inside a sublist; its rank adds a Fenwick prefix sum. The tree is
+# only rebuilt when a sublist splits or empties (amortized O(1) per update).
+class RankIndex:
+    LOAD = 1000
+
+    def __init__(self, keys: Iterable = ()):
+        self._rebuild(sorted(keys))
+
+    def _rebuild(self, keys: list):
+        load = self.LOAD
+        self._lists = [keys[i:i + load] for i in range(0, len(keys), load)]
+        self._maxes = [sub[-1] for sub in self._lists]
+        self._len = len(keys)
+        self._build_tree()
+
+    def _build_tree(self):
+        n = len(self._lists)
+        tree = [0] * (n + 1)
+        for i, sub in enumerate(self._lists, 1):
+            tree[i] += len(sub)
+            parent = i + (i & -i)
+            if parent <= n:
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def _tree_add(self, i: int, delta: int):
+        tree = self._tree
+        i += 1
+        while i < len(tree):
+            tree[i] += delta
+            i += i & -i
+
+    def _prefix(self, i: int) -> int:
+        # number of keys in sublists [0, i)
+        tree, total = self._tree, 0
+        while i > 0:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+    def _locate(self, pos: int) -> Tuple[int, int]:
+        # (sublist, offset) of the key at position pos, by Fenwick descent
+        tree, i, step = self._tree, 0, 1 << (len(self._tree) - 1).bit_length()
+        while step:
+            j = i + step
+            if j < len(tree) and tree[j] <= pos:
+                i = j
+                pos -= tree[j]
+            step >>= 1
+        return i, pos
+
+    def __len__(self):
+        return self._len
+
+    def add(self, key):
+        if not self._lists:
+            self._rebuild([key])
+            return
+        i = bisect_left(self._maxes, key)
+        if i == len(self._maxes):
+            i -= 1
+        sub = self._lists[i]
+        insort(sub, key)
+        self._maxes[i] = sub[-1]
+        self._len += 1
+        if len(sub) > 2 * self.LOAD:
+            half = len(sub) // 2
+            self._lists[i:i + 1] = [sub[:half], sub[half:]]
+            self._maxes[i:i + 1] = [sub[half - 1], sub[-1]]
+            self._build_tree()
+        else:
+            self._tree_add(i, 1)
+
+    def remove(self, key):
+        i = bisect_left(self._maxes, key)
+        sub = self._lists[i] if i < len(self._lists) else None
+        j = bisect_left(sub, key) if sub else 0
+        if not sub or j == len(sub) or sub[j] != key:
+            raise KeyError(key)
+        del sub[j]
+        self._len -= 1
+        if sub:
+            self._maxes[i] = sub[-1]
+            self._tree_add(i, -1)
+        else:
+            del self._lists[i]
+            del self._maxes[i]
+            self._build_tree()
+
+    def rank(self, key) -> int:
+        # number of keys strictly smaller than key (0-based position if present)
+        i = bisect_left(self._maxes, key)
+        if i == len(self._maxes):
+            return self._len
+        return self._prefix(i) + bisect_left(self._lists[i], key)
+
+    def __getitem__(self, pos: int):
+        if pos < 0:
+            pos += self._len
+        if not 0 <= pos < self._len:
+            raise IndexError(pos)
+        i, offset = self._locate(pos)
+        return self._lists[i][offset]
+
+    def slice(self, start: int, stop: int) -> list:
+        out = []
+        if start >= self._len or stop <= start:
+            return out
+        i, offset = self._locate(start)
+        need = min(stop, self._len) - start
+        while need > 0:
+            chunk = self._lists[i][offset:offset + need]
+            out.extend(chunk)
+            need -= len(chunk)
+            i, offset = i + 1, 0
+        return out
+
+
+# ----------------------------
+# Elo rating engine
+# ----------------------------
+# Team matches use the average rating of each side; every member of a side
+# gets that side's delta. Draws score 0.5. Unnamed roster entries (simulated,
+# anonymous clients, or the "Player {pid}" placeholder older server builds
+# recorded) are not rated. Deltas are per roster entry, so a name listed
+# twice in one match gets both of its entries' changes.
+PLACEHOLDER_NAME = re.compile(r"Player \d+\Z")
+
+
+def is_rated_name(name: Optional[str]) -> bool:
+    return bool(name) and not PLACEHOLDER_NAME.match(name)
+
+
+class RatingEngine:
+    def __init__(self, k: float = 32.0, initial: float = 1500.0, scale: float = 400.0):
+        self.k = k
+        self.initial = initial
+        self.scale = scale
+        self.ratings: Dict[str, float] = {}
+        self.games: Dict[str, int] = {}
+        self.index = RankIndex()
+
+    # ---------- formula ----------
+    def expected(self, rating_a: float, rating_b: float) -> float:
+        return 1.0 / (1.0 + 10.0 ** ((rating_b - rating_a) / self.scale))
+
+    # [(player, rating change)], one pair per rated roster entry
+    def _deltas(self, ratings: Dict[str, float], result: dict) -> Optional[List[Tuple[str, float]]]:
+        sides: Dict[str, List[str]] = {}
+        for m in result["roster"]:
+            if is_rated_name(m.get("player")):
+                sides.setdefault(m["team"], []).append(m["player"])
+        if len(sides) != 2:
+            return None
+        (team_a, players_a), (team_b, players_b) = sorted(sides.items())
+        initial = self.initial
+        avg_a = sum(ratings.get(p, initial) for p in players_a) / len(players_a)
+        avg_b = sum(ratings.get(p, initial) for p in players_b) / len(players_b)
+        winner = result["winner"]
+        score_a = 1.0 if winner == team_a else 0.0 if winner == team_b else 0.5
+        delta = self.k * (score_a - self.expected(avg_a, avg_b))
+        return [(p, delta) for p in players_a] + [(p, -delta) for p in players_b]
+
+    # ---------- incremental updates ----------
+    def update(self, result: dict) -> Dict[str, float]:
+        # applies one finished match, returns {player: rating change}
+        deltas = self._deltas(self.ratings, result)
+        if not deltas:
+            return {}
+        changes: Dict[str, float] = {}
+        for player, delta in deltas:
+            old = self.ratings.get(player)
+            if old is not None:
+                self.index.remove((-old, player))
+            new = (self.initial if old is None else old) + delta
+            self.ratings[player] = new
+            self.games[player] = self.games.get(player, 0) + 1
+            self.index.add((-new, player))
+            changes[player] = changes.get(player, 0.0) + delta
+        return changes
+
+    # ---------- queries ----------
+    def rating_of(self, player: str) -> Optional[float]:
+        return self.ratings.get(player)
+
+    def rank_of(self, player: str) -> Optional[int]:
+        # 1 = best
+        rating = self.ratings.get(player)
+        if rating is None:
+            return None
+        return self.index.rank((-rating, player)) + 1
+
+    def top(self, n: int = 100, start: int = 0) -> List[Tuple[int, str, float]]:
+        # [(rank, player, rating)]
+        return [(start + i + 1, player, -neg)
+                for i, (neg, player) in enumerate(self.index.slice(start, start + n))]
+
+    def __len__(self):
+        return len(self.ratings)
+
+    # ---------- bulk re-rating ----------
+    def rerate(self, results: Iterable[dict]) -> int:
+        # Replays results in order from scratch (e.g. after changing k or scale).
+        # Skips the index while replaying and builds it once at the end.
+        ratings: Dict[str, float] = {}
+        games: Dict[str, int] = {}
+        deltas_of = self._deltas
+        initial = self.initial
+        count = 0
+        for result in results:
+            deltas = deltas_of(ratings, result)
+            if not deltas:
+                continue
+            for player, delta in deltas:
+                ratings[player] = ratings.get(player, initial) + delta
+                games[player] = games.get(player, 0) + 1
+            count += 1
+        self.ratings = ratings
+        self.games = games
+        self.index = RankIndex((-r, p) for p, r in ratings.items())
+        return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild ratings from match history and print the leaderboard")
+    parser.add_argument("--db", default="matches.db")
+    parser.add_argument("--k", type=float, default=32.0)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--player", default=None)
+    args = parser.parse_args()
+
+    from match_store import MatchStore
+    store = MatchStore(args.db)
+    engine = RatingEngine(k=args.k)
+    replayed = engine.rerate(store.iter_results(source="server"))
+    store.close()
+    print(f"Replayed {replayed} matches, {len(engine)} rated players")
+    for rank, player, rating in engine.top(args.top):
+        print(f"{rank:>5}. {player:24s} {rating:7.1f}")
+    if args.player:
+        print(f"{args.player}: rank {engine.rank_of(args.player)}, rating {engine.rating_of(args.player)}")
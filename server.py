@@ -2,14 +2,31 @@
 
 import socket
 import threading
-import json
 import random
-from typing import List, Dict, Optional
+import queue
+import argparse
+import selectors
+import time
+import zlib
+from collections import OrderedDict, deque
+from typing import Callable, List, Dict, Optional
 
 # Import your existing game logic modules
-from character_1 import CharacterFactory
-from actions_1 import AttackAction, DefendAction, SpecialMoveAction
-from status_effects_1 import StunEffect  # <- change to status_effect_1 if that's your filename
+from character import CharacterFactory, CharacterPool
+from actions import AttackAction, DefendAction, SpecialMoveAction
+from status_effects import StunEffect, encode_effect, decode_effect
+from class_table import AVAILABLE_CLASSES
+from initiative import InitiativeScheduler
+from legal_actions import LivingIndex, ActionTable
+from damage_matrix import DamageMatrix
+from match_store import MatchStore
+from ratings import RatingEngine
+from protocol import FrameDecoder, FrameTooLarge, encode_frame, RECV_SIZE
+from admission import Admission, TokenBucket, add_admission_args, admission_from_args
+from frames import StateFrame, status_label
+import frames
+import handoff
+from winprob import WinProbability
 
 # ----------------------------
 # Minimal network protocol
@@ -18,75 +35,184 @@ from status_effects_1 import StunEffect  # <- change to status_effect_1 if that'
 #   welcome          : { type, player_id }
 #   choose_character : { type, available }
 #   waiting          : { type, message }
-#   game_state       : { type, state }
+#   game_state       : { type, state }            # state.win_prob = { "Team 1": p, "Team 2": p } when estimates are on
 #   your_turn        : { type, actor, actions, targets }
 #   action_result    : { type, log }
 #   game_over        : { type, winner }
+#   rating           : { type, rating, change, rank }   # after game_over, when ratings are enabled
 #   error            : { type, message }
 #
+# Lockstep matches (--lockstep) replace game_state, action_result and your_turn
+# with the validated actions; every client re-simulates the match from the seed:
+#   lockstep_start   : { type, seed, parallel, max_rounds, hash_every, players: [[pid, class, name], ...] }
+#   act              : { type, p, a, t }       # sequential: pid, action code (index into ACTION_CODES, -1 = unknown), target index
+#   acts             : { type, l: [[p, a, t], ...] }   # parallel: one round of choices, in planning order
+#   hash             : { type, turn, h }       # state_hash() after that many turns, every hash_every turns
+#   resync           : { type, snapshot }      # full match state, sent at the start of a round
+#
 # Client -> Server:
-#   pick_character   : { type, choice }
+#   join             : { type }                # reply to welcome: only connections that send it enter the lobby
+#   pick_character   : { type, choice, name? }   # optional name for match history and ratings, unique per match
 #   action           : { type, action, target_index }  # action in {"attack","defend","special"}
+#   resync_request   : { type }                # lockstep client detected a desync
+
+ACTION_CODES = ("attack", "defend", "special")
+
+def _quiet(*args, **kwargs):
+    pass
+
+class CharacterSelectionFailed(RuntimeError):
+    def __init__(self, player: "PlayerConn"):
+        super().__init__("Client disconnected during character selection")
+        self.player = player  # the one that left, timed out or was cut off
 
-AVAILABLE_CLASSES = [
-    "Gladiator", "Voidcaster", "Stormstriker", "Nightstalker", "Stoneguard", "Soulmender"
-]
 
 class PlayerConn:
-    def __init__(self, conn: socket.socket, addr: tuple, pid: int):
+    def __init__(self, conn: socket.socket, addr: tuple, pid: int, max_frame: Optional[int] = None,
+                 msg_bucket: Optional[TokenBucket] = None):
         self.conn = conn
         self.addr = addr
         self.pid = pid
         self.character = None  # set to Character instance
         self.team = None       # "Team 1" or "Team 2"
+        self.name: Optional[str] = None  # sent with pick_character; None = anonymous (not recorded or rated)
+        self.joined_at = time.monotonic()  # when the player entered the lobby
         self.lock = threading.Lock()
+        self.decoder = FrameDecoder(max_frame)
+        self.pending = deque()  # decoded messages not yet consumed by recv()
+        self.msg_bucket = msg_bucket  # messages this client may send per second (admission control)
+        self.dropped: Optional[str] = None  # why recv() gave up: "flood", "oversize", "malformed" or "timeout"
+        self.ended = False  # poll() reached the end of the stream (or cut the client off)
+        self.on_close: Optional[Callable[[], None]] = None  # run once, by the first close()
 
     def send(self, obj: dict):
-        data = (json.dumps(obj) + "\n").encode("utf-8")
+        self.send_frame(encode_frame(obj))
+
+    # Sends an already encoded frame (see frames.py), e.g. one encoding shared by a whole broadcast
+    def send_frame(self, data: bytes):
         with self.lock:
             self.conn.sendall(data)
 
-    def recv(self) -> Optional[dict]:
+    # None when the client is gone, or was cut off (see dropped); timeout in seconds, None = wait forever
+    def recv(self, timeout: Optional[float] = None) -> Optional[dict]:
         try:
-            line = self._readline()
-            if not line:
-                return None
-            return json.loads(line)
+            if timeout is not None:
+                self.conn.settimeout(max(timeout, 0.001))
+            while not self.pending:
+                if self.ended:
+                    return None
+                chunk = self.conn.recv(RECV_SIZE)
+                if not chunk or not self._feed(chunk):
+                    return None
+            return self.pending.popleft()
+        except FrameTooLarge:
+            self.dropped = "oversize"
+            return None
+        except socket.timeout:
+            self.dropped = "timeout"
+            return None
         except Exception:
             return None
+        finally:
+            if timeout is not None:
+                try:
+                    self.conn.settimeout(None)
+                except OSError:
+                    pass
 
-    def _readline(self) -> Optional[str]:
-        chunks = []
-        while True:
-            b = self.conn.recv(1)
-            if not b:
-                return None
-            if b == b"\n":
-                return b"".join(chunks).decode("utf-8")
-            chunks.append(b)
+    # Reads what the client has already sent (one recv, so a fast sender cannot hold the caller) into pending.
+    # A non-blocking recv rather than select(), which cannot take descriptors past FD_SETSIZE (1024).
+    def poll(self):
+        if self.ended:
+            return
+        try:
+            self.conn.settimeout(0.0)
+            chunk = self.conn.recv(RECV_SIZE)
+            if not chunk or not self._feed(chunk):
+                self.ended = True
+        except BlockingIOError:
+            pass  # nothing new
+        except FrameTooLarge:
+            self.dropped = "oversize"
+            self.ended = True
+        except Exception:
+            self.ended = True
+        finally:
+            try:
+                self.conn.settimeout(None)
+            except OSError:
+                pass
+
+    # Decodes a chunk into pending; False if the client went over its message rate or sent a frame that is
+    # not a JSON object (a protocol error). Everything in pending is a dict, so readers can call msg.get.
+    def _feed(self, chunk: bytes) -> bool:
+        msgs = self.decoder.feed(chunk)
+        if not all(isinstance(m, dict) for m in msgs):
+            self.dropped = "malformed"
+            return False
+        if msgs and self.msg_bucket is not None and not self.msg_bucket.take(len(msgs)):
+            self.dropped = "flood"
+            return False
+        self.pending.extend(msgs)
+        return True
 
     def close(self):
         try:
             self.conn.close()
         except Exception:
             pass
+        on_close, self.on_close = self.on_close, None
+        if on_close is not None:
+            on_close()
 
 # ----------------------------
-# Headless battle engine (1v1)
+# Headless battle engine (1v1, 2v2, 3v3)
 # ----------------------------
+# parallel=True : every living actor plans at once each round, choices are
+#                 collected concurrently and resolved in turn order.
+# parallel=False: one actor is prompted and resolved at a time.
+# lockstep=True : only validated actions (and a state hash every hash_every
+#                 turns) are sent; clients run this same class locally
+#                 (lockstep.LockstepReplica) to rebuild the state.
 class NetworkBattle:
-    def __init__(self, players: List[PlayerConn]):
-        # Two players, two teams
+    def __init__(self, players: List[PlayerConn], parallel: bool = True, max_rounds: Optional[int] = None,
+                 seed: Optional[int] = None, quiet: bool = False, lockstep: bool = False, hash_every: int = 10,
+                 win_probs: Optional[WinProbability] = None, pool: Optional[CharacterPool] = None,
+                 handshake_timeout: Optional[float] = None):
+        # Players alternate between the two teams (same as BattleManager)
         self.players = players
-        self.teams: Dict[str, List[PlayerConn]] = {
-            "Team 1": [players[0]],
-            "Team 2": [players[1]]
-        }
-        players[0].team = "Team 1"
-        players[1].team = "Team 2"
+        self.parallel = parallel
+        self.max_rounds = max_rounds  # None = play until a team is eliminated, else a draw after this many rounds
+        self.rounds = 0
+        self.turns = 0
+        # every roll in the match (initiative ties, dodges, effect chances) comes from this seed
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.rng = random.Random(self.seed)
+        self.quiet = quiet  # keep per-hit combat messages off the server console
+        self.lockstep = lockstep
+        self.hash_every = max(1, hash_every)
+        self.resync_wanted: set = set()  # pids of lockstep clients waiting for a snapshot
+        self.prompts: Dict[int, ActionTable] = {}  # open turn tables by pid, to re-prompt a resyncing client
+        self.win_probs = win_probs  # shared estimator; never blocks, may lag behind by an action or two
+        self.win_prob: Optional[Dict[str, float]] = None  # latest estimate for this match
+        self.pool = pool  # characters come from (and go back to) this pool when given
+        self.handshake_timeout = handshake_timeout  # seconds everyone has to pick a character (None = no limit)
+        self._state_frame: Optional[StateFrame] = None  # game_state template for this roster, see _encode_state()
+        # called at every round boundary; True = the match was handed to another process, stop here
+        self.between_rounds: Optional[Callable[["NetworkBattle"], bool]] = None
+        self.handed_off = False
+        self.winner: Optional[str] = None
+        self.started_at = 0.0
+        self.duration = 0.0
+        self.teams: Dict[str, List[PlayerConn]] = {"Team 1": [], "Team 2": []}
+        for i, p in enumerate(players):
+            p.team = "Team 1" if i % 2 == 0 else "Team 2"
+            self.teams[p.team].append(p)
 
-        self.turn_order: List[PlayerConn] = players[:]
-        random.shuffle(self.turn_order)
+        # speed-based initiative, living-target index and damage cache, built once characters are picked
+        self.turn_order: Optional[InitiativeScheduler] = None
+        self.living: Optional[LivingIndex] = None
+        self.damage: Optional[DamageMatrix] = None
 
         self.actions = {
             "attack": AttackAction(),
@@ -99,10 +225,10 @@ class NetworkBattle:
 
     # ---------- helpers ----------
     def alive_on_team(self, team_name: str):
-        return [p for p in self.teams[team_name] if p.character and p.character.hp > 0]
+        return list(self.living.living(team_name))
 
     def check_team_alive(self, team_name: str) -> bool:
-        return any(p.character.hp > 0 for p in self.teams[team_name] if p.character)
+        return self.living.alive(team_name)
 
     def enemy_team_of(self, player: PlayerConn) -> str:
         return "Team 1" if player.team == "Team 2" else "Team 2"
@@ -117,109 +243,408 @@ class NetworkBattle:
                 "hp": c.hp,
                 "defense": c.defense,
                 "cooldown": c.special_move_cooldown,
-                "status": [f"{type(e).__name__}({e.duration})" for e in c.status_effects]
+                "status": [status_label(e) for e in c.status_effects]
             }
         return {
             "teams": {
                 t: [char_info(p) for p in plist] for t, plist in self.teams.items()
             },
-            "turn_order": [p.pid for p in self.turn_order],
+            "turn_order": [p.pid for p in self.turn_order.preview(len(self.turn_order))] if self.turn_order else [],
         }
 
+    # The game_state frame for serialize_state() (plus win_prob), from a template compiled on first use;
+    # the roster's characters stay the same objects for the whole match (restore() included)
+    def _encode_state(self, win_prob: Optional[Dict[str, float]] = None) -> bytes:
+        if self._state_frame is None:
+            self._state_frame = StateFrame({t: [p.character for p in plist] for t, plist in self.teams.items()})
+        turn_order = [p.pid for p in self.turn_order.preview(len(self.turn_order))] if self.turn_order else []
+        return self._state_frame.encode(turn_order, win_prob)
+
+    # Hands the characters back to the pool once the match and its result are no longer needed
+    def release(self):
+        if self.pool is not None:
+            self.pool.release(p.character for p in self.players if p.character is not None)
+            for p in self.players:
+                p.character = None
+
     # ---------- battle loop ----------
     def run(self):
-        # Ask both players to choose characters
+        self._setup_match(self._pick_characters())
+        if self.lockstep:
+            self._broadcast({
+                "type": "lockstep_start",
+                "seed": self.seed,
+                "parallel": self.parallel,
+                "max_rounds": self.max_rounds,
+                "hash_every": self.hash_every,
+                "players": [[p.pid, p.character.name, p.name or f"Player {p.pid}"] for p in self.players],
+            })
+        self._broadcast_state("Match start!")
+        self._play()
+
+    # Continues a match from handoff_state(), taken by another process at a round boundary.
+    # The players' connections are the same sockets; clients only notice a short pause.
+    def resume(self, state: dict):
+        self._setup_match(state["classes"])
+        self.restore(state["snapshot"])
+        self.resync_wanted = set(state["resync_wanted"])
+        self.win_prob = state["win_prob"]
+        self.started_at -= state["elapsed"]
+        self._play()
+
+    # Asks every player to choose a character; returns the classes in player order.
+    # Raises CharacterSelectionFailed for the first player who leaves or misses the deadline.
+    def _pick_characters(self) -> List[str]:
         avail = AVAILABLE_CLASSES.copy()
         for p in self.players:
-            p.send({"type": "choose_character", "available": avail})
+            p.send_frame(frames.CHOOSE_CHARACTER)
+        deadline = time.monotonic() + self.handshake_timeout if self.handshake_timeout is not None else None
 
         # collect choices (no duplicates)
         taken = set()
+        classes = []
         for p in self.players:
-            choice = self._wait_for_character_choice(p, avail, taken)
+            choice = self._wait_for_character_choice(p, avail, taken, deadline)
             taken.add(choice)
-            p.character = CharacterFactory.create_character(choice)
+            classes.append(choice)
+        return classes
 
-        # initial broadcast
-        self._broadcast_state("Match start!")
+    # Builds characters and per-match indexes; everything after this is driven by the seed and the actions
+    def _setup_match(self, classes: List[str]):
+        for p, choice in zip(self.players, classes):
+            p.character = self.pool.acquire(choice) if self.pool else CharacterFactory.create_character(choice)
+            p.character.rng = self.rng
+            if self.quiet:
+                p.character.log = _quiet
+        self.turn_order = InitiativeScheduler(self.players, speed_of=lambda p: p.character.speed, rng=self.rng)
+        self.living = LivingIndex(self.teams, character_of=lambda p: p.character)
+        self.damage = DamageMatrix([p.character for p in self.players]).attach()
+        self.started_at = time.perf_counter()
 
-        # main turns
+    def _play(self):
+        take_turns = self._parallel_round if self.parallel else self._sequential_round
         while self.check_team_alive("Team 1") and self.check_team_alive("Team 2"):
-            for p in list(self.turn_order):
-                c = p.character
-                if c.hp <= 0:
-                    continue
-
-                # Start-of-turn upkeep for EVERYONE
-                # process status + decrement cooldown ONLY for the current actor
-                c.process_status_effects()
-                c.special_move_cooldown = max(0, c.special_move_cooldown - 1)
-
-                # stun skip
-                if c.has_active_effect(StunEffect):
-                    self._broadcast_state(f"{c.name} is stunned and skips the turn!")
-                    continue
-
-                # build targets
-                enemy_team_name = self.enemy_team_of(p)
-                targets = [pp for pp in self.teams[enemy_team_name] if pp.character.hp > 0]
-                ally_targets = [pp for pp in self.teams[p.team] if pp.character.hp > 0]
-
-                # prompt current player
-                p.send({
-                    "type": "your_turn",
-                    "actor": c.name,
-                    "cooldown": c.special_move_cooldown,  # add this
-                    "actions": ["attack", "defend", "special"],
-                    "targets": {
-                            "enemy": [self._target_label(pp) for pp in targets],
-                            "ally": [self._target_label(pp) for pp in ally_targets],
-                    },
-                })
-
-                # wait for action
-                action_obj = self._wait_for_action(p)
-                if not action_obj:
-                    self._broadcast_state("A player disconnected. Ending match.")
-                    return
-
-                log = self._apply_action(p, action_obj, targets, ally_targets)
-                self._broadcast_state(log)
-
-                # check win after each action
-                if not (self.check_team_alive("Team 1") and self.check_team_alive("Team 2")):
-                    break
-
-        winner = "Team 1" if self.check_team_alive("Team 1") else "Team 2"
-        self._broadcast({"type": "game_over", "winner": winner})
+            if self.max_rounds is not None and self.rounds >= self.max_rounds:
+                self._finish("Draw")
+                return
+            if self.between_rounds is not None and self.between_rounds(self):
+                self.handed_off = True
+                return
+            if self.lockstep:
+                self._read_requests()
+            if self.resync_wanted:
+                self._send_resyncs()
+            if not take_turns():
+                self._end_disconnected()
+                return
+            self.rounds += 1
+
+        self._finish("Team 1" if self.check_team_alive("Team 1") else "Team 2")
+
+    def _end_disconnected(self):
+        if self.lockstep:
+            self._broadcast_frame(frames.DISCONNECTED)
+        else:
+            self._broadcast_state("A player disconnected. Ending match.")
+
+    def _finish(self, winner: str):
+        self.winner = winner
+        self.duration = time.perf_counter() - self.started_at
+        self._broadcast_frame(frames.game_over(winner))
+
+    # Match summary for MatchStore.record (only meaningful once winner is set)
+    def result(self) -> dict:
+        size = len(self.teams["Team 1"])
+        return {
+            "source": "server",
+            "mode": f"{size}v{size}",
+            "winner": self.winner,
+            "turns": self.turns,
+            "duration": self.duration,
+            "seed": self.seed,
+            "roster": [{"player": p.name, "class": p.character.name, "team": p.team} for p in self.players],
+        }
+
+    # ---------- snapshots ----------
+    # Everything the rest of the match depends on: counters, the rng, every
+    # character's mutable stats and effects, and the initiative schedule.
+    # Taken between rounds; restore() rebuilds the living index and damage cache.
+    def snapshot(self) -> dict:
+        version, internal, gauss = self.rng.getstate()
+        return {
+            "rounds": self.rounds,
+            "turns": self.turns,
+            "rng": [version, list(internal), gauss],
+            "characters": [[p.pid, c.hp, c.attack_power, c.defense, c.speed, c.special_move_cooldown,
+                            [encode_effect(e) for e in c.status_effects]]
+                           for p, c in ((p, p.character) for p in self.players)],
+            "turn_order": self.turn_order.snapshot(lambda p: p.pid),
+        }
+
+    def restore(self, snap: dict):
+        by_pid = {p.pid: p for p in self.players}
+        self.rounds = snap["rounds"]
+        self.turns = snap["turns"]
+        version, internal, gauss = snap["rng"]
+        self.rng.setstate((version, tuple(internal), gauss))
+        for pid, hp, attack_power, defense, speed, cooldown, effects in snap["characters"]:
+            c = by_pid[pid].character
+            c.hp, c.attack_power, c.defense, c.speed = hp, attack_power, defense, speed
+            c.special_move_cooldown = cooldown
+            for effect in c.status_effects:
+                effect.release()
+            c.status_effects[:] = [decode_effect(e) for e in effects]
+        self.turn_order.restore(snap["turn_order"], lambda pid: by_pid[pid])
+        self.living = LivingIndex(self.teams, character_of=lambda p: p.character)
+        self.damage = DamageMatrix([p.character for p in self.players]).attach()
+
+    # snapshot() plus what a fresh NetworkBattle needs to resume() it: settings, roster classes, timing
+    def handoff_state(self) -> dict:
+        return {
+            "seed": self.seed,
+            "parallel": self.parallel,
+            "max_rounds": self.max_rounds,
+            "lockstep": self.lockstep,
+            "hash_every": self.hash_every,
+            "classes": [p.character.name for p in self.players],
+            "snapshot": self.snapshot(),
+            "resync_wanted": sorted(self.resync_wanted),
+            "win_prob": self.win_prob,
+            "elapsed": time.perf_counter() - self.started_at,
+        }
+
+    # Cheap fingerprint of the match state, compared by lockstep clients to detect desyncs
+    def state_hash(self) -> int:
+        state = (self.rounds, self.turns, self.rng.getstate()[1],
+                 [(c.hp, c.attack_power, c.defense, c.speed, c.special_move_cooldown,
+                   [encode_effect(e) for e in c.status_effects]) for c in (p.character for p in self.players)])
+        return zlib.crc32(repr(state).encode())
+
+    # resync_request from clients that are not acting (waiting, dead or out of the round): _wait_for_action
+    # only reads the actor's connection, so everyone's is polled here; actions stay queued for their turn
+    def _read_requests(self):
+        for p in self.players:
+            p.poll()
+            if any(m.get("type") == "resync_request" for m in p.pending):
+                self.resync_wanted.add(p.pid)
+                p.pending = deque(m for m in p.pending if m.get("type") != "resync_request")
+
+    def _send_resyncs(self):
+        snap = self.snapshot()
+        for p in self.players:
+            if p.pid in self.resync_wanted:
+                p.send({"type": "resync", "snapshot": snap})
+        self.resync_wanted.clear()
+
+    def _sequential_round(self) -> bool:
+        round_no = self.turn_order.peek_round()
+        while self.turn_order.peek_round() == round_no:
+            p = self.turn_order.next_actor()
+            if not self._upkeep(p):
+                continue
+
+            table = self._prompt_turn(p)
+
+            # wait for action
+            action_obj = self._wait_for_action(p)
+            if not action_obj:
+                return False
+            action_obj = self._sanitize(action_obj)
+            if self.lockstep:
+                code, index = self._encode_action(action_obj)
+                self._broadcast_frame(frames.act(p.pid, code, index))
+
+            log = self._apply_action(p, action_obj, table)
+            self._after_action(table, log)
+
+            # check win after each action
+            if not (self.check_team_alive("Team 1") and self.check_team_alive("Team 2")):
+                break
+        return True
+
+    def _parallel_round(self) -> bool:
+        # planning phase: upkeep in turn order, then prompt everyone who can act
+        planners = [p for p in self.turn_order.next_round() if self._upkeep(p)]
+        plans = {p.pid: self._prompt_turn(p) for p in planners}
+
+        choices = self._collect_actions(planners)
+        if choices is None:
+            return False
+        choices = {pid: self._sanitize(action_obj) for pid, action_obj in choices.items()}
+        if self.lockstep:
+            self._broadcast_frame(frames.acts([(p.pid, *self._encode_action(choices[p.pid])) for p in planners]))
+
+        # resolution phase: deterministic, in turn order
+        for p in planners:
+            if p.character.hp <= 0:
+                continue  # eliminated earlier this round
+            if not (self.check_team_alive("Team 1") and self.check_team_alive("Team 2")):
+                break
+            table = ActionTable(p, self.living)
+            action_obj = self._retarget(choices[p.pid], plans[p.pid], table)
+            log = self._apply_action(p, action_obj, table)
+            self._after_action(table, log)
+        return True
+
+    # Bookkeeping after every resolved action
+    def _after_action(self, table: ActionTable, log: str):
+        self.turns += 1
+        self._drop_eliminated(table.enemies)
+        self._broadcast_state(log)
+        if self.lockstep and self.turns % self.hash_every == 0:
+            self._checkpoint()
+
+    def _checkpoint(self):
+        self._broadcast_frame(frames.state_hash(self.turns, self.state_hash()))
+
+    # Keeps only the fields the engine reads, so lockstep clients replay exactly what the server resolved
+    @staticmethod
+    def _sanitize(action_obj: dict) -> dict:
+        action = action_obj.get("action")
+        index = action_obj.get("target_index")
+        return {
+            "action": action if action in ACTION_CODES else None,
+            "target_index": index if type(index) is int else None,
+        }
+
+    # (action code, target index) as sent in act/acts
+    @staticmethod
+    def _encode_action(action_obj: dict) -> tuple:
+        action = action_obj["action"]
+        return (ACTION_CODES.index(action) if action in ACTION_CODES else -1), action_obj["target_index"]
+
+    # Start-of-turn upkeep: process status + decrement cooldown ONLY for the actor.
+    # Returns False if the actor cannot act this turn.
+    def _upkeep(self, p: PlayerConn) -> bool:
+        c = p.character
+        if c.hp <= 0:
+            self._eliminate(p)
+            return False
+        # checked before effects tick, otherwise a 1-turn stun expires before it is seen
+        stunned = c.has_active_effect(StunEffect)
+        c.process_status_effects()
+        c.special_move_cooldown = max(0, c.special_move_cooldown - 1)
+        if c.hp <= 0:
+            self._eliminate(p)
+            self._broadcast_state(f"{c.name} succumbs to their wounds!")
+            return False
+
+        # stun skip
+        if stunned:
+            self._broadcast_state(f"{c.name} is stunned and skips the turn!")
+            return False
+        return True
+
+    def _eliminate(self, p: PlayerConn):
+        self.turn_order.remove(p)
+        self.living.remove(p)
+
+    # Removes characters this action eliminated from the initiative queue and living index
+    def _drop_eliminated(self, hit):
+        for pp in hit:
+            if pp.character.hp <= 0:
+                self._eliminate(pp)
+
+    # Sends the turn prompt built from this turn's legal-action table and returns the table
+    # (lockstep clients build the prompt themselves, so nothing is sent)
+    def _prompt_turn(self, p: PlayerConn) -> ActionTable:
+        table = ActionTable(p, self.living)
+        if self.lockstep:
+            self.prompts[p.pid] = table
+        else:
+            p.send_frame(self._turn_frame(p, table))
+        return table
+
+    def _turn_prompt(self, p: PlayerConn, table: ActionTable) -> dict:
+        c = p.character
+        return {
+            "type": "your_turn",
+            "actor": c.name,
+            "cooldown": c.special_move_cooldown,
+            "actions": list(table.actions),
+            "targets": {
+                    "enemy": [self._target_label(pp) for pp in table.enemies],
+                    "ally": [self._target_label(pp) for pp in table.allies],
+            },
+        }
+
+    # _turn_prompt() as a ready frame
+    def _turn_frame(self, p: PlayerConn, table: ActionTable) -> bytes:
+        c = p.character
+        return frames.your_turn(c.name, c.special_move_cooldown, table.actions,
+                                [self._target_label(pp) for pp in table.enemies],
+                                [self._target_label(pp) for pp in table.allies])
+
+    # Waits for every planner's action at the same time.
+    # Returns {pid: action} or None if anyone disconnected.
+    def _collect_actions(self, planners: List[PlayerConn]) -> Optional[Dict[int, dict]]:
+        inbox: "queue.Queue" = queue.Queue()
+        for p in planners:
+            threading.Thread(target=lambda p=p: inbox.put((p.pid, self._wait_for_action(p))),
+                             daemon=True).start()
+        choices = {}
+        while len(choices) < len(planners):
+            pid, action_obj = inbox.get()
+            if action_obj is None:
+                return None
+            choices[pid] = action_obj
+        return choices
+
+    # Maps a target picked during planning onto the table at resolution time.
+    # If the picked target fell earlier in the round, the first living one is used.
+    def _retarget(self, action_obj: dict, planned: ActionTable, current: ActionTable) -> dict:
+        action = action_obj.get("action")
+        picked = planned.pick(action, action_obj.get("target_index"))
+        if picked is None:
+            return action_obj
+        living = current.targets(action)
+        index = living.index(picked) if picked in living else (0 if living else None)
+        return dict(action_obj, target_index=index)
 
     def _target_label(self, player_conn: PlayerConn) -> str:
         c = player_conn.character
         return f"{c.name} (HP {c.hp})"
 
     def _broadcast(self, obj: dict):
+        self._broadcast_frame(encode_frame(obj))
+
+    # Encoded once, sent to everyone
+    def _broadcast_frame(self, data: bytes):
         for p in self.players:
-            p.send(obj)
+            p.send_frame(data)
 
     def _broadcast_state(self, log: str):
-        state = self.serialize_state()
-        self._broadcast({"type": "game_state", "state": state})
-        self._broadcast({"type": "action_result", "log": log})
+        if self.lockstep:
+            return  # clients derive state and logs from the actions
+        if self.win_probs is not None:
+            self.win_prob = self.win_probs.estimate(
+                {team: [p.character for p in members] for team, members in self.teams.items()}) or self.win_prob
+        self._broadcast_frame(self._encode_state(self.win_prob))
+        self._broadcast_frame(frames.action_result(log))
 
-    def _wait_for_character_choice(self, p: PlayerConn, avail: List[str], taken: set) -> str:
-        p.send({"type": "welcome", "player_id": p.pid})
+    def _wait_for_character_choice(self, p: PlayerConn, avail: List[str], taken: set,
+                                   deadline: Optional[float] = None) -> str:
         while True:
-            msg = p.recv()
+            msg = p.recv(None if deadline is None else deadline - time.monotonic())
             if not msg:
-                raise RuntimeError("Client disconnected during character selection")
+                if p.dropped == "timeout":
+                    try:
+                        p.send_frame(frames.PICK_TIMEOUT)
+                    except OSError:
+                        pass
+                raise CharacterSelectionFailed(p)
             if msg.get("type") == "pick_character":
                 choice = msg.get("choice")
-                if choice in avail and choice not in taken:
+                name = str(msg["name"]).strip()[:32] if msg.get("name") else None
+                if name and any(o is not p and o.name == name for o in self.players):
+                    p.send_frame(frames.NAME_TAKEN)  # one rating per name: two entries would rate it twice
+                elif choice in avail and choice not in taken:
+                    p.name = name or None
                     return choice
                 else:
-                    p.send({"type": "error", "message": "Invalid or already-taken character."})
+                    p.send_frame(frames.INVALID_CHARACTER)
             else:
-                p.send({"type": "waiting", "message": "Pick a character to start."})
+                p.send_frame(frames.PICK_TO_START)
 
     def _wait_for_action(self, p: PlayerConn) -> Optional[dict]:
         while True:
@@ -227,10 +652,17 @@ class NetworkBattle:
             if msg is None:
                 return None
             if msg.get("type") == "action":
+                self.prompts.pop(p.pid, None)
                 return msg
+            if msg.get("type") == "resync_request" and self.lockstep:
+                # the client's replica is stuck until the next round's snapshot: prompt it the classic way
+                self.resync_wanted.add(p.pid)
+                table = self.prompts.get(p.pid)
+                if table is not None:
+                    p.send_frame(self._encode_state())
+                    p.send_frame(self._turn_frame(p, table))
 
-    def _apply_action(self, p: PlayerConn, action_obj: dict,
-                      enemy_targets: List[PlayerConn], ally_targets: List[PlayerConn]) -> str:
+    def _apply_action(self, p: PlayerConn, action_obj: dict, table: ActionTable) -> str:
         act = action_obj.get("action")
         target_index = action_obj.get("target_index")
         c = p.character
@@ -247,43 +679,39 @@ class NetworkBattle:
 
         # ATTACK
         if act == "attack":
-            target = self._safe_pick(enemy_targets, target_index)
+            target = table.pick("attack", target_index)
             if not target:
                 return f"{c.name} tried to attack, but no valid target."
 
             t = target.character
-            # dodge check (mirrors your AttackAction)
-            dodge_chance = t.speed / 100.0
-            import random as _r
-            if _r.random() < dodge_chance:
+            # dodge check (mirrors your AttackAction), both numbers come from the match's damage matrix
+            if c.rng.random() < self.damage.dodge_chance(t):
                 return f"{c.name} attacks {t.name}, but {t.name} DODGES!"
 
             before = t.hp
-            damage = max(0, c.attack_power - t.defense)
+            damage = self.damage.attack_damage(c, t)
             t.hp -= damage
             after = t.hp
             if t.hp <= 0:
                 return f"{c.name} attacks {t.name} for {before - after} damage {hp_line(before, after)}. {t.name} is eliminated!"
             return f"{c.name} attacks {t.name} for {before - after} damage {hp_line(before, after)}."
 
-        # SPECIAL (universal 3-turn cooldown)
+        # SPECIAL (cooldown comes from the class table)
         if act == "special":
             # Block if on cooldown
-            if c.special_move_cooldown > 0:
+            if table.special is None:
                 return f"{c.name}'s special is on cooldown for {c.special_move_cooldown} more turn(s)."
 
             # Enemy-target specials
-            if getattr(c, "target_type", "enemy") == "enemy":
+            if table.special in ("enemy", "all"):
                 # AOE
-                if getattr(c, "is_aoe", False):
-                    living_chars = [pp.character for pp in enemy_targets if pp.character.hp > 0]
+                if table.special == "all":
+                    living_chars = [pp.character for pp in table.enemies]
                     if not living_chars:
                         return f"{c.name} tried a team-wide special, but no valid targets."
                     # snapshot HPs
                     before_map = {ch.name: ch.hp for ch in living_chars}
                     c.special_move(living_chars)
-                    # set universal cooldown
-                    c.special_move_cooldown = 4
                     # build per-target deltas
                     parts = []
                     for ch in living_chars:
@@ -292,15 +720,13 @@ class NetworkBattle:
                     return f"{c.name} uses a team-wide special:\n  " + "\n  ".join(parts)
 
                 # Single-target enemy special
-                target = self._safe_pick(enemy_targets, target_index)
+                target = table.pick("special", target_index)
                 if not target:
                     return f"{c.name} tried special, but no valid enemy target."
                 t = target.character
                 before = t.hp
                 before_status = {type(e).__name__ for e in t.status_effects}
                 c.special_move(t)
-                # set universal cooldown
-                c.special_move_cooldown = 3
                 after = t.hp
                 after_status = {type(e).__name__ for e in t.status_effects}
                 delta = before - after
@@ -314,15 +740,13 @@ class NetworkBattle:
                     return f"{c.name} uses special on {t.name}.{status_note} (HP {before} → {after})"
 
             # Ally-target specials (e.g., Soulmender)
-            elif c.target_type == "ally":
-                target = self._safe_pick(ally_targets, target_index)
+            elif table.special == "ally":
+                target = table.pick("special", target_index)
                 if not target:
                     return f"{c.name} tried special, but no valid ally target."
                 t = target.character
                 before = t.hp
                 c.special_move(t)
-                # set universal cooldown
-                c.special_move_cooldown = 3
                 after = t.hp
                 healed = max(0, after - before)
                 return f"{c.name} heals {t.name} for {healed} (HP {before} → {after})."
@@ -332,8 +756,6 @@ class NetworkBattle:
                 before_def = c.defense
                 before_status = {type(e).__name__ for e in c.status_effects}
                 c.special_move(c)
-                # set universal cooldown
-                c.special_move_cooldown = 3
                 gained = c.defense - before_def
                 after_status = {type(e).__name__ for e in c.status_effects}
                 new_effects = after_status - before_status
@@ -344,55 +766,407 @@ class NetworkBattle:
 
         return f"Unknown action from {c.name}."
 
-    def _safe_pick(self, arr: List[PlayerConn], idx: Optional[int]) -> Optional[PlayerConn]:
-        if idx is None:
-            return None
-        if 0 <= idx < len(arr):
-            return arr[idx]
-        return None
-
 # ----------------------------
 # Server bootstrap
 # ----------------------------
+# Accepts players into a lobby and runs every full group as its own match on
+# a separate thread. A new connection is greeted with welcome and joins the
+# lobby once it answers with join; until then the accept loop watches it, so
+# a connection that never says anything cannot be matched with real players
+# (with admission control it is dropped after join_timeout). start() keeps the old single-match behaviour by default;
+# serve_forever() keeps pairing until stop() is called.
+#
+# Zero-downtime restarts (handoff.py): begin_handoff() stops the accept loop,
+# the listening socket and the lobby go to the successor process, and every
+# match follows at its next round boundary; start() returns once the last
+# one has left.
 class GameServer:
-    def __init__(self, host: str = "127.0.0.1", port: int = 50007):
+    def __init__(self, host: str = "127.0.0.1", port: int = 50007, team_size: int = 1, parallel: bool = True,
+                 max_rounds: Optional[int] = None, store: Optional[MatchStore] = None,
+                 ratings: Optional[RatingEngine] = None, reuse_port: bool = False, quiet: bool = False,
+                 pid_base: int = 0, lockstep: bool = False, win_probs: Optional[WinProbability] = None,
+                 admission: Optional[Admission] = None):
         self.host = host
         self.port = port
+        self.team_size = team_size  # 1 = 1v1, 2 = 2v2, 3 = 3v3
+        self.parallel = parallel
+        self.max_rounds = max_rounds
+        self.store = store  # finished matches are recorded here (written in the background)
+        self.ratings = ratings  # updated incrementally after every finished match
+        self.reuse_port = reuse_port  # share the port with other worker processes (SO_REUSEPORT)
+        self.quiet = quiet
+        self.lockstep = lockstep  # matches send actions only, clients re-simulate the state
+        self.win_probs = win_probs  # attaches win probabilities to game_state (not used by lockstep matches)
+        self.characters = CharacterPool()  # shared by this server's matches
+        self.admission = admission  # connection/message limits and handshake deadline (None = accept everything)
+        self.on_result: Optional[Callable[[dict], None]] = None  # extra sink for finished-match results
+        self.successor: Optional[handoff.Successor] = None  # set once a handoff has begun
+        self.sock: Optional[socket.socket] = None
+        self._wake_r, self._wake_w = socket.socketpair()  # wakes the accept loop for a handoff
+        self.lobby: List[PlayerConn] = []
+        self.joining: "OrderedDict[PlayerConn, Optional[float]]" = OrderedDict()  # waiting for join -> deadline
+        self._arrivals: List[PlayerConn] = []  # new connections for the accept loop to watch
+        self.stopping = False
+        self.lock = threading.Lock()  # guards lobby, arrivals, metrics and ratings
+        self.match_threads: List[threading.Thread] = []
+        self.next_pid = pid_base + 1
+        self.battle: Optional[NetworkBattle] = None  # most recently started match
+        self.metrics = {"connections": 0, "matches_started": 0, "matches_finished": 0,
+                        "active_matches": 0, "turns": 0, "rejected": 0, "dropped": 0, "handshake_failures": 0,
+                        "handed_off": 0, "resumed": 0}
+
+    @property
+    def needed(self) -> int:
+        return self.team_size * 2
+
+    def listen(self):
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self.clients: List[PlayerConn] = []
-        self.next_pid = 1
-
-    def start(self):
+        if self.reuse_port:
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
         self.sock.bind((self.host, self.port))
-        self.sock.listen(2)
-        print(f"Server listening on {self.host}:{self.port}. Waiting for 2 players...")
+        self.sock.listen(128)
+
+    def start(self, max_matches: Optional[int] = 1):
+        if self.sock is None:
+            self.listen()
+        print(f"Server listening on {self.host}:{self.port}. Waiting for {self.needed} players...")
+        ready = selectors.DefaultSelector()
+        ready.register(self.sock, selectors.EVENT_READ)
+        ready.register(self._wake_r, selectors.EVENT_READ)
+        try:
+            while max_matches is None or self.metrics["matches_started"] < max_matches:
+                for key, _ in ready.select(self._join_wait()):
+                    if key.fileobj is self.sock:
+                        self._accept()
+                    elif key.fileobj is self._wake_r:
+                        self._wake_r.recv(4096)
+                    else:
+                        self._check_join(ready, key.data)
+                if self.stopping or self.successor is not None:
+                    break  # woken by stop() or begin_handoff()
+                self._watch_arrivals(ready)
+                self._expire_joins(ready)
+        finally:
+            ready.close()
+            if self.successor is not None:
+                self._hand_over_lobby()
+            else:
+                for p in list(self.joining) + self._arrivals:
+                    p.close()
+            for t in list(self.match_threads):
+                t.join()  # handed-off matches leave at their next round boundary
+            if self.successor is not None:
+                self.successor.close()
+            self.stop()
+
+    def serve_forever(self):
+        self.start(max_matches=None)
 
-        while len(self.clients) < 2:
+    def _accept(self):
+        try:
             conn, addr = self.sock.accept()
-            player = PlayerConn(conn, addr, self.next_pid)
+        except OSError:
+            return  # closed by stop(), or the client already gave up
+        if self.admission is not None:
+            refused = self.admission.admit(addr[0])
+            if refused is not None:
+                self._reject(conn, refused)
+                return
+        with self.lock:
+            pid = self.next_pid
             self.next_pid += 1
-            self.clients.append(player)
-            print(f"Player {player.pid} connected from {addr}")
-            player.send({"type": "welcome", "player_id": player.pid})
-            if len(self.clients) < 2:
-                player.send({"type": "waiting", "message": "Waiting for another player to join..."})
+        player = self.make_player(conn, addr, pid, admitted=True)
+        try:
+            player.send_frame(frames.welcome(pid))
+        except OSError:
+            player.close()
+            return
+        self.add_player(player)
+
+    # One frame, without waiting for the client to read it, then close: keeps the accept loop cheap under a flood
+    def _reject(self, conn: socket.socket, reason: str):
+        with self.lock:
+            self.metrics["rejected"] += 1
+        try:
+            conn.setblocking(False)
+            conn.send(frames.rejected(reason))
+        except OSError:
+            pass
+        conn.close()
+
+    # PlayerConn with this server's per-connection limits; admitted: counted by admission.admit(), released on close
+    def make_player(self, conn: socket.socket, addr: tuple, pid: int, admitted: bool = False) -> PlayerConn:
+        if self.admission is None:
+            return PlayerConn(conn, addr, pid)
+        player = PlayerConn(conn, addr, pid, max_frame=self.admission.max_frame,
+                            msg_bucket=self.admission.message_bucket())
+        if admitted:
+            player.on_close = lambda ip=addr[0]: self.admission.release(ip)
+        return player
+
+    # A connection another process accepted (supervisor's shared lobby): counted against this server's
+    # caps like one of its own; None, after rejecting it, if it is over them
+    def adopt_player(self, conn: socket.socket, addr: tuple, pid: int) -> Optional[PlayerConn]:
+        if self.admission is not None:
+            refused = self.admission.admit(addr[0], new=False)
+            if refused is not None:
+                self._reject(conn, refused)
+                return None
+        return self.make_player(conn, addr, pid, admitted=True)
 
-        # Launch the match
+    def stop(self):
+        self.stopping = True
         try:
-            battle = NetworkBattle(self.clients)
-            battle.run()
+            self._wake_w.send(b"\0")
+        except OSError:
+            pass
+        if self.sock is not None:
+            if self.successor is None:  # a handed-off listening socket stays open for the successor
+                try:
+                    self.sock.shutdown(socket.SHUT_RDWR)  # wakes a thread blocked in accept()
+                except OSError:
+                    pass
+            try:
+                self.sock.close()
+            except Exception:
+                pass
+
+    # ---------- handoff ----------
+    # Called from handoff.serve_handoffs() when a successor asks for this server's work
+    def begin_handoff(self, successor: "handoff.Successor"):
+        with self.lock:
+            self.successor = successor
+        self._wake_w.send(b"\0")
+
+    # Runs on the accept thread once it has stopped accepting
+    def _hand_over_lobby(self):
+        if not self.successor.send_listener(self.sock, self.next_pid):
+            print("Handoff failed: successor did not take the listening socket")
+        with self.lock:
+            waiting, self.lobby = self.lobby, []
+            arrivals, self._arrivals = self._arrivals, []
+        for p in waiting:
+            self.successor.send_player(p)
+            p.close()
+        for p in list(self.joining) + arrivals:
+            self.successor.send_player(p, joined=False)
+            p.close()
+        self.joining.clear()
+
+    def _between_rounds(self, battle: NetworkBattle) -> bool:
+        successor = self.successor
+        return successor is not None and successor.send_match(battle)
+
+    # ---------- lobby ----------
+    # joined: the player already answered welcome (handed over from another server's lobby)
+    def add_player(self, player: PlayerConn, joined: bool = False):
+        print(f"Player {player.pid} connected from {player.addr}")
+        with self.lock:
+            self.metrics["connections"] += 1
+            if not joined:
+                self._arrivals.append(player)
+        if joined:
+            self._enqueue(player)
+        else:
+            self._wake_w.send(b"\0")
+
+    # The rest run on the accept thread, which owns joining and the selector
+    def _watch_arrivals(self, ready: selectors.BaseSelector):
+        with self.lock:
+            arrivals, self._arrivals = self._arrivals, []
+        timeout = self.admission.join_timeout if self.admission is not None else None
+        for p in arrivals:
+            try:
+                ready.register(p.conn, selectors.EVENT_READ, p)
+            except (ValueError, OSError):
+                p.close()
+                continue
+            self.joining[p] = None if timeout is None else time.monotonic() + timeout
+
+    # Seconds until the oldest join deadline (deadlines are set in arrival order), None = no deadline
+    def _join_wait(self) -> Optional[float]:
+        for deadline in self.joining.values():
+            return None if deadline is None else max(0.0, deadline - time.monotonic())
+        return None
+
+    def _check_join(self, ready: selectors.BaseSelector, p: PlayerConn):
+        p.poll()
+        if not p.pending and not p.ended:
+            return  # only part of a frame so far
+        ready.unregister(p.conn)
+        del self.joining[p]
+        msg = p.pending.popleft() if p.pending else None
+        if msg is not None and msg.get("type") == "join":
+            self._enqueue(p)
+            return
+        with self.lock:
+            self.metrics["handshake_failures"] += 1
+        p.close()
+
+    def _expire_joins(self, ready: selectors.BaseSelector):
+        now = time.monotonic()
+        while self.joining:
+            p, deadline = next(iter(self.joining.items()))
+            if deadline is None or deadline > now:
+                return
+            ready.unregister(p.conn)
+            del self.joining[p]
+            p.dropped = "timeout"
+            with self.lock:
+                self.metrics["handshake_failures"] += 1
+            p.close()
+
+    # Puts a player in the lobby (new, or back from a match whose character selection failed)
+    def _enqueue(self, player: PlayerConn):
+        successor = self.successor
+        if successor is not None:  # handing off: the successor's lobby instead
+            successor.send_player(player)
+            player.close()
+            return
+        player.joined_at = time.monotonic()
+        with self.lock:
+            self.lobby.append(player)
+            group = None
+            if len(self.lobby) >= self.needed:
+                group, self.lobby = self.lobby[:self.needed], self.lobby[self.needed:]
+            missing = self.needed - len(self.lobby)
+        if group is None:
+            try:
+                player.send_frame(frames.waiting_for(missing))
+            except OSError:
+                pass
+        if group:
+            self.launch_match(group)
+
+    # Removes and returns lobby players that have waited longer than max_wait seconds
+    def take_stale(self, max_wait: float) -> List[PlayerConn]:
+        now = time.monotonic()
+        with self.lock:
+            stale = [p for p in self.lobby if now - p.joined_at >= max_wait]
+            if stale:
+                self.lobby = [p for p in self.lobby if p not in stale]
+        return stale
+
+    # resume: a match's handoff_state() from the process this one took over from; counted as resumed,
+    # not started, so it does not use up start()'s max_matches
+    def launch_match(self, players: List[PlayerConn], resume: Optional[dict] = None):
+        with self.lock:
+            self.metrics["matches_started" if resume is None else "resumed"] += 1
+            self.metrics["active_matches"] += 1
+        t = threading.Thread(target=self._run_match, args=(players, resume), daemon=True)
+        self.match_threads = [mt for mt in self.match_threads if mt.is_alive()] + [t]
+        t.start()
+
+    def _run_match(self, players: List[PlayerConn], resume: Optional[dict] = None):
+        battle = None
+        back_to_lobby: List[PlayerConn] = []
+        try:
+            if resume is None:
+                battle = NetworkBattle(players, parallel=self.parallel, max_rounds=self.max_rounds,
+                                       quiet=self.quiet, lockstep=self.lockstep, win_probs=self.win_probs,
+                                       pool=self.characters,
+                                       handshake_timeout=self.admission.handshake_timeout if self.admission else None)
+            else:
+                battle = NetworkBattle(players, parallel=resume["parallel"], max_rounds=resume["max_rounds"],
+                                       seed=resume["seed"], quiet=self.quiet, lockstep=resume["lockstep"],
+                                       hash_every=resume["hash_every"], win_probs=self.win_probs,
+                                       pool=self.characters)
+            battle.between_rounds = self._between_rounds
+            self.battle = battle
+            if resume is None:
+                battle.run()
+            else:
+                battle.resume(resume)
+            if battle.winner:
+                self._record(battle)
+        except CharacterSelectionFailed as e:
+            # nothing was played yet: the others wait for the next match instead of losing theirs
+            back_to_lobby = [p for p in players if p is not e.player]
+            with self.lock:
+                self.metrics["handshake_failures"] += 1
         except Exception as e:
             print("Error during match:", e)
-            for p in self.clients:
+            for p in players:
                 try:
                     p.send({"type": "error", "message": str(e)})
                 except Exception:
                     pass
         finally:
-            for p in self.clients:
-                p.close()
-            self.sock.close()
+            for p in players:
+                if p not in back_to_lobby:
+                    p.close()
+            if battle:
+                battle.release()
+            with self.lock:
+                self.metrics["active_matches"] -= 1
+                if battle and battle.handed_off:
+                    self.metrics["handed_off"] += 1
+                else:
+                    self.metrics["matches_finished"] += 1
+                self.metrics["dropped"] += sum(1 for p in players if p.dropped in ("flood", "oversize", "malformed"))
+                if battle:
+                    self.metrics["turns"] += battle.turns
+        for p in back_to_lobby:
+            self._enqueue(p)
+
+    def _record(self, battle: NetworkBattle):
+        result = battle.result()
+        if self.store is not None:
+            self.store.record(result)
+        if self.on_result is not None:
+            self.on_result(result)
+        if self.ratings is not None:
+            with self.lock:
+                changes = self.ratings.update(result)
+                updates = {name: (self.ratings.rating_of(name), change, self.ratings.rank_of(name))
+                           for name, change in changes.items()}
+            for p in battle.players:
+                if p.name in updates:
+                    rating, change, rank = updates[p.name]
+                    try:
+                        p.send({"type": "rating", "rating": round(rating, 1), "change": round(change, 1), "rank": rank})
+                    except Exception:
+                        pass
 
 if __name__ == "__main__":
-    GameServer().start()
+    parser = argparse.ArgumentParser(description="Turn-based battle server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=50007)
+    parser.add_argument("--mode", choices=["1v1", "2v2", "3v3"], default="1v1")
+    parser.add_argument("--sequential", action="store_true",
+                        help="prompt one player at a time instead of a parallel planning phase")
+    parser.add_argument("--max-rounds", type=int, default=None, help="declare a draw after this many rounds")
+    parser.add_argument("--db", default="matches.db", help="match history database ('' to disable)")
+    parser.add_argument("--matches", type=int, default=0, help="stop after this many matches (0 = serve forever)")
+    parser.add_argument("--quiet", action="store_true", help="do not print per-hit combat messages")
+    parser.add_argument("--lockstep", action="store_true",
+                        help="send validated actions instead of full state; clients re-simulate the match")
+    parser.add_argument("--win-prob-workers", type=int, default=1,
+                        help="processes estimating win probabilities for team modes (0 = no estimates)")
+    parser.add_argument("--handoff", metavar="PATH", default=None,
+                        help="Unix socket for zero-downtime restarts: take over from the server listening "
+                             "there, if any, then listen there for the next one")
+    add_admission_args(parser)
+    args = parser.parse_args()
+    win_probs = WinProbability(workers=args.win_prob_workers) if args.win_prob_workers > 0 else None
+    store = MatchStore(args.db) if args.db else None
+    ratings = RatingEngine()
+    if store:
+        ratings.rerate(store.iter_results(source="server"))  # bulk replay, then incremental per match
+    try:
+        server = GameServer(args.host, args.port, team_size=int(args.mode[0]), parallel=not args.sequential,
+                            max_rounds=args.max_rounds, store=store, ratings=ratings,
+                            quiet=args.quiet, lockstep=args.lockstep, win_probs=win_probs,
+                            admission=admission_from_args(args))
+        if args.handoff:
+            if handoff.take_over(server, args.handoff):
+                print(f"Took over the listening socket from the server on {args.handoff}")
+            else:
+                handoff.serve_handoffs(server, args.handoff)
+        server.start(max_matches=args.matches or None)
+    finally:
+        if win_probs:
+            win_probs.close()
+        if store:
+            store.close()
@@ -0,0 +1,343 @@
+# simulator.py
+#
+# Headless, seeded matches between class lineups driven by scripted policies.
+# Same rules as NetworkBattle (per-actor upkeep, stun checked before effects
+# tick, speed-based initiative), but no sockets and no printing, so thousands
+# of matches run per minute.
+#
+#   python simulator.py --matches 1000 --mode 2v2 --db matches.db
+
+import argparse
+import random
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from character import CharacterFactory, CharacterPool
+from actions import AttackAction, DefendAction, SpecialMoveAction
+from initiative import InitiativeScheduler
+from legal_actions import LivingIndex, ActionTable
+from damage_matrix import DamageMatrix
+from class_table import AVAILABLE_CLASSES
+from status_effects import encode_effect, decode_effect
+
+ACTIONS = {
+    "attack": AttackAction(),
+    "defend": DefendAction(),
+    "special": SpecialMoveAction(),
+}
+
+# policy(sim, actor) -> (action, target_index); the index points into the
+# living enemies (or living allies for ally-targeted specials)
+Policy = Callable[["Simulation", object], Tuple[str, Optional[int]]]
+
+
+def _quiet(*args, **kwargs):
+    pass
+
+
+def random_policy(sim: "Simulation", actor) -> Tuple[str, Optional[int]]:
+    table = sim.legal_actions(actor)
+    action = sim.rng.choice(table.actions)
+    pool = table.allies if action == "special" and table.special == "ally" else table.enemies
+    return action, sim.rng.randrange(len(pool)) if pool else None
+
+
+# Purpose: Takes the action with the most expected damage this turn (ties keep the first), reading the
+# damage matrix; falls back to a random legal action when nothing it can do deals damage
+def greedy_policy(sim: "Simulation", actor) -> Tuple[str, Optional[int]]:
+    table = sim.legal_actions(actor)
+    m = sim.damage
+    best, best_score = None, 0.0
+    for action, index in table.choices():
+        if action == "attack":
+            score = min(m.expected_attack(actor, table.enemies[index]), table.enemies[index].hp)
+        elif action == "special" and table.special == "enemy":
+            score = min(m.expected_special(actor, table.enemies[index]), table.enemies[index].hp)
+        elif action == "special" and table.special == "all":
+            score = sum(min(m.expected_special(actor, e), e.hp) for e in table.enemies)
+        else:
+            continue
+        if score > best_score:
+            best, best_score = (action, index), score
+    return best or random_policy(sim, actor)
+
+
+# Purpose: Fixed priorities, like a hand-written bot: the special whenever it is ready (heals go to the
+# most wounded ally, targeted specials to the weakest enemy), otherwise attack the enemy with the least HP
+def scripted_policy(sim: "Simulation", actor) -> Tuple[str, Optional[int]]:
+    table = sim.legal_actions(actor)
+    weakest = min(range(len(table.enemies)), key=lambda i: table.enemies[i].hp) if table.enemies else None
+    if "special" in table.actions:
+        if table.special == "ally":
+            return "special", min(range(len(table.allies)), key=lambda i: table.allies[i].hp / table.allies[i].spec.hp)
+        return "special", weakest if table.special == "enemy" else None
+    if weakest is not None:
+        return "attack", weakest
+    return "defend", None
+
+
+# Purpose: One-ply Monte Carlo search. Every legal choice is tried in `rollouts` forks of the match (the
+# same fork seeds for every choice), each fork is played on greedy vs greedy for at most `horizon` rounds,
+# and the choice with the best mean score wins: 1 for a win, 0 for a loss, the side's share of the
+# remaining HP when the horizon is reached first
+class SearchPolicy:
+    def __init__(self, rollouts: int = 4, horizon: int = 8):
+        if rollouts < 1 or horizon < 1:
+            raise ValueError("rollouts and horizon must be at least 1")
+        self.rollouts = rollouts
+        self.horizon = horizon
+        self.policies = {"Team 1": greedy_policy, "Team 2": greedy_policy}
+        self.characters = CharacterPool()  # forks take their characters from here
+
+    def __call__(self, sim: "Simulation", actor) -> Tuple[str, Optional[int]]:
+        table = sim.legal_actions(actor)
+        choices = table.choices()
+        if len(choices) == 1:
+            return choices[0]
+        team = sim.team_of[id(actor)]
+        slot = sim.teams[team].index(actor)
+        # own stream, so searching does not move the match's dice
+        rng = random.Random(sim.seed * 1_000_003 + sim.turns)
+        seeds = [rng.randrange(2 ** 32) for _ in range(self.rollouts)]
+        best, best_score = choices[0], -1.0
+        for choice in choices:
+            score = 0.0
+            for seed in seeds:
+                fork = sim.fork(seed, self.policies, sim.rounds + self.horizon, pool=self.characters)
+                fork.apply_action(fork.teams[team][slot], *choice)
+                if fork.end_turn():
+                    fork.run()
+                score += fork.score(team)
+                fork.release()
+            if score > best_score:
+                best, best_score = choice, score
+        return best
+
+
+class Simulation:
+    def __init__(self, team1: List[str], team2: List[str], seed: Optional[int] = None,
+                 policies: Optional[Dict[str, Policy]] = None, max_rounds: int = 100, verbose: bool = False,
+                 specs: Optional[dict] = None, pool: Optional[CharacterPool] = None):
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.rng = random.Random(self.seed)
+        self.max_rounds = max_rounds
+        self.policies = policies or {}
+        self.pool = pool  # characters come from (and go back to) this pool when given
+        self.teams: Dict[str, list] = {"Team 1": [], "Team 2": []}
+        self.team_of: Dict[int, str] = {}
+        for team_name, lineup in (("Team 1", team1), ("Team 2", team2)):
+            for class_name in lineup:
+                c = pool.acquire(class_name, specs) if pool else CharacterFactory.create_character(class_name, specs)
+                c.rng = self.rng
+                c.log = print if verbose else _quiet
+                self.teams[team_name].append(c)
+                self.team_of[id(c)] = team_name
+        self.turn_order = InitiativeScheduler(self.teams["Team 1"] + self.teams["Team 2"], rng=self.rng)
+        self.living = LivingIndex(self.teams)
+        self.damage = DamageMatrix(self.teams["Team 1"] + self.teams["Team 2"]).attach()
+        self.table: Optional[ActionTable] = None  # legal actions of the actor begin_turn handed out
+        self.actor = None  # whose turn begin_turn last started (also when it returned None for them)
+        self.turns = 0
+        self.winner: Optional[str] = None
+        self.duration = 0.0
+
+    # ---------- helpers ----------
+    def enemies_of(self, c) -> list:
+        return self.living.enemies_of(c)
+
+    def allies_of(self, c) -> list:
+        return self.living.allies_of(c)
+
+    def check_team_alive(self, team_name: str) -> bool:
+        return self.living.alive(team_name)
+
+    def legal_actions(self, c) -> ActionTable:
+        if self.table is None or self.table.actor is not c:
+            self.table = ActionTable(c, self.living)
+        return self.table
+
+    def _eliminate(self, c):
+        self.turn_order.remove(c)
+        self.living.remove(c)
+
+    @property
+    def rounds(self) -> int:
+        return self.turn_order.round
+
+    # ---------- battle loop ----------
+    # Purpose: Plays one actor's turn, returns False once the match is decided
+    def step(self) -> bool:
+        c = self.begin_turn()
+        if c is None:
+            return self.winner is None
+        policy = self.policies.get(self.team_of[id(c)], random_policy)
+        action, target_index = policy(self, c)
+        self.apply_action(c, action, target_index)
+        return self.end_turn()
+
+    # Purpose: Pops the next actor and runs its upkeep; returns it if it gets to choose an action
+    # (None when it is stunned, died to poison, or the match is over)
+    def begin_turn(self):
+        if self.winner is not None:
+            return None
+        c = self.actor = self.turn_order.next_actor()
+        if self.turn_order.round >= self.max_rounds:
+            self.winner = "Draw"
+            return None
+
+        stunned = c.is_stunned()
+        c.process_status_effects()
+        c.special_move_cooldown = max(0, c.special_move_cooldown - 1)
+        if c.hp <= 0:
+            self._eliminate(c)
+        elif not stunned:
+            self.table = ActionTable(c, self.living)
+            return c
+        self._check_winner()
+        return None
+
+    # Purpose: Finishes a turn started by begin_turn once the actor's action was applied
+    def end_turn(self) -> bool:
+        self.table = None
+        self.turns += 1
+        self._check_winner()
+        return self.winner is None
+
+    def _check_winner(self):
+        if not self.check_team_alive("Team 1"):
+            self.winner = "Team 2"
+        elif not self.check_team_alive("Team 2"):
+            self.winner = "Team 1"
+
+    # Purpose: Applies a policy's choice; illegal choices (bad index, special on cooldown) do nothing
+    def apply_action(self, c, action: str, target_index: Optional[int]):
+        table = self.legal_actions(c)
+        if not table.is_legal(action, target_index):
+            return
+        hit = []
+        if action == "defend":
+            ACTIONS["defend"].execute(c)
+        elif action == "attack":
+            target = table.pick("attack", target_index)
+            ACTIONS["attack"].execute(c, target)
+            hit = [target]
+        elif table.special == "self":
+            c.special_move(c)
+        elif table.special == "all":
+            hit = list(table.enemies)
+            c.special_move(hit)
+        else:
+            target = table.pick("special", target_index)
+            c.special_move(target)
+            if table.special == "enemy":
+                hit = [target]
+        for t in hit:
+            if t.hp <= 0:
+                self._eliminate(t)
+
+    def run(self) -> dict:
+        start = time.perf_counter()
+        while self.step():
+            pass
+        self.duration = time.perf_counter() - start
+        return self.result()
+
+    # Purpose: Independent copy of the match as it stands (stats, effects, cooldowns, turn order) with its
+    # own RNG and policies, for search policies to play ahead in; this match is left untouched
+    def fork(self, seed: int, policies: Optional[Dict[str, Policy]] = None, max_rounds: Optional[int] = None,
+             pool: Optional[CharacterPool] = None) -> "Simulation":
+        members = self.teams["Team 1"] + self.teams["Team 2"]
+        sim = Simulation([c.name for c in self.teams["Team 1"]], [c.name for c in self.teams["Team 2"]], seed=seed,
+                         policies=policies, max_rounds=max_rounds or self.max_rounds,
+                         specs={c.name: c.spec for c in members}, pool=pool or self.pool)
+        copies = sim.teams["Team 1"] + sim.teams["Team 2"]
+        for src, c in zip(members, copies):
+            c.hp, c.attack_power, c.defense, c.speed = src.hp, src.attack_power, src.defense, src.speed
+            c.special_move_cooldown = src.special_move_cooldown
+            c.status_effects.extend(decode_effect(encode_effect(e)) for e in src.status_effects)
+        slot = {id(c): i for i, c in enumerate(members)}
+        sim.turn_order.restore(self.turn_order.snapshot(lambda c: slot[id(c)]), copies.__getitem__)
+        sim.living = LivingIndex(sim.teams)
+        sim.turns = self.turns
+        return sim
+
+    # Purpose: 1 if team won, 0 if it lost, otherwise its share of the HP (as fractions of max HP) still standing
+    def score(self, team: str) -> float:
+        if self.winner == team:
+            return 1.0
+        if self.winner is not None and self.winner != "Draw":
+            return 0.0
+        left = {name: sum(max(0, c.hp) / c.spec.hp for c in members) for name, members in self.teams.items()}
+        total = left["Team 1"] + left["Team 2"]
+        return left[team] / total if total else 0.5
+
+    # Purpose: Hands the characters back to the pool once the match (and its result) is no longer needed
+    def release(self):
+        if self.pool is not None:
+            self.pool.release(c for team in self.teams.values() for c in team)
+            self.teams = {"Team 1": [], "Team 2": []}
+
+    # Purpose: Match summary in the shape MatchStore.record expects
+    def result(self) -> dict:
+        size = len(self.teams["Team 1"])
+        return {
+            "source": "simulator",
+            "mode": f"{size}v{size}",
+            "winner": self.winner,
+            "turns": self.turns,
+            "duration": self.duration,
+            "seed": self.seed,
+            "roster": [{"player": None, "class": c.name, "team": t}
+                       for t, members in self.teams.items() for c in members],
+        }
+
+
+# Purpose: Random distinct lineups (like the server, a class can only be picked once per match)
+def random_lineups(rng: random.Random, team_size: int) -> Tuple[List[str], List[str]]:
+    picks = rng.sample(AVAILABLE_CLASSES, team_size * 2)
+    return picks[0::2], picks[1::2]
+
+
+# trace: a turn_trace.TraceWriter to record every turn into (the matches play out the same either way)
+def simulate_many(matches: int, team_size: int = 1, seed: int = 0, max_rounds: int = 100, trace=None):
+    rng = random.Random(seed)
+    pool = CharacterPool()
+    for _ in range(matches):
+        team1, team2 = random_lineups(rng, team_size)
+        sim = Simulation(team1, team2, seed=rng.randrange(2 ** 32), max_rounds=max_rounds, pool=pool)
+        result = trace.play(sim) if trace else sim.run()
+        sim.release()
+        yield result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless battle simulator")
+    parser.add_argument("--matches", type=int, default=1000)
+    parser.add_argument("--mode", choices=["1v1", "2v2", "3v3"], default="1v1")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-rounds", type=int, default=100)
+    parser.add_argument("--db", default=None, help="record results into this match database")
+    parser.add_argument("--trace", default=None, help="append per-turn traces to this directory (see turn_trace.py)")
+    args = parser.parse_args()
+
+    store = None
+    if args.db:
+        from match_store import MatchStore
+        store = MatchStore(args.db)
+    trace = None
+    if args.trace:
+        from turn_trace import TraceWriter
+        trace = TraceWriter(args.trace)
+
+    wins = {"Team 1": 0, "Team 2": 0, "Draw": 0}
+    start = time.perf_counter()
+    for result in simulate_many(args.matches, int(args.mode[0]), args.seed, args.max_rounds, trace):
+        wins[result["winner"]] += 1
+        if store:
+            store.record(result)
+    elapsed = time.perf_counter() - start
+    if store:
+        store.close()
+    if trace:
+        trace.close()
+    print(f"{args.matches} matches in {elapsed:.2f}s ({args.matches / elapsed * 60:,.0f}/min): {wins}")
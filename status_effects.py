@@ -1,10 +1,55 @@
+import threading
 from abc import ABC, abstractmethod
 
+MAX_FREE_EFFECTS = 1024 # released effects kept per class and thread
+_local = threading.local() # per thread: free lists and counters
+
+# Purpose: This thread's acquire() counts: built a new effect / reused one
+def effect_stats():
+    try:
+        return _local.stats
+    except AttributeError:
+        _local.stats = {"created": 0, "reused": 0}
+        return _local.stats
+
+# Purpose: This thread's released instances of an effect class
+def _free_list(cls):
+    try:
+        lists = _local.free
+    except AttributeError:
+        lists = _local.free = {}
+    free = lists.get(cls)
+    if free is None:
+        free = lists[cls] = []
+    return free
+
 # Purpose: Framework for status effects
+# Effects are short-lived, so each class keeps a free list: acquire() re-initialises
+# a released instance when there is one, release() hands an expired effect back.
+# Matches run on several threads, so the lists and counters are per thread and need
+# no lock; an effect released on another thread just joins that thread's list.
 class StatusEffect(ABC):
     def __init__(self, duration):
         self.duration = duration # how long effect lasts
 
+    # Purpose: An instance built with these arguments, reusing a released one if possible
+    @classmethod
+    def acquire(cls, *args, **kwargs):
+        try:
+            effect = _free_list(cls).pop()
+        except IndexError:
+            effect_stats()["created"] += 1
+            return cls(*args, **kwargs)
+        effect_stats()["reused"] += 1
+        effect.__init__(*args, **kwargs)
+        return effect
+
+    # Purpose: Returns an effect that is no longer attached to anyone (called once per effect)
+    def release(self):
+        free = _free_list(type(self))
+        if len(free) < MAX_FREE_EFFECTS:
+            free.append(self)
+
     # All subclasses impement own apply method
     @abstractmethod
     def apply(self, character):
@@ -23,7 +68,7 @@ class PoisonEffect(StatusEffect):
     # Purose: Applies the Poison effect on character
     def apply(self, character):
         character.hp -= self.damage_per_turn # character hp is set to the damage taken per turn
-        print(f"{character.name} is poisoned and loses {self.damage_per_turn} HP! ({character.hp} HP left)")
+        character.log(f"{character.name} is poisoned and loses {self.damage_per_turn} HP! ({character.hp} HP left)")
 
 # Purpose: Creates the stun effect
 # Impements the abstract StatusEffect class
@@ -32,7 +77,7 @@ class StunEffect(StatusEffect):
         super().__init__(duration)
     # Applies the stun effect on chosen character
     def apply(self, character):
-        print(f"{character.name} is stunned and cannot act this turn!")
+        character.log(f"{character.name} is stunned and cannot act this turn!")
 
 # Purpsose: Boosts the defense of character
 class DefenseBoostEffect(StatusEffect):
@@ -44,5 +89,26 @@ class DefenseBoostEffect(StatusEffect):
     def apply(self, character):
         # Adds defense to character
         character.defense += self.defense_increase
-        print(f"{character.name} gains {self.defense_increase} extra defense for {self.duration} turns!")
+        character.stats_changed() # cached damage against this character is stale now
+        character.log(f"{character.name} gains {self.defense_increase} extra defense for {self.duration} turns!")
+
+
+# Purpose: Effects as plain lists ([kind, duration, ...]) for snapshots sent over the wire
+def encode_effect(effect):
+    if isinstance(effect, StunEffect):
+        return ["stun", effect.duration]
+    if isinstance(effect, PoisonEffect):
+        return ["poison", effect.duration, effect.damage_per_turn]
+    if isinstance(effect, DefenseBoostEffect):
+        return ["defense_boost", effect.duration, effect.defense_increase]
+    raise ValueError(f"Cannot encode status effect: {type(effect).__name__}")
 
+def decode_effect(entry):
+    kind, duration = entry[0], entry[1]
+    if kind == "stun":
+        return StunEffect.acquire(duration=duration)
+    if kind == "poison":
+        return PoisonEffect.acquire(damage_per_turn=entry[2], duration=duration)
+    if kind == "defense_boost":
+        return DefenseBoostEffect.acquire(defense_increase=entry[2], duration=duration)
+    raise ValueError(f"Unknown status effect: {kind}")
@@ -0,0 +1,314 @@
+# supervisor.py
+#
+# Multi-process game server. The supervisor forks N workers; each worker
+# binds its own listening socket to the same port with SO_REUSEPORT (the
+# kernel spreads new connections across them) and runs a GameServer with its
+# own match threads, so matches are not serialized behind one GIL.
+#
+# Shared lobby: players waiting alone on a worker for more than SHARE_AFTER
+# seconds are passed (socket fd over SCM_RIGHTS) to the supervisor, which pools
+# them and hands every full group to the least busy worker as a ready match.
+# Workers also report their metrics and finished-match results over the same
+# channel; the supervisor rolls metrics up and owns the match store / ratings.
+#
+#   python supervisor.py --workers 4 --mode 1v1
+
+import argparse
+import os
+import select
+import signal
+import socket
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+from admission import Admission, add_admission_args, admission_from_args
+from server import GameServer
+from match_store import MatchStore
+from protocol import recv_packet, send_packet
+from ratings import RatingEngine
+
+SHARE_AFTER = 0.5        # seconds a lone player waits locally before joining the shared lobby
+METRICS_INTERVAL = 1.0   # seconds between worker metric reports
+PID_STRIDE = 1_000_000   # player ids are unique per worker: (worker + 1) * PID_STRIDE + n
+
+
+# ----------------------------
+# Worker process
+# ----------------------------
+class Worker:
+    def __init__(self, index: int, chan: socket.socket, host: str, port: int, team_size: int,
+                 parallel: bool, max_rounds: Optional[int], admission: Optional[Admission] = None):
+        self.index = index
+        self.chan = chan
+        self.chan_lock = threading.Lock()
+        self.running = True
+        self.server = GameServer(host, port, team_size=team_size, parallel=parallel, max_rounds=max_rounds,
+                                 reuse_port=True, quiet=True, pid_base=(index + 1) * PID_STRIDE,
+                                 admission=admission)  # limits are per worker
+        self.server.on_result = lambda result: self._post({"type": "result", "result": result})
+        self.shared = 0  # players passed to the shared lobby
+
+    def _post(self, obj: dict, fds: Optional[List[int]] = None):
+        with self.chan_lock:
+            try:
+                send_packet(self.chan, obj, fds)
+            except OSError:
+                pass
+
+    def run(self):
+        self.server.listen()
+        threading.Thread(target=self._control_loop, daemon=True).start()
+        threading.Thread(target=self._housekeeping, daemon=True).start()
+        self.server.serve_forever()
+        self.running = False
+        self._report()
+        self.chan.close()
+
+    # metrics + lone-player sharing
+    def _housekeeping(self):
+        last_report = 0.0
+        while self.running:
+            for p in self.server.take_stale(SHARE_AFTER):
+                self._post({"type": "player", "pid": p.pid, "name": p.name, "addr": list(p.addr)},
+                           [p.conn.fileno()])
+                p.close()  # the supervisor now holds the only copy of the connection
+                self.shared += 1
+            if time.monotonic() - last_report >= METRICS_INTERVAL:
+                self._report()
+                last_report = time.monotonic()
+            time.sleep(0.05)
+
+    def _report(self):
+        with self.server.lock:
+            metrics = dict(self.server.metrics, waiting=len(self.server.lobby), shared=self.shared)
+        self._post({"type": "metrics", "worker": self.index, "pid": os.getpid(), "metrics": metrics})
+
+    # messages from the supervisor
+    def _control_loop(self):
+        while True:
+            try:
+                msg, fds = recv_packet(self.chan)
+            except OSError:
+                msg, fds = None, []
+            if msg is None or msg.get("type") == "stop":
+                self.server.stop()
+                return
+            if msg.get("type") == "match":
+                # the sending worker released these connections' admission slots: count them here
+                players = []
+                for info, fd in zip(msg["players"], fds):
+                    p = self.server.adopt_player(socket.socket(fileno=fd), tuple(info["addr"]), info["pid"])
+                    if p is not None:
+                        p.name = info["name"]
+                        players.append(p)
+                if len(players) == len(fds):
+                    self.server.launch_match(players)
+                else:
+                    for p in players:  # someone was over the limits: the rest wait here for another match
+                        self.server.add_player(p, joined=True)
+
+
+# ----------------------------
+# Supervisor process
+# ----------------------------
+class Supervisor:
+    def __init__(self, workers: int = 2, host: str = "127.0.0.1", port: int = 50007, team_size: int = 1,
+                 parallel: bool = True, max_rounds: Optional[int] = None,
+                 store: Optional[MatchStore] = None, ratings: Optional[RatingEngine] = None,
+                 admission: Optional[Admission] = None):
+        self.n_workers = workers
+        self.host = host
+        self.port = port
+        self.team_size = team_size
+        self.parallel = parallel
+        self.max_rounds = max_rounds
+        self.store = store
+        self.ratings = ratings
+        self.admission = admission  # each worker enforces its own copy
+        self.channels: Dict[int, socket.socket] = {}  # worker index -> channel
+        self.pids: Dict[int, int] = {}                # worker index -> process id
+        self.worker_metrics: Dict[int, dict] = {}
+        self.pool: List[tuple] = []                   # shared lobby: (info, fd)
+        self.lock = threading.Lock()
+        self.running = False
+
+    def start(self):
+        # fork before any threads exist in this process
+        for i in range(self.n_workers):
+            parent_end, child_end = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+            pid = os.fork()
+            if pid == 0:
+                parent_end.close()
+                for other in self.channels.values():
+                    other.close()
+                code = 0
+                try:
+                    Worker(i, child_end, self.host, self.port, self.team_size,
+                           self.parallel, self.max_rounds, self.admission).run()
+                except BaseException:
+                    code = 1
+                os._exit(code)
+            child_end.close()
+            self.channels[i] = parent_end
+            self.pids[i] = pid
+        self.running = True
+
+    def serve(self, report_every: float = 0.0):
+        last = time.monotonic()
+        by_fd = {chan.fileno(): i for i, chan in self.channels.items()}
+        while self.running and by_fd:
+            by_fd = {fd: i for fd, i in by_fd.items() if i in self.channels}  # minus workers _send_group dropped
+            ready, _, _ = select.select(list(by_fd), [], [], 0.2)
+            for fd in ready:
+                index = by_fd[fd]
+                try:
+                    msg, fds = recv_packet(self.channels[index])
+                except OSError:
+                    msg, fds = None, []
+                if msg is None:
+                    del by_fd[fd]  # worker exited
+                    continue
+                self._handle(index, msg, fds)
+            if report_every and time.monotonic() - last >= report_every:
+                print(self.format_rollup())
+                last = time.monotonic()
+
+    def _handle(self, index: int, msg: dict, fds: List[int]):
+        mtype = msg.get("type")
+        if mtype == "metrics":
+            with self.lock:
+                self.worker_metrics[index] = msg["metrics"]
+        elif mtype == "result":
+            if self.store is not None:
+                self.store.record(msg["result"])
+            if self.ratings is not None:
+                self.ratings.update(msg["result"])
+        elif mtype == "player" and fds:
+            self.pool.append((msg, fds[0]))
+            needed = self.team_size * 2
+            while len(self.pool) >= needed:
+                group, self.pool = self.pool[:needed], self.pool[needed:]
+                if not self._send_group(group):
+                    self.pool = group + self.pool  # no worker left to take it; closed by stop()
+                    break
+
+    # Hands a ready group to the least busy worker that is still there; False if none is
+    def _send_group(self, group: List[tuple]) -> bool:
+        while self.channels:
+            target = self._least_busy()
+            try:
+                send_packet(self.channels[target], {"type": "match", "players": [info for info, _ in group]},
+                            [fd for _, fd in group])
+            except OSError:
+                print(f"[supervisor] worker {target} is gone, passing its match to another")
+                self.channels.pop(target).close()
+                with self.lock:
+                    self.worker_metrics.pop(target, None)
+                continue
+            for _, fd in group:
+                os.close(fd)
+            return True
+        return False
+
+    def _least_busy(self) -> int:
+        with self.lock:
+            return min(self.channels, key=lambda i: self.worker_metrics.get(i, {}).get("active_matches", 0))
+
+    def rollup(self) -> dict:
+        with self.lock:
+            per_worker = {i: dict(m) for i, m in self.worker_metrics.items()}
+        total: Dict[str, int] = {}
+        for m in per_worker.values():
+            for k, v in m.items():
+                total[k] = total.get(k, 0) + v
+        total["shared_lobby"] = len(self.pool)
+        return {"workers": per_worker, "total": total}
+
+    def format_rollup(self) -> str:
+        r = self.rollup()
+        t = r["total"]
+        return (f"[supervisor] {len(r['workers'])} workers | connections {t.get('connections', 0)} | "
+                f"active {t.get('active_matches', 0)} | finished {t.get('matches_finished', 0)} | "
+                f"turns {t.get('turns', 0)} | waiting {t.get('waiting', 0)} + shared {t.get('shared_lobby', 0)}")
+
+    def stop(self, timeout: float = 10.0):
+        # workers stop accepting, finish their matches and send final metrics
+        for chan in self.channels.values():
+            try:
+                send_packet(chan, {"type": "stop"})
+            except OSError:
+                pass
+        deadline = time.monotonic() + timeout
+        while self.pids and time.monotonic() < deadline:
+            for i, pid in list(self.pids.items()):
+                done, _ = os.waitpid(pid, os.WNOHANG)
+                if done:
+                    del self.pids[i]
+            self._drain()
+            time.sleep(0.05)
+        for pid in self.pids.values():
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        self.pids.clear()
+        self._drain()
+        for _, fd in self.pool:
+            os.close(fd)
+        self.pool.clear()
+        self.running = False
+
+    def _drain(self):
+        # collect anything workers sent while shutting down (final metrics/results)
+        for i, chan in self.channels.items():
+            while True:
+                ready, _, _ = select.select([chan], [], [], 0)
+                if not ready:
+                    break
+                try:
+                    msg, fds = recv_packet(chan)
+                except OSError:
+                    break
+                if msg is None:
+                    break
+                if msg.get("type") == "player":
+                    for fd in fds:
+                        os.close(fd)
+                else:
+                    self._handle(i, msg, fds)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Multi-process battle server (SO_REUSEPORT workers)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=50007)
+    parser.add_argument("--mode", choices=["1v1", "2v2", "3v3"], default="1v1")
+    parser.add_argument("--sequential", action="store_true")
+    parser.add_argument("--max-rounds", type=int, default=None)
+    parser.add_argument("--db", default="matches.db", help="match history database ('' to disable)")
+    parser.add_argument("--report", type=float, default=10.0, help="seconds between metric rollups")
+    add_admission_args(parser)
+    args = parser.parse_args()
+
+    sup = Supervisor(args.workers, args.host, args.port, team_size=int(args.mode[0]),
+                     parallel=not args.sequential, max_rounds=args.max_rounds,
+                     admission=admission_from_args(args))
+    sup.start()
+    # threads (the store writer) only after the fork
+    store = MatchStore(args.db) if args.db else None
+    ratings = RatingEngine()
+    if store:
+        ratings.rerate(store.iter_results(source="server"))
+    sup.store, sup.ratings = store, ratings
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))  # still runs the shutdown below
+    print(f"Supervisor: {args.workers} workers sharing {args.host}:{args.port}")
+    try:
+        sup.serve(report_every=args.report)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sup.stop()
+        print(sup.format_rollup())
+        if store:
+            store.close()
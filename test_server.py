@@ -0,0 +1,92 @@
+# test_server.py
+#
+# Regression tests for GameServer's handling of hostile or broken clients:
+# whatever a client sends, only its own connection may suffer.
+#
+#   python -m unittest test_server
+
+import socket
+import threading
+import time
+import unittest
+
+import server
+from benchmarks.bots import free_port
+from protocol import FrameDecoder, encode_frame
+
+HOST = "127.0.0.1"
+
+
+def _connect(port: int) -> socket.socket:
+    sock = socket.create_connection((HOST, port), timeout=5)
+    sock.settimeout(5)
+    return sock
+
+
+# Frames until the server closes the connection
+def _read_until_closed(sock: socket.socket) -> list:
+    decoder, frames = FrameDecoder(), []
+    while True:
+        data = sock.recv(65536)
+        if not data:
+            return frames
+        frames.extend(decoder.feed(data))
+
+
+class HandshakeTests(unittest.TestCase):
+    def setUp(self):
+        self.port = free_port(HOST)
+        self.server = server.GameServer(HOST, self.port, quiet=True)
+        self.server.listen()
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.stop()
+        self.thread.join(5)
+
+    def test_non_object_first_frame_fails_the_handshake_only(self):
+        for frame in (b"[]\n", b'"x"\n', b"5\n", b"null\n"):
+            with _connect(self.port) as sock:
+                sock.sendall(frame)
+                frames = _read_until_closed(sock)
+                self.assertEqual([f["type"] for f in frames], ["welcome"], frame)
+        deadline = time.monotonic() + 5
+        while self.server.metrics["handshake_failures"] < 4 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.server.metrics["handshake_failures"], 4)
+        self.assertTrue(self.thread.is_alive())
+
+        # still accepting, and a proper join still reaches the lobby
+        with _connect(self.port) as sock:
+            sock.sendall(encode_frame({"type": "join"}))
+            decoder, types = FrameDecoder(), []
+            while "waiting" not in types:
+                types += [f["type"] for f in decoder.feed(sock.recv(65536))]
+            self.assertEqual(types, ["welcome", "waiting"])
+
+    def test_non_object_frame_in_a_match_drops_only_its_sender(self):
+        a, b = _connect(self.port), _connect(self.port)
+        decoders = {a: FrameDecoder(), b: FrameDecoder()}
+
+        def wait_for(sock, mtype):
+            while True:
+                for f in decoders[sock].feed(sock.recv(65536)):
+                    if f["type"] == mtype:
+                        return f
+
+        for sock in (a, b):
+            sock.sendall(encode_frame({"type": "join"}))
+        for sock in (a, b):
+            wait_for(sock, "choose_character")
+        a.sendall(b'"x"\n')
+        _read_until_closed(a)  # cut off as a protocol error
+        # b did nothing wrong: back in the lobby, waiting for an opponent
+        self.assertEqual(wait_for(b, "waiting")["type"], "waiting")
+        self.assertTrue(self.thread.is_alive())
+        a.close()
+        b.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,343 @@
+# tournament.py
+#
+# Qualifies bot policies against each other before they go into the live
+# server. Entrants are policy specs:
+#   random, greedy, scripted      the simulator's fixed policies
+#   search[:rollouts[:horizon]]   SearchPolicy (default 4 rollouts, 8 rounds)
+# so several versions of one bot can enter side by side (search:4 search:8).
+#
+# Every pairing is played on every class pick of the mode (all ways to split
+# distinct classes from AVAILABLE_CLASSES into two lineups), once with each
+# entrant controlling Team 1; both games of a pick share a seed, and the same
+# seeds are used in every pairing, so entrants face identical dice. A sweep of
+# all picks is one replicate; pairings are cut into batches of picks that run
+# on a process pool, replicate by replicate, so every pairing progresses at
+# the same pace.
+#
+# Brackets:
+#   round-robin  every pairing plays --replicates sweeps;
+#   swiss        --rounds rounds, entrants paired by current standings (no
+#                rematches while avoidable, one bye per round if odd).
+#
+# Standings (score rate, draws count half) update as batches come back. The
+# run stops early once the ranking is settled: every adjacent pair is
+# separated by more than --z standard errors and the order has not changed
+# for --patience batches.
+#
+#   python tournament.py random greedy scripted search --mode 2v2
+#   python tournament.py greedy search:4 search:8:12 --format swiss --qualify search:8:12
+
+import argparse
+import math
+import os
+import sys
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from itertools import combinations
+from typing import Callable, Dict, List, Optional, Tuple
+
+from character import CharacterPool
+from class_table import AVAILABLE_CLASSES
+from simulator import Policy, Simulation, SearchPolicy, random_policy, greedy_policy, scripted_policy
+
+FIXED_POLICIES = {"random": random_policy, "greedy": greedy_policy, "scripted": scripted_policy}
+
+Lineups = Tuple[Tuple[str, ...], Tuple[str, ...]]  # (Team 1 classes, Team 2 classes)
+
+
+# ----------------------------
+# Entrants and class picks
+# ----------------------------
+def make_policy(spec: str) -> Policy:
+    name, *args = spec.split(":")
+    if name in FIXED_POLICIES and not args:
+        return FIXED_POLICIES[name]
+    if name == "search" and len(args) <= 2:
+        try:
+            return SearchPolicy(*(int(a) for a in args))
+        except ValueError:
+            pass
+    raise ValueError(f"Unknown policy: {spec}")
+
+
+def class_picks(team_size: int) -> List[Lineups]:
+    if not 1 <= team_size <= len(AVAILABLE_CLASSES) // 2:
+        raise ValueError(f"Unsupported team size: {team_size}")
+    picks = []
+    for team1 in combinations(AVAILABLE_CLASSES, team_size):
+        rest = [c for c in AVAILABLE_CLASSES if c not in team1]
+        picks.extend((team1, team2) for team2 in combinations(rest, team_size))
+    return picks
+
+
+# ----------------------------
+# Match batches (run in pool workers)
+# ----------------------------
+_policies: Dict[str, Policy] = {}  # per worker process: spec -> policy
+_pool = CharacterPool()  # per worker process
+
+
+def play_picks(spec_a: str, spec_b: str, picks: List[Lineups], first: int, replicate: int, seed: int,
+               max_rounds: int) -> Tuple[int, int, int]:
+    # -> (wins of spec_a, wins of spec_b, draws); every pick is played with each side controlling Team 1
+    for spec in (spec_a, spec_b):
+        if spec not in _policies:
+            _policies[spec] = make_policy(spec)
+    a, b = _policies[spec_a], _policies[spec_b]
+    wins_a = wins_b = draws = 0
+    for i, (team1, team2) in enumerate(picks, start=first):
+        game_seed = zlib.crc32(f"{seed}|{replicate}|{i}".encode())
+        for a_first in (True, False):
+            policies = {"Team 1": a, "Team 2": b} if a_first else {"Team 1": b, "Team 2": a}
+            sim = Simulation(list(team1), list(team2), seed=game_seed, policies=policies, max_rounds=max_rounds,
+                             pool=_pool)
+            winner = sim.run()["winner"]
+            sim.release()
+            if winner == "Draw":
+                draws += 1
+            elif (winner == "Team 1") == a_first:
+                wins_a += 1
+            else:
+                wins_b += 1
+    return wins_a, wins_b, draws
+
+
+# ----------------------------
+# Standings
+# ----------------------------
+class Record:
+    def __init__(self):
+        self.wins = 0
+        self.losses = 0
+        self.draws = 0
+
+    def add(self, wins: int, losses: int, draws: int):
+        self.wins += wins
+        self.losses += losses
+        self.draws += draws
+
+    @property
+    def games(self) -> int:
+        return self.wins + self.losses + self.draws
+
+    @property
+    def rate(self) -> float:
+        return (self.wins + 0.5 * self.draws) / self.games if self.games else 0.5
+
+    @property
+    def se(self) -> float:
+        return math.sqrt(0.25 / self.games) if self.games else 0.5  # widest binomial standard error
+
+
+class Standings:
+    def __init__(self, entrants: List[str]):
+        self.entrants = list(entrants)
+        self.overall = {e: Record() for e in entrants}
+        self.head_to_head: Dict[Tuple[str, str], Record] = {}  # (entrant, opponent) -> entrant's record
+        self.batches = 0
+        self.stable_for = 0  # batches since the ranking order last changed
+        self._order: List[str] = []
+
+    def add(self, a: str, b: str, wins_a: int, wins_b: int, draws: int):
+        self.overall[a].add(wins_a, wins_b, draws)
+        self.overall[b].add(wins_b, wins_a, draws)
+        self.head_to_head.setdefault((a, b), Record()).add(wins_a, wins_b, draws)
+        self.head_to_head.setdefault((b, a), Record()).add(wins_b, wins_a, draws)
+        self.batches += 1
+        order = self.ranking()
+        self.stable_for = self.stable_for + 1 if order == self._order else 0
+        self._order = order
+
+    def ranking(self) -> List[str]:
+        return sorted(self.entrants, key=lambda e: (-self.overall[e].rate, e))
+
+    def met(self, a: str, b: str) -> bool:
+        return (a, b) in self.head_to_head
+
+    # Purpose: True once every adjacent pair in the ranking is z standard errors apart and the order
+    # has held for `patience` batches
+    def settled(self, z: float, patience: int, min_games: int) -> bool:
+        order = self.ranking()
+        if self.stable_for < patience or any(self.overall[e].games < min_games for e in order):
+            return False
+        for upper, lower in zip(order, order[1:]):
+            r1, r2 = self.overall[upper], self.overall[lower]
+            if r1.rate - r2.rate <= z * math.hypot(r1.se, r2.se):
+                return False
+        return True
+
+    def format(self) -> str:
+        width = max(6, *(len(e) for e in self.entrants))
+        lines = [f"{'rank':>4}  {'policy':<{width}} {'score':>6} {'+/-':>5} {'W':>6} {'D':>6} {'L':>6} {'games':>7}"]
+        for rank, e in enumerate(self.ranking(), start=1):
+            r = self.overall[e]
+            lines.append(f"{rank:>4}  {e:<{width}} {r.rate:>6.1%} {2 * r.se:>5.1%} {r.wins:>6} {r.draws:>6} "
+                         f"{r.losses:>6} {r.games:>7}")
+        return "\n".join(lines)
+
+    def format_head_to_head(self) -> str:
+        order = self.ranking()
+        width = max(6, *(len(e) for e in order))
+        lines = [f"{'':<{width}} " + " ".join(f"{e[:width]:>{width}}" for e in order)]
+        for a in order:
+            cells = []
+            for b in order:
+                r = self.head_to_head.get((a, b))
+                cells.append(f"{'-' if r is None else f'{r.rate:.1%}':>{width}}")
+            lines.append(f"{a:<{width}} " + " ".join(cells))
+        return "\n".join(lines)
+
+
+# ----------------------------
+# Tournament
+# ----------------------------
+class Tournament:
+    def __init__(self, entrants: List[str], fmt: str = "round-robin", team_size: int = 1, replicates: int = 4,
+                 rounds: Optional[int] = None, picks_per_batch: int = 10, workers: Optional[int] = None,
+                 max_rounds: int = 60, seed: int = 0, z: float = 2.0, patience: int = 5, min_games: int = 200):
+        if len(entrants) < 2 or len(set(entrants)) != len(entrants):
+            raise ValueError("A tournament needs at least two distinct entrants")
+        for spec in entrants:
+            make_policy(spec)  # reject unknown specs before any work is scheduled
+        if fmt not in ("round-robin", "swiss"):
+            raise ValueError(f"Unknown format: {fmt}")
+        self.entrants = list(entrants)
+        self.fmt = fmt
+        self.picks = class_picks(team_size)
+        self.team_size = team_size
+        self.replicates = replicates
+        self.rounds = rounds or math.ceil(math.log2(len(entrants))) + 1
+        self.picks_per_batch = picks_per_batch
+        self.workers = workers or os.cpu_count()
+        self.max_rounds = max_rounds
+        self.seed = seed
+        self.stop_args = (z, patience, min_games)
+        self.standings = Standings(entrants)
+        self.byes: Dict[str, int] = {}
+        self.batches_total = 0
+        self.stopped_early = False
+
+    # Batches of one pairing: every pick, replicate by replicate
+    def _batches(self, a: str, b: str, replicates: range) -> List[tuple]:
+        step = self.picks_per_batch
+        return [(a, b, self.picks[i:i + step], i, r, self.seed, self.max_rounds)
+                for r in replicates for i in range(0, len(self.picks), step)]
+
+    # Interleaves the pairings' batch lists so they advance together
+    @staticmethod
+    def _interleave(per_pairing: List[List[tuple]]) -> List[tuple]:
+        return [batch for group in zip(*per_pairing) for batch in group]
+
+    # Purpose: Pairs entrants by current standing; top unpaired entrant meets the next one it has not met
+    # (or the next one at all if it has met everyone), the lowest without a bye sits out when odd
+    def swiss_pairings(self) -> List[Tuple[str, str]]:
+        order = self.standings.ranking()
+        if len(order) % 2:
+            bye = min(reversed(order), key=lambda e: self.byes.get(e, 0))
+            self.byes[bye] = self.byes.get(bye, 0) + 1
+            order.remove(bye)
+        pairs = []
+        while order:
+            a = order.pop(0)
+            b = next((e for e in order if not self.standings.met(a, e)), order[0])
+            order.remove(b)
+            pairs.append((a, b))
+        return pairs
+
+    def _stages(self) -> List[Callable[[], List[tuple]]]:
+        reps = range(self.replicates)
+        if self.fmt == "round-robin":
+            return [lambda: self._interleave([self._batches(a, b, reps) for a, b in combinations(self.entrants, 2)])]
+        # swiss: replicate numbers continue across rounds so rematches get fresh dice
+        return [lambda k=k: self._interleave([self._batches(a, b, range(k * self.replicates, (k + 1) * self.replicates))
+                                              for a, b in self.swiss_pairings()])
+                for k in range(self.rounds)]
+
+    # Purpose: Plays the bracket; on_update(standings, done, total) after every batch. Stops early
+    # (dropping the batches not started yet) once the ranking is settled.
+    def run(self, on_update: Optional[Callable[[Standings, int, int], None]] = None) -> Standings:
+        done = 0
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            for stage in self._stages():
+                batches = stage()
+                self.batches_total += len(batches)
+                queued = iter(batches)
+                running = {}
+                # keep a couple of batches per worker in flight, the rest stay here and can be dropped
+                for batch in queued:
+                    running[pool.submit(play_picks, *batch)] = batch
+                    if len(running) >= self.workers * 2:
+                        break
+                while running:
+                    finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        a, b = running.pop(future)[:2]
+                        self.standings.add(a, b, *future.result())
+                        done += 1
+                        if on_update:
+                            on_update(self.standings, done, self.batches_total)
+                    if self.standings.settled(*self.stop_args):
+                        self.stopped_early = True
+                        for future in running:
+                            future.cancel()
+                        return self.standings
+                    for batch in queued:
+                        running[pool.submit(play_picks, *batch)] = batch
+                        if len(running) >= self.workers * 2:
+                            break
+        return self.standings
+
+    # Purpose: Whether entrant scored at least threshold against every opponent it met
+    def qualifies(self, entrant: str, threshold: float = 0.5) -> bool:
+        records = [r for (a, _), r in self.standings.head_to_head.items() if a == entrant]
+        return bool(records) and all(r.rate >= threshold for r in records)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Round-robin or Swiss tournament between bot policies")
+    parser.add_argument("entrants", nargs="+", help="policy specs: random, greedy, scripted, search[:rollouts[:horizon]]")
+    parser.add_argument("--format", choices=["round-robin", "swiss"], default="round-robin")
+    parser.add_argument("--mode", choices=["1v1", "2v2", "3v3"], default="1v1")
+    parser.add_argument("--replicates", type=int, default=4, help="sweeps of every class pick per pairing (per round in swiss)")
+    parser.add_argument("--rounds", type=int, default=None, help="swiss rounds (default log2(entrants) + 1)")
+    parser.add_argument("--batch", type=int, default=10, help="class picks per pool job")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--max-rounds", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--z", type=float, default=2.0, help="standard errors between neighbours to stop early")
+    parser.add_argument("--patience", type=int, default=5, help="batches the order must hold to stop early")
+    parser.add_argument("--min-games", type=int, default=200, help="games per entrant before stopping early")
+    parser.add_argument("--no-early-stop", action="store_true")
+    parser.add_argument("--report", type=float, default=5.0, help="seconds between standings printouts")
+    parser.add_argument("--qualify", default=None, help="exit with status 1 unless this entrant scores "
+                                                        "at least --threshold against every opponent")
+    parser.add_argument("--threshold", type=float, default=0.5)
+    args = parser.parse_args()
+
+    if args.qualify and args.qualify not in args.entrants:
+        parser.error(f"--qualify {args.qualify} is not an entrant")
+    tournament = Tournament(args.entrants, fmt=args.format, team_size=int(args.mode[0]), replicates=args.replicates,
+                            rounds=args.rounds, picks_per_batch=args.batch, workers=args.workers,
+                            max_rounds=args.max_rounds, seed=args.seed, z=math.inf if args.no_early_stop else args.z,
+                            patience=args.patience, min_games=args.min_games)
+    print(f"{args.format}, {args.mode}, {len(tournament.picks)} class picks, {tournament.workers} worker(s)")
+    start = time.perf_counter()
+    last_report = start
+
+    def report(standings: Standings, done: int, total: int):
+        global last_report
+        now = time.perf_counter()
+        if now - last_report >= args.report:
+            last_report = now
+            print(f"\n[{done}/{total} batches, {now - start:.0f}s]\n{standings.format()}", flush=True)
+
+    standings = tournament.run(report)
+    games = sum(r.games for r in standings.overall.values()) // 2
+    how = "stopped early, ranking settled" if tournament.stopped_early else "complete"
+    print(f"\nfinal standings ({how}; {games} games in {time.perf_counter() - start:.1f}s)\n{standings.format()}")
+    print(f"\nhead to head (row's score against column)\n{standings.format_head_to_head()}")
+    if args.qualify:
+        passed = tournament.qualifies(args.qualify, args.threshold)
+        print(f"\n{args.qualify}: {'qualified' if passed else 'not qualified'}")
+        sys.exit(0 if passed else 1)
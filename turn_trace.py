@@ -0,0 +1,347 @@
+# turn_trace.py
+#
+# Per-turn traces of simulated matches as fixed-width columnar arrays on disk,
+# for analysis runs over hundreds of millions of turns.
+#
+# A trace is a directory with one raw little-endian file per column plus
+# meta.json (schema, class and action names, row counts). Two tables:
+#   turns.*    one row per actor turn: match, turn, round, actor slot and
+#              class, action, target slot, then hp / cooldown / effect-bit
+#              vectors over every slot (Team 1 first, padded to MAX_SLOTS);
+#   matches.*  one row per match: id, seed, team size, classes, winner and
+#              the match's range of turn rows.
+# TraceWriter buffers rows in array.array columns and appends them in blocks;
+# meta.json is replaced after the data, so a reader (or a writer reopening
+# the trace after a crash) only trusts the rows meta.json counts.
+# TraceReader memory-maps the column files: column() gives zero-copy
+# memoryviews with the stdlib, array() NumPy views (needs numpy) for
+# vectorized scans that only touch the columns a question needs.
+#
+#   python simulator.py --matches 100000 --mode 3v3 --trace traces/
+#   python turn_trace.py traces/          # decisive blows per class
+
+import argparse
+import array
+import json
+import mmap
+import os
+import sys
+import time
+from typing import Dict, List, Optional
+
+from class_table import AVAILABLE_CLASSES, load_class_table
+from simulator import random_policy
+from status_effects import StunEffect, PoisonEffect, DefenseBoostEffect
+
+VERSION = 1
+MAX_SLOTS = 6  # 3v3
+ACTIONS = ("attack", "defend", "special", "stunned", "downed", "idle")  # downed: died to poison in upkeep
+ATTACK, DEFEND, SPECIAL, STUNNED, DOWNED, IDLE = range(len(ACTIONS))
+NO_TARGET, ALL_TARGETS = -1, -2
+EMPTY_CLASS = 255
+EFFECT_BITS = {StunEffect: 1, PoisonEffect: 2, DefenseBoostEffect: 4}
+WINNERS = ("Draw", "Team 1", "Team 2")
+
+# column -> (dtype, values per row); dtypes as NumPy spells them, little-endian on disk
+TURN_COLUMNS = {
+    "match": ("u4", 1),
+    "turn": ("u4", 1),
+    "round": ("u2", 1),
+    "actor": ("u1", 1),  # slot
+    "actor_class": ("u1", 1),  # index into classes
+    "action": ("u1", 1),  # index into ACTIONS
+    "target": ("i1", 1),  # slot, NO_TARGET or ALL_TARGETS
+    "hp": ("f4", MAX_SLOTS),  # after the turn (specials can leave fractions); -1 for empty slots
+    "cooldown": ("u1", MAX_SLOTS),
+    "effects": ("u1", MAX_SLOTS),  # EFFECT_BITS of the active effects
+}
+MATCH_COLUMNS = {
+    "match": ("u4", 1),
+    "seed": ("u8", 1),
+    "team_size": ("u1", 1),
+    "classes": ("u1", MAX_SLOTS),  # EMPTY_CLASS for empty slots
+    "winner": ("u1", 1),  # index into WINNERS
+    "first_turn": ("u8", 1),  # row of the match's first turn
+    "turns": ("u4", 1),
+    "rounds": ("u2", 1),
+}
+TYPECODES = {"u1": "B", "i1": "b", "u2": "H", "u4": "I", "u8": "Q", "f4": "f"}
+for _dtype, _code in TYPECODES.items():
+    if array.array(_code).itemsize != int(_dtype[1]):
+        raise ImportError(f"array typecode {_code!r} is not {_dtype[1]} bytes on this platform")
+
+
+def _meta_path(path: str) -> str:
+    return os.path.join(path, "meta.json")
+
+
+def _column_path(path: str, table: str, name: str) -> str:
+    return os.path.join(path, f"{table}.{name}.bin")
+
+
+def _tables() -> Dict[str, Dict[str, tuple]]:
+    return {"turns": TURN_COLUMNS, "matches": MATCH_COLUMNS}
+
+
+# ----------------------------
+# Writer
+# ----------------------------
+class TraceWriter:
+    def __init__(self, path: str, block_rows: int = 1 << 16):
+        self.path = path
+        self.block_rows = block_rows
+        self.classes = list(AVAILABLE_CLASSES)
+        self.class_index = {name: i for i, name in enumerate(self.classes)}
+        self.rows = {"turns": 0, "matches": 0}  # rows on disk
+        os.makedirs(path, exist_ok=True)
+        if os.path.exists(_meta_path(path)):
+            with open(_meta_path(path), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta["version"] != VERSION or meta["classes"] != self.classes:
+                raise ValueError(f"{path} holds a trace of another format or class table")
+            self.rows = meta["rows"]
+        # drop anything past the counted rows (a block whose meta.json update never happened)
+        for table, columns in _tables().items():
+            for name, (dtype, width) in columns.items():
+                with open(_column_path(path, table, name), "ab") as f:
+                    f.truncate(self.rows[table] * width * int(dtype[1]))
+        self.buffers = {table: {name: array.array(TYPECODES[dtype]) for name, (dtype, _) in columns.items()}
+                        for table, columns in _tables().items()}
+        self.buffered = {"turns": 0, "matches": 0}
+
+    # Purpose: Plays sim to the end (exactly as Simulation.run() would) while recording a row per turn
+    def play(self, sim) -> dict:
+        start = time.perf_counter()
+        members = sim.teams["Team 1"] + sim.teams["Team 2"]
+        if len(members) > MAX_SLOTS:
+            raise ValueError(f"Traces hold at most {MAX_SLOTS} characters per match")
+        slot_of = {id(c): i for i, c in enumerate(members)}
+        pad = [-1] * (MAX_SLOTS - len(members))
+        zeros = [0] * (MAX_SLOTS - len(members))
+        match_id = self.rows["matches"] + self.buffered["matches"]
+        first_turn = self.rows["turns"] + self.buffered["turns"]
+        t = self.buffers["turns"]
+        hp, cooldown, effects = t["hp"], t["cooldown"], t["effects"]
+        turns = 0
+        while True:
+            c = sim.begin_turn()
+            if c is None:
+                if sim.winner == "Draw":  # round limit, nobody acted
+                    break
+                actor = sim.actor
+                action, target = (DOWNED if actor.hp <= 0 else STUNNED), NO_TARGET
+            else:
+                actor = c
+                choice, index = sim.policies.get(sim.team_of[id(c)], random_policy)(sim, c)
+                action, target = self._classify(sim, c, choice, index, slot_of)
+                sim.apply_action(c, choice, index)
+                sim.end_turn()
+            t["match"].append(match_id)
+            t["turn"].append(turns)
+            t["round"].append(sim.rounds)
+            t["actor"].append(slot_of[id(actor)])
+            t["actor_class"].append(self.class_index[actor.name])
+            t["action"].append(action)
+            t["target"].append(target)
+            hp.extend([m.hp for m in members] + pad)
+            cooldown.extend([m.special_move_cooldown for m in members] + zeros)
+            effects.extend([self._effect_bits(m) if m.status_effects else 0 for m in members] + zeros)
+            turns += 1
+            if sim.winner is not None:
+                break
+        sim.duration = time.perf_counter() - start
+
+        m = self.buffers["matches"]
+        m["match"].append(match_id)
+        m["seed"].append(sim.seed & 0xFFFFFFFFFFFFFFFF)
+        m["team_size"].append(len(sim.teams["Team 1"]))
+        m["classes"].extend([self.class_index[c.name] for c in members] + [EMPTY_CLASS] * len(pad))
+        m["winner"].append(WINNERS.index(sim.winner))
+        m["first_turn"].append(first_turn)
+        m["turns"].append(turns)
+        m["rounds"].append(sim.rounds)
+        self.buffered["turns"] += turns
+        self.buffered["matches"] += 1
+        if self.buffered["turns"] >= self.block_rows:
+            self.flush()
+        return sim.result()
+
+    @staticmethod
+    def _classify(sim, c, choice: str, index: Optional[int], slot_of: dict):
+        table = sim.legal_actions(c)
+        if not table.is_legal(choice, index):
+            return IDLE, NO_TARGET
+        if choice == "defend":
+            return DEFEND, NO_TARGET
+        if choice == "attack":
+            return ATTACK, slot_of[id(table.pick("attack", index))]
+        if table.special == "self":
+            return SPECIAL, slot_of[id(c)]
+        if table.special == "all":
+            return SPECIAL, ALL_TARGETS
+        return SPECIAL, slot_of[id(table.pick("special", index))]
+
+    @staticmethod
+    def _effect_bits(c) -> int:
+        bits = 0
+        for effect in c.status_effects:
+            bits |= EFFECT_BITS[type(effect)]
+        return bits
+
+    # Purpose: Appends the buffered block to the column files, then publishes the new row counts
+    def flush(self):
+        if not self.buffered["matches"]:
+            return
+        for table, columns in self.buffers.items():
+            for name, values in columns.items():
+                if sys.byteorder != "little":
+                    values.byteswap()
+                with open(_column_path(self.path, table, name), "ab") as f:
+                    values.tofile(f)
+                del values[:]
+            self.rows[table] += self.buffered[table]
+            self.buffered[table] = 0
+        meta = {
+            "version": VERSION,
+            "slots": MAX_SLOTS,
+            "classes": self.classes,
+            "actions": list(ACTIONS),
+            "winners": list(WINNERS),
+            "effect_bits": {cls.__name__: bit for cls, bit in EFFECT_BITS.items()},
+            "columns": {table: {name: [dtype, width] for name, (dtype, width) in columns.items()}
+                        for table, columns in _tables().items()},
+            "rows": self.rows,
+        }
+        tmp = _meta_path(self.path) + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=1)
+        os.replace(tmp, _meta_path(self.path))
+
+    def close(self):
+        self.flush()
+
+
+# ----------------------------
+# Reader
+# ----------------------------
+class TraceReader:
+    def __init__(self, path: str):
+        self.path = path
+        with open(_meta_path(path), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta["version"] != VERSION:
+            raise ValueError(f"Unsupported trace version: {self.meta['version']}")
+        self.classes: List[str] = self.meta["classes"]
+        self.rows: Dict[str, int] = self.meta["rows"]
+        self._maps: Dict[str, mmap.mmap] = {}
+
+    def _map(self, table: str, name: str) -> Optional[mmap.mmap]:
+        key = f"{table}.{name}"
+        if key not in self._maps:
+            dtype, width = self.meta["columns"][table][name]
+            size = self.rows[table] * width * int(dtype[1])
+            if not size:
+                return None
+            with open(_column_path(self.path, table, name), "rb") as f:
+                self._maps[key] = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+        return self._maps[key]
+
+    # Purpose: Zero-copy view of a column (width values per row, flattened); stdlib only
+    def column(self, table: str, name: str) -> memoryview:
+        dtype = self.meta["columns"][table][name][0]
+        if sys.byteorder != "little" and dtype[1] != "1":
+            raise ValueError("column() needs a little-endian machine; use array()")
+        mapped = self._map(table, name)
+        return memoryview(mapped if mapped is not None else b"").cast(TYPECODES[dtype])
+
+    # Purpose: NumPy view of a column, shape (rows,) or (rows, width); pages are read on first touch
+    def array(self, table: str, name: str):
+        import numpy as np
+        dtype, width = self.meta["columns"][table][name]
+        mapped = self._map(table, name)
+        values = np.frombuffer(mapped, dtype="<" + dtype) if mapped is not None else np.zeros(0, dtype="<" + dtype)
+        return values.reshape(-1, width) if width > 1 else values
+
+    def close(self):
+        for mapped in self._maps.values():
+            mapped.close()
+        self._maps.clear()
+
+
+# ----------------------------
+# Analysis
+# ----------------------------
+SCAN_ROWS = 1 << 24  # rows per chunk in full-column scans, so temporaries stay small
+
+
+# Purpose: How often each class took each action, over every turn in the trace. Needs numpy.
+def action_counts(reader: TraceReader) -> Dict[str, Dict[str, int]]:
+    import numpy as np
+    actor_class = reader.array("turns", "actor_class")
+    action = reader.array("turns", "action")
+    counts = np.zeros(len(reader.classes) * len(ACTIONS), dtype=np.int64)
+    for start in range(0, len(action), SCAN_ROWS):
+        cells = actor_class[start:start + SCAN_ROWS].astype(np.int32) * len(ACTIONS) + action[start:start + SCAN_ROWS]
+        counts += np.bincount(cells, minlength=len(counts))
+    counts = counts.reshape(len(reader.classes), len(ACTIONS))
+    return {name: dict(zip(ACTIONS, map(int, counts[k]))) for k, name in enumerate(reader.classes)}
+
+
+# Purpose: For every class, how the matches its team won were decided: final blow by its own attack or
+# special, or by a poison tick when it is a class whose special poisons. Needs numpy.
+def decisive_blows(reader: TraceReader) -> Dict[str, Dict[str, int]]:
+    import numpy as np
+    winner = reader.array("matches", "winner")
+    turns = reader.array("matches", "turns")
+    decided = (winner > 0) & (turns > 0)
+    winner, turns = winner[decided], turns[decided]
+    last = reader.array("matches", "first_turn")[decided] + turns - 1
+    classes = reader.array("matches", "classes")[decided]
+    size = reader.array("matches", "team_size")[decided].astype(np.int64)[:, None]
+    slots = np.arange(MAX_SLOTS)[None, :]
+    side = np.where(slots < size, 1, np.where(slots < 2 * size, 2, 0))
+    on_winning_side = side == winner[:, None]
+    final_action = reader.array("turns", "action")[last]
+    final_class = reader.array("turns", "actor_class")[last]
+    final_slot = reader.array("turns", "actor")[last]
+    final_by_winner = side[np.arange(len(last)), final_slot] == winner
+
+    table = load_class_table()
+    poisoners = {name for name, entry in table.items()
+                 if any(e["type"] == "poison" for e in entry["special"].get("effects", []))}
+    out = {}
+    for k, name in enumerate(reader.classes):
+        won = (classes == k) & on_winning_side
+        wins = won.any(axis=1)
+        by_self = wins & final_by_winner & (final_class == k)
+        out[name] = {
+            "wins": int(wins.sum()),
+            "attack": int((by_self & (final_action == ATTACK)).sum()),
+            "special": int((by_self & (final_action == SPECIAL)).sum()),
+            "poison": int((wins & (final_action == DOWNED)).sum()) if name in poisoners else 0,
+        }
+    return out
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize a per-turn trace directory")
+    parser.add_argument("path")
+    args = parser.parse_args()
+
+    reader = TraceReader(args.path)
+    start = time.perf_counter()
+    counts = action_counts(reader)
+    blows = decisive_blows(reader)
+    elapsed = time.perf_counter() - start
+    print(f"{reader.rows['turns']:,} turns, {reader.rows['matches']:,} matches, scanned in {elapsed:.2f}s")
+    print(f"{'class':>13} " + " ".join(f"{a:>8}" for a in ACTIONS))
+    for name, row in counts.items():
+        total = sum(row.values()) or 1
+        print(f"{name:>13} " + " ".join(f"{row[a] / total:>8.1%}" for a in ACTIONS))
+    print(f"\nhow the matches each class's team won were decided")
+    print(f"{'class':>13} {'team wins':>10} {'own attack':>11} {'own special':>12} {'poison tick':>12}")
+    for name, row in blows.items():
+        wins = row["wins"] or 1
+        print(f"{name:>13} {row['wins']:>10,} {row['attack'] / wins:>11.1%} {row['special'] / wins:>12.1%} "
+              f"{row['poison'] / wins:>12.1%}")
+    reader.close()
@@ -0,0 +1,306 @@
+# winprob.py
+#
+# Win-probability estimates attached to game_state broadcasts.
+#
+# A position is the canonical form of the living characters of both teams
+# (class, stats, cooldown and effects, sorted within each team, teams ordered
+# so that a position and its mirror share one entry). Who moves next is not
+# part of it. Estimates come from:
+#   - 1v1 with both characters at their class stats, cooldown ready and no
+#     effects: a precomputed table indexed by (class, class, HP bucket, HP
+#     bucket), built offline with `python winprob.py --build` (winprob_1v1.json);
+#   - everything else (buffed, debuffed, on cooldown, under effects): greedy-policy rollouts from the position, run in a
+#     process pool with a time budget per position.
+# estimate() never waits: it answers from the table or the cache, otherwise
+# hands the position to a feeder thread (which submits the rollout job) and
+# returns None; the result is cached when it lands, so the same position (in
+# any match) is only computed once.
+#
+#   python winprob.py --build [--rollouts 200] [--buckets 10]
+#   python winprob.py --position "Gladiator:80,Soulmender:40" "Voidcaster:60"
+
+import argparse
+import json
+import math
+import os
+import queue
+import random
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Tuple
+
+from character import CharacterFactory, CharacterPool
+from class_table import CLASS_DATA_PATH, CLASS_SPECS
+from simulator import Simulation, greedy_policy
+from status_effects import encode_effect, decode_effect
+
+TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "winprob_1v1.json")
+
+# (class, hp, attack_power, defense, speed, cooldown, effects) of one living character
+Member = Tuple[str, int, int, int, int, int, tuple]
+Position = Tuple[Tuple[Member, ...], Tuple[Member, ...]]
+
+
+# ----------------------------
+# Positions
+# ----------------------------
+def member_of(c) -> Member:
+    return (c.name, c.hp, c.attack_power, c.defense, c.speed, c.special_move_cooldown,
+            tuple(tuple(encode_effect(e)) for e in c.status_effects))
+
+
+# Returns (position, flipped): flipped means position[0] is Team 2
+def canonical(teams: Dict[str, list]) -> Tuple[Position, bool]:
+    one = tuple(sorted(member_of(c) for c in teams["Team 1"] if c.hp > 0))
+    two = tuple(sorted(member_of(c) for c in teams["Team 2"] if c.hp > 0))
+    if two < one:
+        return (two, one), True
+    return (one, two), False
+
+
+def class_fingerprint(path: str = CLASS_DATA_PATH) -> int:
+    with open(path, "rb") as f:
+        return zlib.crc32(f.read())
+
+
+# ----------------------------
+# Rollouts (run in pool workers)
+# ----------------------------
+_characters = CharacterPool()  # per worker process, reused by every rollout
+
+
+def _simulation_from(position: Position, seed: int, max_rounds: int) -> Simulation:
+    sim = Simulation([m[0] for m in position[0]], [m[0] for m in position[1]], seed=seed, max_rounds=max_rounds,
+                     policies={"Team 1": greedy_policy, "Team 2": greedy_policy}, pool=_characters)
+    for members, characters in zip(position, (sim.teams["Team 1"], sim.teams["Team 2"])):
+        for (_, hp, attack_power, defense, speed, cooldown, effects), c in zip(members, characters):
+            c.hp, c.attack_power, c.defense, c.speed = hp, attack_power, defense, speed
+            c.special_move_cooldown = cooldown
+            c.status_effects.extend(decode_effect(list(e)) for e in effects)
+            sim.turn_order.update(c)
+    return sim
+
+
+# Plays greedy-vs-greedy matches from a position until n are done or the time budget runs out
+# (at least min_rollouts). Returns (first side wins, second side wins, draws).
+def rollout(position: Position, n: int, time_budget: float, max_rounds: int, seed: int,
+            min_rollouts: int = 8) -> Tuple[int, int, int]:
+    rng = random.Random(seed)
+    deadline = time.perf_counter() + time_budget
+    counts = {"Team 1": 0, "Team 2": 0, "Draw": 0}
+    for i in range(n):
+        sim = _simulation_from(position, rng.randrange(2 ** 32), max_rounds)
+        counts[sim.run()["winner"] or "Draw"] += 1
+        sim.release()
+        if i + 1 >= min_rollouts and time.perf_counter() > deadline:
+            break
+    return counts["Team 1"], counts["Team 2"], counts["Draw"]
+
+
+# ----------------------------
+# 1v1 lookup table
+# ----------------------------
+def hp_bucket(hp: int, max_hp: int, buckets: int) -> int:
+    return min(buckets, max(1, math.ceil(hp / max_hp * buckets)))
+
+
+# True if only HP differs from the state the table was built from: class stats, cooldown 0, no effects
+def in_table(m: Member) -> bool:
+    spec = CLASS_SPECS.get(m[0])
+    return spec is not None and m[2:] == (spec.attack_power, spec.defense, spec.speed, 0, ())
+
+
+def _table_cell(job):
+    a, b, i, j, buckets, rollouts, max_rounds = job
+    hp_a = max(1, round((i - 0.5) / buckets * CLASS_SPECS[a].hp))
+    hp_b = max(1, round((j - 0.5) / buckets * CLASS_SPECS[b].hp))
+    sa, sb = CLASS_SPECS[a], CLASS_SPECS[b]
+    position = (((a, hp_a, sa.attack_power, sa.defense, sa.speed, 0, ()),),
+                ((b, hp_b, sb.attack_power, sb.defense, sb.speed, 0, ()),))
+    wins, _, draws = rollout(position, rollouts, float("inf"), max_rounds,
+                             seed=zlib.crc32(f"{a}|{b}|{i}|{j}".encode()))
+    return f"{a}|{b}", (i - 1) * buckets + (j - 1), [round(wins / rollouts, 3), round(draws / rollouts, 3)]
+
+
+# Builds {"a|b": [[p(a wins), p(draw)] per (bucket_a, bucket_b)]} for every pair of distinct classes
+def build_table(buckets: int = 10, rollouts: int = 200, max_rounds: int = 50, workers: Optional[int] = None) -> dict:
+    names = sorted(CLASS_SPECS)
+    pairs = [(a, b) for a in names for b in names if a < b]
+    cells = {f"{a}|{b}": [None] * (buckets * buckets) for a, b in pairs}
+    jobs = [(a, b, i, j, buckets, rollouts, max_rounds)
+            for a, b in pairs for i in range(1, buckets + 1) for j in range(1, buckets + 1)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for key, index, cell in pool.map(_table_cell, jobs, chunksize=16):
+            cells[key][index] = cell
+    return {"fingerprint": class_fingerprint(), "buckets": buckets, "rollouts": rollouts, "cells": cells}
+
+
+# Loads the table, or None if it is missing or was built for other class data
+def load_table(path: str = TABLE_PATH) -> Optional[dict]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            table = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if table.get("fingerprint") != class_fingerprint():
+        print(f"{path} was built for different class data; 1v1 estimates fall back to rollouts.")
+        return None
+    return table
+
+
+# ----------------------------
+# Estimator
+# ----------------------------
+class WinProbability:
+    def __init__(self, workers: int = 1, rollouts: int = 200, time_budget: float = 0.02, max_rounds: int = 50,
+                 table_path: Optional[str] = TABLE_PATH, cache_size: int = 100_000, max_pending: Optional[int] = None,
+                 niceness: int = 10):
+        self.rollouts = rollouts
+        self.time_budget = time_budget  # seconds of rollouts per position
+        self.max_rounds = max_rounds  # rollouts still undecided after this many rounds count as draws
+        self.table = load_table(table_path) if table_path else None
+        # lower priority so rollouts never take a core away from match threads
+        self.pool = ProcessPoolExecutor(max_workers=workers, initializer=os.nice, initargs=(niceness,))
+        for _ in range(workers):
+            self.pool.submit(int)  # start the worker processes now, not on a match's first broadcast
+        self.max_pending = max_pending or workers * 4  # positions queued beyond this are skipped, not queued
+        self.cache: "OrderedDict[Position, Tuple[float, float]]" = OrderedDict()  # position -> (p first, p second)
+        self.cache_size = cache_size
+        self.pending: set = set()
+        self.lock = threading.Lock()
+        self.stats = {"cache_hits": 0, "table_hits": 0, "submitted": 0, "computed": 0, "skipped": 0}
+        # submitting (pickling, waking the pool's manager thread) happens on the feeder, not the caller
+        self.requests: "queue.SimpleQueue[Optional[Position]]" = queue.SimpleQueue()
+        threading.Thread(target=self._feed, daemon=True).start()
+
+    # Purpose: {"Team 1": p, "Team 2": p} for the living characters, or None while a rollout job is running
+    def estimate(self, teams: Dict[str, list]) -> Optional[Dict[str, float]]:
+        position, flipped = canonical(teams)
+        if not position[0] or not position[1]:
+            first = 1.0 if position[0] else 0.0
+            return self._oriented((first, 1.0 - first), flipped)
+        with self.lock:
+            probs = self.cache.get(position)
+            if probs is not None:
+                self.cache.move_to_end(position)
+                self.stats["cache_hits"] += 1
+                return self._oriented(probs, flipped)
+        if self.table is not None and len(position[0]) == 1 and len(position[1]) == 1:
+            probs = self._lookup(position[0][0], position[1][0])
+            if probs is not None:
+                self.stats["table_hits"] += 1
+                return self._oriented(probs, flipped)
+        self._request(position)
+        return None
+
+    def _lookup(self, a: Member, b: Member) -> Optional[Tuple[float, float]]:
+        if not (in_table(a) and in_table(b)):
+            return None  # the table would ignore the difference: rolled out like any other position
+        buckets = self.table["buckets"]
+        swap = b[0] < a[0]  # the table only stores each pair once, alphabetically
+        if swap:
+            a, b = b, a
+        cells = self.table["cells"].get(f"{a[0]}|{b[0]}")
+        if cells is None:
+            return None
+        i = hp_bucket(a[1], CLASS_SPECS[a[0]].hp, buckets)
+        j = hp_bucket(b[1], CLASS_SPECS[b[0]].hp, buckets)
+        wins, draws = cells[(i - 1) * buckets + (j - 1)]
+        probs = (wins, 1.0 - wins - draws)
+        return probs[::-1] if swap else probs
+
+    def _request(self, position: Position):
+        with self.lock:
+            if position in self.pending:
+                return
+            if len(self.pending) >= self.max_pending:
+                self.stats["skipped"] += 1  # asked again on a later broadcast if the position is still live
+                return
+            self.pending.add(position)
+            self.stats["submitted"] += 1
+        self.requests.put(position)
+
+    def _feed(self):
+        while True:
+            position = self.requests.get()
+            if position is None:
+                return
+            seed = zlib.crc32(repr(position).encode())
+            try:
+                future = self.pool.submit(rollout, position, self.rollouts, self.time_budget, self.max_rounds, seed)
+            except RuntimeError:
+                return  # pool shut down
+            future.add_done_callback(lambda f, position=position: self._store(position, f))
+
+    def _store(self, position: Position, future):
+        with self.lock:
+            self.pending.discard(position)
+            if future.cancelled() or future.exception() is not None:
+                return
+            first, second, draws = future.result()
+            total = first + second + draws
+            self.cache[position] = (first / total, second / total)
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+            self.stats["computed"] += 1
+
+    @staticmethod
+    def _oriented(probs: Tuple[float, float], flipped: bool) -> Dict[str, float]:
+        first, second = probs
+        if flipped:
+            first, second = second, first
+        return {"Team 1": round(first, 3), "Team 2": round(second, 3)}
+
+    # Purpose: Blocks until every queued rollout has landed (benchmarks and the CLI)
+    def drain(self, timeout: float = 10.0):
+        deadline = time.monotonic() + timeout
+        while self.pending and time.monotonic() < deadline:
+            time.sleep(0.005)
+
+    def close(self):
+        self.requests.put(None)
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+# ----------------------------
+# CLI
+# ----------------------------
+def _parse_team(text: str) -> list:
+    team = []
+    for entry in text.split(","):
+        name, _, hp = entry.partition(":")
+        c = CharacterFactory.create_character(name.strip())
+        if hp:
+            c.hp = int(hp)
+        team.append(c)
+    return team
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Win-probability tables and estimates")
+    parser.add_argument("--build", action="store_true", help=f"build the 1v1 lookup table ({TABLE_PATH})")
+    parser.add_argument("--buckets", type=int, default=10, help="HP buckets per character in the 1v1 table")
+    parser.add_argument("--rollouts", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--position", nargs=2, metavar=("TEAM1", "TEAM2"),
+                        help='estimate a position, e.g. "Gladiator:80,Soulmender:40" "Voidcaster:60"')
+    args = parser.parse_args()
+
+    if args.build:
+        start = time.perf_counter()
+        table = build_table(args.buckets, args.rollouts, workers=args.workers)
+        with open(TABLE_PATH, "w", encoding="utf-8") as f:
+            json.dump(table, f, separators=(",", ":"))
+        print(f"{len(table['cells'])} class pairs written to {TABLE_PATH} in {time.perf_counter() - start:.1f}s")
+    if args.position:
+        estimator = WinProbability(workers=args.workers or 1, rollouts=args.rollouts, time_budget=5.0)
+        teams = {"Team 1": _parse_team(args.position[0]), "Team 2": _parse_team(args.position[1])}
+        result = estimator.estimate(teams)
+        if result is None:
+            estimator.drain()
+            result = estimator.estimate(teams)
+        print(result)
+        estimator.close()